@@ -0,0 +1,47 @@
+"""ConnectionManager.broadcast fan-out to 1 / 100 / 1000 fake sockets, enqueue through delivery"""
+
+import asyncio
+from benchmarks.common import FakeWebSocket, synthetic_bars
+from src.app.infrastructure.websockets.binary_protocol import BinaryEncoder
+from src.app.infrastructure.websockets.manager import ConnectionManager
+
+MESSAGES = 200
+CHANNEL = "BENCH"
+
+
+class BroadcastFanout:
+    """MESSAGES bars broadcast to N clients; timed until every socket has written every bar"""
+    params = ([1, 100, 1000], ["json", "binary"])
+    param_names = ["clients", "encoding"]
+    unit = "messages delivered"
+
+    def setup(self, clients, encoding):
+        self.items = MESSAGES * clients
+        self.loop = asyncio.new_event_loop()
+        self.manager = ConnectionManager()
+        self.sockets = [FakeWebSocket() for _ in range(clients)]
+        # Distinct timestamps: no conflation, every message is delivered
+        self.bars = synthetic_bars(MESSAGES, symbol=CHANNEL)
+
+        async def connect():
+            for socket in self.sockets:
+                encoder = BinaryEncoder(CHANNEL) if encoding == "binary" else None
+                await self.manager.connect(socket, CHANNEL, encoder=encoder)
+        self.loop.run_until_complete(connect())
+
+    def teardown(self, clients, encoding):
+        for socket in self.sockets:
+            self.manager.disconnect(socket, CHANNEL)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def time_broadcast(self, clients, encoding):
+        async def burst():
+            for socket in self.sockets:
+                socket.expect(MESSAGES)
+            for bar in self.bars:
+                await self.manager.broadcast(CHANNEL, dict(bar))
+                # Let writers drain like they would between upstream bars
+                await asyncio.sleep(0)
+            await asyncio.gather(*(socket.done for socket in self.sockets))
+        self.loop.run_until_complete(burst())
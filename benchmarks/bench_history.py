@@ -0,0 +1,62 @@
+"""get_history normalization on a 100k-row synthetic ohlcv-1m DBN frame, and the streamed /history encodings"""
+
+import asyncio
+import databento
+from benchmarks.common import synthetic_dbn
+from src.app.core.config import settings
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.history_stream import compress, encode_body
+
+ROWS = 100_000
+DATASET = "GLBX.MDP3"
+
+
+class HistoryNormalize:
+    """DBN -> DataFrame -> columns -> response payload, each step on its own"""
+    unit = "rows"
+
+    def setup(self):
+        self.items = ROWS
+        self.raw = synthetic_dbn(ROWS, DATASET)
+        self.df = databento.DBNStore.from_bytes(self.raw).to_df()
+        self.columns = market_data_client._normalize_frame(self.df, DATASET)
+
+    def time_decode(self):
+        databento.DBNStore.from_bytes(self.raw).to_df()
+
+    def time_normalize_frame(self):
+        market_data_client._normalize_frame(self.df, DATASET)
+
+    def time_payload_rows(self):
+        market_data_client._columns_payload(self.columns, "BENCH", DATASET, columnar=False)
+
+    def time_payload_columns(self):
+        market_data_client._columns_payload(self.columns, "BENCH", DATASET, columnar=True)
+
+    def time_resample_5m(self):
+        market_data_client._shape_history(self.columns, "BENCH", DATASET, columnar=True, resample_seconds=300)
+
+
+class HistoryStream:
+    """Streamed /history bodies for the same 100k rows, in HISTORY_CHUNK_BARS chunks (optionally gzipped)"""
+    params = [["rows", "ndjson", "arrow"], [None, "gzip"]]
+    param_names = ["format", "encoding"]
+    unit = "rows"
+
+    def setup(self, fmt, encoding):
+        self.items = ROWS
+        df = databento.DBNStore.from_bytes(synthetic_dbn(ROWS, DATASET)).to_df()
+        columns = market_data_client._normalize_frame(df, DATASET)
+        size = settings.HISTORY_CHUNK_BARS
+        self.chunks = [{name: values[i:i + size] for name, values in columns.items()} for i in range(0, ROWS, size)]
+
+    def time_stream(self, fmt, encoding):
+        async def chunks():
+            for columns in self.chunks:
+                yield columns
+
+        async def drain():
+            async for _ in compress(encode_body(fmt, chunks(), "BENCH", DATASET), encoding):
+                pass
+
+        asyncio.run(drain())
@@ -0,0 +1,82 @@
+"""Order journal: appends per order on the hot path, and replay of a day-sized journal on startup"""
+
+import asyncio
+import shutil
+import tempfile
+from src.app.domain.models import Order, OrderIntent, now_ns
+from src.app.domain.services.order_pipeline import OrderPipeline
+from src.app.domain.services.risk import RiskEngine, RiskLimits
+from src.app.infrastructure.persistence.order_journal import OrderJournal
+
+ORDERS = 50_000
+
+
+def _orders(count: int):
+    orders = []
+    for i in range(count):
+        intent = OrderIntent(f"SYM{i % 500}", "BUY" if i % 3 else "SELL", 10 + i % 7, 100.0 + i % 11)
+        ts = now_ns()
+        order = Order(intent, "SIM123456", f"bench-{i}", signal_ts=ts, queued_ts=ts,
+                      risk_ts=ts, send_ts=ts, ack_ts=ts, fill_ts=ts, broker_order_id=str(i),
+                      broker_status="filled", filled_quantity=intent.quantity, fill_price=intent.price)
+        orders.append(order)
+    return orders
+
+
+def _write(journal: OrderJournal, orders):
+    for order in orders:
+        journal.intent(order)
+        journal.accepted(order)
+        journal.sent(order)
+        journal.acked(order, order.intent.price)
+        journal.fill(order, order.fill_ts)
+        journal.final(order, order.fill_ts)
+
+
+class JournalAppend:
+    """intent + accepted + sent + acked + fill + final per order into a memory-mapped segment"""
+    unit = "orders"
+
+    def setup(self):
+        self.items = ORDERS
+        self.orders = _orders(ORDERS)
+        self.directory = tempfile.mkdtemp(prefix="bench-journal-")
+        self.loop = asyncio.new_event_loop()
+
+    def teardown(self):
+        self.loop.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_append(self):
+        journal = OrderJournal(tempfile.mkdtemp(dir=self.directory))
+
+        async def run():
+            await journal.start()
+            _write(journal, self.orders)
+            await journal.close()
+        self.loop.run_until_complete(run())
+
+
+class JournalRecover:
+    """OrderPipeline startup replay: orders, idempotency keys and risk positions from ORDERS x 6 records"""
+    unit = "records"
+
+    def setup(self):
+        self.items = ORDERS * 6
+        self.directory = tempfile.mkdtemp(prefix="bench-journal-")
+        journal = OrderJournal(self.directory)
+        loop = asyncio.new_event_loop()
+
+        async def fill():
+            await journal.start()
+            _write(journal, _orders(ORDERS))
+            await journal.close()
+        loop.run_until_complete(fill())
+        loop.close()
+
+    def teardown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_recover(self):
+        pipeline = OrderPipeline(broker=None, risk=RiskEngine(RiskLimits()), journal=OrderJournal(self.directory))
+        pipeline._recover()
@@ -0,0 +1,94 @@
+"""
+End-to-end simulated ingest -> strategy -> broadcast: a real StreamHub,
+StrategyRegistry and ConnectionManager fed by an in-memory bar source,
+timed from the first bar until every client has written the last one.
+"""
+
+import asyncio
+import time
+from benchmarks.common import FakeWebSocket, synthetic_bars, synthetic_columns
+from src.app.core.metrics import RECEIVED_KEY, metrics
+from src.app.domain.services.strategy_registry import StrategyRegistry
+from src.app.infrastructure.market_data.stream_hub import StreamHub, channel_key
+from src.app.infrastructure.websockets.manager import ConnectionManager
+
+BARS = 5_000
+WARMUP_BARS = 500
+SYMBOL = "BENCH"
+
+
+class _BarSource:
+    """Market data stand-in: history for warmup, then a gated burst of stream bars"""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.go = asyncio.Event()
+
+    def stream_base_seconds(self, symbol: str) -> float:
+        return 60.0
+
+    async def get_history(self, symbol: str, interval: str = "1m", lookback_days: int = 2, columnar: bool = False):
+        columns = synthetic_columns(WARMUP_BARS, seed=7)
+        return {name: values.tolist() for name, values in columns.items()}
+
+    async def start_stream(self, symbol: str):
+        await self.go.wait()
+        timed = metrics.enabled
+        for bar in self.bars:
+            bar = dict(bar)
+            if timed:
+                bar[RECEIVED_KEY] = time.perf_counter_ns()
+            yield bar
+            # Upstream bars arrive one per read; give the writers a turn
+            await asyncio.sleep(0)
+
+
+class IngestToBroadcast:
+    """BARS upstream bars -> raw + 5m channels -> N clients each, with latency metrics off / on"""
+    params = ([1, 100], [False, True])
+    param_names = ["clients", "metrics"]
+    unit = "bars"
+
+    def setup(self, clients, timed):
+        self.items = BARS
+        self.bars = synthetic_bars(BARS, symbol=SYMBOL)
+
+    def time_pipeline(self, clients, timed):
+        enabled = metrics.enabled
+        metrics.enabled = timed
+        loop = asyncio.new_event_loop()
+        try:
+            # Subscribing and warming up are not part of the measurement
+            return loop.run_until_complete(self._run(clients))
+        finally:
+            loop.close()
+            metrics.enabled = enabled
+
+    async def _run(self, clients):
+        source = _BarSource(self.bars)
+        manager = ConnectionManager()
+        hub = StreamHub(market_data=source, manager=manager, registry=StrategyRegistry())
+        sockets = []
+        for interval in (None, "5m"):
+            await hub.subscribe(SYMBOL, interval)
+            await hub.registry.wait_ready((SYMBOL, interval, 10, 1.0, hub.smoothing))
+            key = channel_key(SYMBOL, interval)
+            for _ in range(clients):
+                socket = FakeWebSocket()
+                await manager.connect(socket, key)
+                sockets.append((socket, interval))
+
+        # The raw channel gets exactly one message per bar; 5m partials are conflated
+        # nondeterministically, and the hub serves both channels bar by bar anyway
+        raw = [socket for socket, interval in sockets if interval is None]
+        for socket in raw:
+            socket.expect(BARS)
+        started = time.perf_counter()
+        source.go.set()
+        await asyncio.gather(*(socket.done for socket in raw))
+        elapsed = time.perf_counter() - started
+
+        await hub.shutdown()
+        for socket, interval in sockets:
+            manager.disconnect(socket, channel_key(SYMBOL, interval))
+        return elapsed
@@ -0,0 +1,60 @@
+"""Pre-trade risk per call with 100 / 5000 open symbols: check, pre_trade + on_fill and mark"""
+
+import random
+from src.app.domain.models import Order, OrderIntent
+from src.app.domain.services.risk import RiskEngine, RiskLimits
+
+CALLS = 100_000
+SEED = 1234
+
+
+class RiskChecks:
+    """CALLS single calls against a book where every symbol holds a position and a mark"""
+    params = [100, 5000]
+    param_names = ["symbols"]
+    unit = "calls"
+
+    def setup(self, symbols):
+        self.items = CALLS
+        rng = random.Random(SEED)
+        self.engine = RiskEngine(RiskLimits(
+            max_position=1_000_000_000,
+            max_gross_notional=1e15,
+            max_net_notional=1e15,
+            max_orders_per_second=0,   # the benchmark itself would trip it
+            max_loss=1e15,
+            price_band_pct=50.0,
+        ))
+        names = [f"SYM{i:05d}" for i in range(symbols)]
+        prices = {symbol: 20 + rng.random() * 480 for symbol in names}
+
+        # Every symbol open: the aggregates cover N positions
+        for symbol in names:
+            self.engine.mark(symbol, prices[symbol])
+            order = Order(OrderIntent(symbol, rng.choice(("BUY", "SELL")), rng.randint(1, 500)), "bench", symbol)
+            self.engine.pre_trade(order)
+            self.engine.on_fill(order, order.intent.quantity)
+
+        picks = [rng.choice(names) for _ in range(CALLS)]
+        self.orders = [
+            Order(OrderIntent(symbol, rng.choice(("BUY", "SELL")), rng.randint(1, 100), prices[symbol]), "bench", str(i))
+            for i, symbol in enumerate(picks)
+        ]
+        self.checks = [(order.intent.symbol, self.engine.signed_quantity(order), order.intent.price) for order in self.orders]
+        self.marks = [(symbol, prices[symbol] * (1 + (rng.random() - 0.5) * 0.01)) for symbol in picks]
+
+    def time_check(self, symbols):
+        check = self.engine.check
+        for symbol, qty, price in self.checks:
+            check(symbol, qty, price)
+
+    def time_pre_trade_fill(self, symbols):
+        engine = self.engine
+        for order in self.orders:
+            if engine.pre_trade(order) is None:
+                engine.on_fill(order, order.intent.quantity)
+
+    def time_mark(self, symbols):
+        mark = self.engine.mark
+        for symbol, price in self.marks:
+            mark(symbol, price)
@@ -0,0 +1,80 @@
+"""Watchlist scanner: one minute of bars for 1000 symbols x (1m, 5m, 15m), vectorized grid vs one strategy per cell"""
+
+import numpy as np
+from benchmarks.common import synthetic_columns
+from src.app.domain.services.scanner import UTBotScanner
+from src.app.domain.services.utbot import UTBotStrategy
+from src.app.infrastructure.market_data.normalizer import BarResampler
+
+SYMBOLS = 1000
+TIMEFRAMES = ["1m", "5m", "15m"]
+HISTORY_BARS = 300
+LIVE_MINUTES = 240
+
+
+class _Minutes:
+    """Per-minute bars for every symbol after the history, reused in a loop with advancing timestamps"""
+
+    def setup(self):
+        self.items = SYMBOLS
+        columns = synthetic_columns((HISTORY_BARS + LIVE_MINUTES) * SYMBOLS)
+        # Minute-major: row m holds every symbol's bar for that minute
+        self.open, self.high, self.low, self.close = (
+            columns[name].reshape(-1, SYMBOLS) for name in ("open", "high", "low", "close")
+        )
+        self.start = 1_700_000_040
+        self.history = [
+            {
+                "timestamps": self.start + 60 * np.arange(HISTORY_BARS, dtype=np.int64),
+                **{name: getattr(self, name)[:HISTORY_BARS, s] for name in ("open", "high", "low", "close")},
+                "volume": np.zeros(HISTORY_BARS, dtype=np.int64),
+            }
+            for s in range(SYMBOLS)
+        ]
+        self.minute = HISTORY_BARS
+
+    def _next(self):
+        m = self.minute
+        self.minute += 1
+        row = HISTORY_BARS + (m - HISTORY_BARS) % LIVE_MINUTES
+        return self.start + 60 * m, self.open[row], self.high[row], self.low[row], self.close[row]
+
+
+class ScannerUpdate(_Minutes):
+    """UTBotScanner.update with one completed 1m bar per symbol (3000 cells)"""
+    unit = "symbols"
+
+    def setup(self):
+        super().setup()
+        self.scanner = UTBotScanner(TIMEFRAMES, capacity=SYMBOLS)
+        for s, history in enumerate(self.history):
+            self.scanner.prime_history(f"SYM{s}", history, 60)
+        self.rows = np.arange(SYMBOLS)
+        self.base = np.full(SYMBOLS, 60.0)
+        self.timestamps = np.empty(SYMBOLS)
+
+    def time_update(self):
+        ts, o, h, l, c = self._next()
+        self.timestamps.fill(ts)
+        self.scanner.update(self.rows, self.timestamps, o, h, l, c, self.base)
+
+
+class StrategyLoop(_Minutes):
+    """The same minute through 3000 BarResampler + UTBotStrategy pairs (one per cell)"""
+    unit = "symbols"
+
+    def setup(self):
+        super().setup()
+        self.cells = [
+            [(BarResampler(tf, 0, 60), UTBotStrategy()) for tf in TIMEFRAMES]
+            for _ in range(SYMBOLS)
+        ]
+
+    def time_update(self):
+        ts, o, h, l, c = self._next()
+        for s, (bar_open, bar_high, bar_low, bar_close) in enumerate(zip(o.tolist(), h.tolist(), l.tolist(), c.tolist())):
+            bar = {"timestamp": ts, "open": bar_open, "high": bar_high, "low": bar_low, "close": bar_close}
+            for resampler, strategy in self.cells[s]:
+                for event in resampler.update(bar):
+                    if event["final"]:
+                        strategy.process_bar(event)
@@ -0,0 +1,39 @@
+"""UTBot streaming throughput (live path) and the vectorized batch kernel (warmup / sweeps)"""
+
+import numpy as np
+from benchmarks.common import synthetic_bars, synthetic_columns
+from src.app.domain.services.utbot import SMOOTHING_MODES, UTBotStrategy, run_utbot_batch
+
+BARS = 100_000
+
+
+class UTBotProcessBar:
+    """process_bar over 100k bars, one call per bar"""
+    params = list(SMOOTHING_MODES)
+    param_names = ["smoothing"]
+    unit = "bars"
+
+    def setup(self, smoothing):
+        self.items = BARS
+        self.bars = [{"high": b["high"], "low": b["low"], "close": b["price"]} for b in synthetic_bars(BARS)]
+
+    def time_process_bar(self, smoothing):
+        strategy = UTBotStrategy(atr_period=10, atr_multiplier=1.0, smoothing=smoothing)
+        process = strategy.process_bar
+        for bar in self.bars:
+            process(bar)
+
+
+class UTBotBatch:
+    """run_utbot_batch over 100k bars (what warmup and sweeps use)"""
+    unit = "bars"
+
+    def setup(self):
+        self.items = BARS
+        columns = synthetic_columns(BARS)
+        self.high = np.asarray(columns["high"], dtype=np.float64)
+        self.low = np.asarray(columns["low"], dtype=np.float64)
+        self.close = np.asarray(columns["close"], dtype=np.float64)
+
+    def time_batch(self):
+        run_utbot_batch(self.high, self.low, self.close, 10, 1.0, prime=True)
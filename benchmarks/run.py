@@ -0,0 +1,185 @@
+"""
+Benchmark Runner - times the hot paths offline and stores results as JSON.
+
+Benchmarks follow asv conventions: classes in benchmarks/bench_*.py with
+`time_*` methods, optional `params` / `param_names`, `setup` / `teardown`
+(called with the params). Extras read by this runner:
+  items  - set in setup; work units per call, reported as throughput in `unit`s/s
+  return - a `time_*` method may return the seconds it measured itself,
+           to leave its own setup out of the timing
+
+Usage:
+    python benchmarks/run.py                      # all, saved to benchmarks/results/<commit>.json
+    python benchmarks/run.py -k broadcast --repeat 10
+    python benchmarks/run.py --compare benchmarks/results/<base>.json
+"""
+
+import argparse
+import gc
+import importlib
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+BENCH_DIR = Path(__file__).parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Offline and quiet: never reach Databento / TradeStation, no per-connection logging
+os.environ.setdefault("USE_SIMULATION", "true")
+
+
+def git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return ""
+
+
+def discover(pattern: str):
+    """Yields (name, class, method name, params tuple) for every benchmark matching `pattern`"""
+    regex = re.compile(pattern) if pattern else None
+    for path in sorted(BENCH_DIR.glob("bench_*.py")):
+        module = importlib.import_module(f"benchmarks.{path.stem}")
+        for cls_name, cls in vars(module).items():
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            methods = sorted(m for m in vars(cls) if m.startswith("time_"))
+            params = getattr(cls, "params", None)
+            if params is None:
+                combos = [()]
+            elif params and isinstance(params[0], (list, tuple)):
+                combos = list(itertools.product(*params))
+            else:
+                combos = [(p,) for p in params]
+            for method in methods:
+                for combo in combos:
+                    label = f"({', '.join(map(str, combo))})" if combo else ""
+                    name = f"{path.stem}.{cls_name}.{method}{label}"
+                    if regex is None or regex.search(name):
+                        yield name, cls, method, combo
+
+
+def measure(cls, method: str, combo: tuple, repeat: int, warmup: int):
+    bench = cls()
+    if hasattr(bench, "setup"):
+        bench.setup(*combo)
+    try:
+        fn = getattr(bench, method)
+        samples = []
+        for i in range(warmup + repeat):
+            gc.collect()
+            started = time.perf_counter()
+            measured = fn(*combo)
+            elapsed = measured if isinstance(measured, float) else time.perf_counter() - started
+            if i >= warmup:
+                samples.append(elapsed)
+        items = getattr(bench, "items", None)
+    finally:
+        if hasattr(bench, "teardown"):
+            bench.teardown(*combo)
+
+    median = statistics.median(samples)
+    result = {
+        "unit": getattr(cls, "unit", None),
+        "items": items,
+        "repeat": repeat,
+        "min_s": min(samples),
+        "median_s": median,
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples_s": samples,
+    }
+    if items:
+        result["per_item_ns"] = median / items * 1e9
+        result["items_per_s"] = items / median
+    return result
+
+
+def describe(result) -> str:
+    text = f"median {result['median_s'] * 1000:9.2f}ms  min {result['min_s'] * 1000:9.2f}ms"
+    if result.get("items"):
+        text += f"  {result['items_per_s']:>14,.0f} {result['unit'] or 'items'}/s  ({result['per_item_ns']:,.0f}ns each)"
+    return text
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    """Prints median ratios against `baseline`; returns the number of regressions past `threshold`"""
+    print(f"\nvs {baseline.get('commit', '?')[:10]} ({baseline.get('timestamp', '?')}):")
+    regressions = 0
+    for name, result in current["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            print(f"  {'new':>8}  {name}")
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            flag = "  (faster)"
+        print(f"  {ratio:7.2f}x  {name}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline hot-path benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="Only benchmarks whose name matches this regex")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs first (default: 1)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--no-save", action="store_true", help="Print only")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio counted as a regression (default: 1.2)")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    benchmarks = list(discover(args.pattern))
+    if args.list:
+        for name, *_ in benchmarks:
+            print(name)
+        return
+
+    commit = git("rev-parse", "HEAD")
+    results = {
+        "commit": commit,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": {},
+    }
+    for name, cls, method, combo in benchmarks:
+        result = measure(cls, method, combo, args.repeat, args.warmup)
+        results["benchmarks"][name] = result
+        print(f"{name:<70} {describe(result)}", flush=True)
+
+    if not args.no_save:
+        output = Path(args.output) if args.output else RESULTS_DIR / f"{(commit or 'nogit')[:12]}{'-dirty' if results['dirty'] else ''}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
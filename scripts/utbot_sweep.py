@@ -0,0 +1,98 @@
+"""
+UTBot Parameter Sweep - backtests atr_period x atr_multiplier grids
+over bars already in the local bar store (no Databento calls).
+
+Usage:
+    python scripts/utbot_sweep.py ES.c.0 NQ.c.0 --intervals 1m \
+        --periods 5:50 --multipliers 0.5:4.0:0.25 --days 365 --json results.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.app.domain.services.backtest import SeriesSpec, run_sweep  # noqa: E402
+from src.app.infrastructure.market_data.databento import market_data_client  # noqa: E402
+
+
+def parse_range(text: str, cast):
+    """'10' -> [10], '5,10,14' -> [5, 10, 14], '5:20' -> 5..20, '0.5:2:0.25' -> stepped"""
+    if "," in text:
+        return [cast(x) for x in text.split(",")]
+    if ":" not in text:
+        return [cast(text)]
+    parts = text.split(":")
+    start, stop = cast(parts[0]), cast(parts[1])
+    step = cast(parts[2]) if len(parts) > 2 else cast(1)
+    values = []
+    value = start
+    while value <= stop + 1e-12:
+        values.append(round(value, 10) if cast is float else value)
+        value += step
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UTBot parameter sweep over local bars")
+    parser.add_argument("symbols", nargs="+", help="Symbols, e.g. ES.c.0 TSLA")
+    parser.add_argument("--intervals", default="1m", help="Comma separated intervals (default: 1m)")
+    parser.add_argument("--periods", default="10", help="ATR periods: '10', '5,10,14' or '5:50[:step]'")
+    parser.add_argument("--multipliers", default="1.0", help="ATR multipliers: '1', '0.5,1,2' or '0.5:4:0.25'")
+    parser.add_argument("--days", type=int, default=365, help="Lookback in days (default: 365)")
+    parser.add_argument("--smoothing", default="sma", choices=["sma", "rolling", "rma"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print (default: 20)")
+    parser.add_argument("--json", dest="json_path", help="Write every result to this JSON file")
+    args = parser.parse_args()
+
+    intervals = args.intervals.split(",")
+    periods = parse_range(args.periods, int)
+    multipliers = parse_range(args.multipliers, float)
+    series = [
+        SeriesSpec(symbol, interval, *market_data_client.series_key(symbol, interval))
+        for symbol in args.symbols
+        for interval in intervals
+    ]
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.days)
+
+    print(f"🔬 Sweeping {len(series)} series x {len(periods) * len(multipliers)} combinations...")
+    t0 = time.perf_counter()
+    results = run_sweep(
+        series, periods, multipliers,
+        int(start.timestamp()), int(end.timestamp()),
+        smoothing=args.smoothing,
+        max_workers=args.workers
+    )
+    elapsed = time.perf_counter() - t0
+
+    if not results:
+        print("❌ No bars found in the local bar store for these symbols/intervals.")
+        print("   Load history first (GET /api/v1/market-data/history/{symbol}).")
+        return 1
+
+    results.sort(key=lambda r: r["pnl"], reverse=True)
+    print(f"✅ {len(results)} backtests in {elapsed:.1f}s\n")
+    print(f"{'SYMBOL':<12} {'TF':<4} {'ATR':>4} {'MULT':>6} {'PNL':>12} {'HIT%':>6} {'FLIPS':>7} {'MAX DD':>12}")
+    for r in results[:args.top]:
+        print(
+            f"{r['symbol']:<12} {r['interval']:<4} {r['atr_period']:>4} {r['atr_multiplier']:>6.2f} "
+            f"{r['pnl']:>12.2f} {r['hit_rate'] * 100:>6.1f} {r['flips']:>7} {r['max_drawdown']:>12.2f}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Wrote {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,198 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
+from src.app.core.config import settings
 from src.app.infrastructure.market_data.databento import market_data_client
 from src.app.infrastructure.websockets.manager import ws_manager
-from src.app.domain.services.utbot import UTBotStrategy
+from src.app.infrastructure.websockets.binary_protocol import SUBPROTOCOL, BinaryEncoder, encode_history
+from src.app.infrastructure.market_data.stream_hub import channel_key
+from src.app.infrastructure.market_data.bar_bus import streams
+from src.app.infrastructure.market_data.scanner_feed import SCANNER_CHANNEL, scanner_state
+from src.app.infrastructure.market_data.bar_store import COLUMNS, concat_columns
+from src.app.infrastructure.market_data.history_stream import (
+    MEDIA_TYPES, compress, decode_cursor, encode_body, encode_cursor, etag_matches, history_etag, negotiate_encoding
+)
 
 router = APIRouter()
+logger = logging.getLogger("market_data_api")
+
+# Native Databento intervals (1s/1m/1h/1d) plus anything resampled from them (5m, 15m, 4h...)
+INTERVAL_PATTERN = r"^\d+[smhd]$"
 
 @router.get("/history/{symbol}")
 async def get_market_history(
+    request: Request,
     symbol: str,
-    interval: str = Query(default="1m", pattern="^(1s|1m|1h|1d)$", description="OHLCV interval")
-) -> List[dict]:
+    interval: str = Query(default="1m", pattern=INTERVAL_PATTERN, description="OHLCV interval"),
+    format: str = Query(default="rows", pattern="^(rows|ndjson|arrow|columns|binary)$", description="Payload shape"),
+    start: Optional[int] = Query(default=None, ge=0, description="Range start, epoch seconds (inclusive)"),
+    end: Optional[int] = Query(default=None, ge=0, description="Range end, epoch seconds (exclusive)"),
+    limit: Optional[int] = Query(default=None, ge=1, le=settings.HISTORY_MAX_LIMIT, description="Newest N bars of the range"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page")
+) -> Response:
     """
-    Returns historical OHLCV bars for the chart.
-    
+    Returns historical OHLCV bars for the chart, streamed chunk by chunk.
+
     Args:
         symbol: Trading symbol (e.g., 'TSLA', 'ES.c.0')
-        interval: Timeframe - '1s', '1m', '1h', '1d' (default: 1m)
+        interval: Timeframe - '1s', '1m', '1h', '1d' (default: 1m), or resampled e.g. '5m', '15m', '4h'
+        format: 'rows' (JSON list of bars, default), 'ndjson' (one bar per line), 'arrow' (Arrow IPC
+                stream), 'columns' ({timestamps: [...], open: [...], ...}) or 'binary' (delta-encoded
+                frames, see binary_protocol.py). 'columns' and 'binary' are built whole before sending.
+        start / end: [start, end) in epoch seconds; default the latest two days
+        limit: only the newest `limit` bars of the range (a page); X-Next-Cursor points at the one before
+        cursor: continue paging back from a previous response
     """
-    return await market_data_client.get_history(symbol, interval=interval)
+    if cursor is not None:
+        try:
+            end = decode_cursor(cursor, interval)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # A page without a start looks back far enough to cross weekends and holidays
+    lookback = settings.HISTORY_PAGE_SCAN_DAYS * 86400 if limit is not None else None
+    try:
+        rng = market_data_client.history_range(symbol, interval, start, end, lookback)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if rng.simulated:
+        headers["Cache-Control"] = "no-store"
+    else:
+        # Keyed on the resolved range: a pinned past range never changes, the rolling one moves each minute
+        headers["ETag"] = history_etag(rng.dataset, symbol, interval, rng.start, rng.end, limit, format)
+        if rng.fixed:
+            headers["Cache-Control"] = f"public, max-age={settings.HISTORY_CACHE_MAX_AGE}, immutable"
+        else:
+            headers["Cache-Control"] = f"public, max-age={settings.HISTORY_CACHE_LATEST_MAX_AGE}"
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    # Load the first chunk (or the page) before answering, so a failed fetch still gets a status
+    dataset = rng.dataset
+    try:
+        if limit is not None:
+            page = await market_data_client.history_page(rng, limit)
+            ts = page["timestamps"]
+            if len(ts) == limit:
+                next_end = int(ts[0])
+            else:
+                next_end = rng.start if len(ts) else None
+            chunks = _chunks(page)
+        else:
+            chunks = market_data_client.iter_history(rng)
+            chunks = _chunks(await anext(chunks, None), chunks)
+            next_end = rng.start
+    except Exception as e:
+        logger.error(f"❌ History for {symbol}@{interval} failed ({e}). Falling back to MOCK.")
+        dataset, next_end = "SIMULATION", None
+        chunks = _chunks(market_data_client.replay.synthetic_history(symbol, rng.seconds, 100))
+        headers.pop("ETag", None)
+        headers["Cache-Control"] = "no-store"
+
+    if next_end is not None:
+        headers["X-Next-Cursor"] = encode_cursor(interval, next_end)
+
+    if format in ("columns", "binary"):
+        columns = concat_columns([c async for c in chunks])
+        if format == "columns":
+            payload = {"symbol": symbol, "dataset": dataset, **{name: columns[name].tolist() for name in COLUMNS}}
+            body = _once(json.dumps(payload, separators=(",", ":")).encode())
+            media_type = "application/json"
+        else:
+            body = _once(encode_history(columns, symbol, dataset, interval))
+            media_type = "application/octet-stream"
+    else:
+        body = encode_body(format, chunks, symbol, dataset)
+        media_type = MEDIA_TYPES[format]
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress(body, encoding), media_type=media_type, headers=headers)
+
+
+async def _chunks(first, rest=None):
+    if first is not None and len(first["timestamps"]):
+        yield first
+    if rest is not None:
+        async for columns in rest:
+            yield columns
+
+
+async def _once(data: bytes):
+    yield data
+
+@router.get("/stream/clients")
+async def get_stream_clients() -> List[dict]:
+    """Per-client WebSocket delivery stats: queue depth, conflated/dropped messages, lag"""
+    return ws_manager.stats()
+
+@router.get("/scanner")
+async def get_scanner_state() -> dict:
+    """Watchlist scanner grid (position/stop per symbol x timeframe) and update timings"""
+    snapshot, stats = await scanner_state("snapshot"), await scanner_state("stats")
+    if snapshot is None or stats is None:
+        raise HTTPException(status_code=503, detail="Scanner not enabled on this server")
+    return {**snapshot, "stats": stats}
+
+@router.websocket("/ws/scanner")
+async def scanner_websocket(websocket: WebSocket):
+    """
+    UTBot position flips across the whole SCANNER_SYMBOLS x SCANNER_TIMEFRAMES grid.
+    Sends the current grid first, then {"type": "flips", "flips": [...]} per bar batch.
+    """
+    await ws_manager.connect(websocket, SCANNER_CHANNEL)
+    # Joined before the snapshot is taken, so no flip falls in between
+    snapshot = await scanner_state("snapshot")
+    if snapshot is None:
+        # Off, or behind a bar bus, off in (or no answer from) the ingest process
+        ws_manager.disconnect(websocket, SCANNER_CHANNEL)
+        await websocket.close(code=1013, reason="Scanner not enabled on this server")
+        return
+    try:
+        ws_manager.send(websocket, snapshot)
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ws_manager.disconnect(websocket, SCANNER_CHANNEL)
 
 @router.websocket("/ws/{symbol}")
-async def websocket_endpoint(websocket: WebSocket, symbol: str):
-    await ws_manager.connect(websocket, symbol)
-    
-    # 1. Initialize Strategy
-    strategy = UTBotStrategy(atr_period=10, atr_multiplier=1.0)
-    
-    # 2. WARMUP: Fetch history to prime the ATR calculation
-    # We do NOT send this to the websocket (frontend fetches it via REST)
-    # We only feed it to the brain.
-    print(f"DEBUG: Warming up strategy for {symbol}...")
-    history = await market_data_client.get_history(symbol)
-    for bar in history:
-        strategy.process_bar(bar)
-    
-    print(f"DEBUG: Strategy Warmed Up. Current State: {strategy.position} @ {strategy.stop_val}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    symbol: str,
+    interval: Optional[str] = Query(default=None, pattern=INTERVAL_PATTERN, description="Resampled timeframe, e.g. 5m"),
+    atr_period: int = Query(default=10, ge=1, le=500, description="UTBot ATR period"),
+    atr_multiplier: float = Query(default=1.0, gt=0, le=100, description="UTBot ATR multiplier"),
+    encoding: str = Query(default="json", pattern="^(json|binary)$", description="Wire format")
+):
+    channel = channel_key(symbol, interval, atr_period, atr_multiplier)
+
+    # Binary frames are opt-in: ?encoding=binary or the utbot.binary.v1 subprotocol
+    subprotocol = SUBPROTOCOL if SUBPROTOCOL in websocket.scope.get("subprotocols", []) else None
+    encoder = BinaryEncoder(symbol, interval) if encoding == "binary" or subprotocol else None
+    await ws_manager.connect(websocket, channel, encoder=encoder, subprotocol=subprotocol)
+
+    # The hub runs ONE upstream stream per symbol (+ one shared strategy per timeframe/params)
+    # and broadcasts every bar to all sockets on it. We only hold a reference while connected.
+    await streams.subscribe(symbol, interval, atr_period, atr_multiplier)
 
     try:
-        # 3. Start Live Loop
-        async for bar in market_data_client.start_stream(symbol):
-            # Feed Live Data
-            ohlc_bar = {
-                'close': bar['price'],
-                'high': bar['high'], 
-                'low': bar['low'],
-                'open': bar['open'],
-                'volume': 100
-            }
-            
-            signal = strategy.process_bar(ohlc_bar)
-            
-            bar['ut_action'] = signal.action 
-            bar['ut_stop'] = signal.stop_price
-            bar['ut_position'] = strategy.position
-            
-            await ws_manager.broadcast(symbol, bar)
-            
+        # Late joiners get the current position/stop right away instead of waiting for the next bar
+        snapshot = await streams.snapshot(symbol, interval, atr_period, atr_multiplier)
+        if snapshot is not None:
+            ws_manager.send(websocket, snapshot)
+
+        # Keep the socket open until the client goes away
+        while True:
+            await websocket.receive_text()
+
     except WebSocketDisconnect:
-        ws_manager.disconnect(websocket, symbol)
\ No newline at end of file
+        pass
+    finally:
+        ws_manager.disconnect(websocket, channel)
+        await streams.unsubscribe(symbol, interval, atr_period, atr_multiplier)
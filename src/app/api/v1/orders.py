@@ -0,0 +1,110 @@
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from src.app.domain.schemas import OrderRequest
+from src.app.domain.services.order_service import OrderServiceError, order_service
+
+router = APIRouter()
+
+
+def _intent(request: OrderRequest, idempotency_key: Optional[str] = None) -> dict:
+    return {
+        "symbol": request.symbol,
+        "action": request.action,
+        "quantity": request.quantity,
+        "price": request.price,
+        "account_id": request.account_id,
+        "idempotency_key": request.idempotency_key or idempotency_key,
+        "signal_ts": request.signal_ts,
+    }
+
+
+async def _call(call):
+    """Awaits an order service call, answering its failures with their HTTP status"""
+    try:
+        return await call
+    except OrderServiceError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+
+@router.post("", status_code=202)
+async def submit_order(
+    request: OrderRequest,
+    response: Response,
+    wait: bool = Query(default=False, description="Hold the response until the broker acks (or rejects)"),
+    timeout: float = Query(default=10.0, gt=0, le=60),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """
+    Queues an order and returns immediately (202) with its client_order_id.
+    Re-sending the same idempotency key (body field or Idempotency-Key header)
+    returns the original order with 200 instead of placing a new one.
+    """
+    result = await _call(order_service.submit(_intent(request, idempotency_key), wait, timeout))
+    if not result["created"] or (wait and result["done"]):
+        response.status_code = 200
+    return result["order"]
+
+
+@router.post("/batch", status_code=202)
+async def submit_orders(requests: List[OrderRequest]) -> List[dict]:
+    """
+    Queues many orders at once; they are dispatched concurrently. All or nothing:
+    if the queue can't take the whole batch, none of it is queued (503).
+    """
+    return await _call(order_service.submit_batch([_intent(request) for request in requests]))
+
+
+@router.get("")
+async def list_orders(
+    symbol: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000)
+) -> List[dict]:
+    """Most recent orders first"""
+    return await _call(order_service.orders(symbol, status, limit))
+
+
+@router.get("/latency")
+async def order_latency():
+    """Per-stage latency percentiles (ms): signal -> queue -> risk -> send -> ack -> fill"""
+    return await _call(order_service.latency())
+
+
+@router.get("/risk")
+async def risk_state():
+    """Positions, notional/PnL aggregates, limits and kill switch state"""
+    return await _call(order_service.risk())
+
+
+@router.post("/risk/kill")
+async def risk_kill(reason: str = Query(default="manual")):
+    """Global kill switch: every new order is rejected until /risk/resume"""
+    return await _call(order_service.kill(reason))
+
+
+@router.post("/risk/resume")
+async def risk_resume():
+    return await _call(order_service.resume())
+
+
+@router.get("/{order_id}")
+async def get_order(order_id: str):
+    return await _call(order_service.get(order_id))
+
+
+@router.post("/{order_id}/cancel")
+async def cancel_order(order_id: str):
+    """Cancels what is left of a working order; the outcome arrives as the order's broker_status"""
+    return await _call(order_service.cancel(order_id))
+
+
+@router.post("/{order_id}/replace")
+async def replace_order(
+    order_id: str,
+    quantity: Optional[int] = Query(default=None, ge=1),
+    limit_price: Optional[float] = Query(default=None, gt=0)
+):
+    """Changes a working order's quantity and/or limit price"""
+    if quantity is None and limit_price is None:
+        raise HTTPException(status_code=400, detail="Nothing to replace: give quantity and/or limit_price")
+    return await _call(order_service.replace(order_id, quantity, limit_price))
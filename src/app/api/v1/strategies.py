@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from functools import partial
+from typing import List
+from fastapi import APIRouter, HTTPException
+from src.app.domain.schemas import SweepRequest
+from src.app.domain.services.backtest import SeriesSpec, run_sweep
+from src.app.infrastructure.market_data.databento import market_data_client
+
+router = APIRouter()
+
+
+@router.post("/utbot/sweep")
+async def utbot_sweep(request: SweepRequest) -> List[dict]:
+    """
+    Backtests every atr_period x atr_multiplier combination for each
+    symbol/interval over bars in the local bar store.
+
+    Returns PnL, hit rate, flip count and max drawdown per combination,
+    best PnL first.
+    """
+    invalid = [i for i in request.intervals if i not in market_data_client.INTERVAL_MAP]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Unsupported intervals: {invalid}")
+
+    series = [
+        SeriesSpec(symbol, interval, *market_data_client.series_key(symbol, interval))
+        for symbol in request.symbols
+        for interval in request.intervals
+    ]
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=request.lookback_days)
+
+    # The sweep blocks on a process pool; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(None, partial(
+        run_sweep,
+        series,
+        request.atr_periods,
+        request.atr_multipliers,
+        int(start.timestamp()),
+        int(end.timestamp()),
+        smoothing=request.smoothing
+    ))
+    results.sort(key=lambda r: r["pnl"], reverse=True)
+    return results[:request.top]
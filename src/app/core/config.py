@@ -17,6 +17,151 @@ class Settings(BaseSettings):
 
     USE_SIMULATION: bool = True
     TRADESTATION_ACCOUNT_ID: str = "SIM_123456" # must provide this for Real execution
+    TRADESTATION_TOKEN_URL: str = "https://signin.tradestation.com/oauth/token"
+
+    # Broker HTTP client: pooled keep-alive connections, opened at startup and pinged when idle.
+    # Access tokens are refreshed this many seconds before they expire.
+    BROKER_MAX_CONNECTIONS: int = 20
+    BROKER_PREWARM_CONNECTIONS: int = 2
+    BROKER_KEEPALIVE_SECONDS: float = 30.0
+    BROKER_TIMEOUT_SECONDS: float = 10.0
+    TOKEN_REFRESH_MARGIN_SECONDS: float = 120.0
+
+    # Order execution: "tradestation", "sterling" or "fake" (in-process fills, for paper runs and tests).
+    # Order status comes off one streaming connection per broker, reconnected after
+    # BROKER_STREAM_RETRY_SECONDS (doubling up to 30s) and dropped as dead after
+    # BROKER_STREAM_IDLE_SECONDS without data (TradeStation heartbeats every few seconds).
+    BROKER: str = "tradestation"
+    BROKER_STREAM_RETRY_SECONDS: float = 1.0
+    BROKER_STREAM_IDLE_SECONDS: float = 30.0
+    # Delay before the fake broker fills market orders
+    FAKE_BROKER_FILL_DELAY_MS: float = 0.0
+
+    # Sterling: order gateway (REST for orders, NDJSON stream for execution reports), account and route
+    STERLING_GATEWAY_URL: str = "http://127.0.0.1:8800"
+    STERLING_API_KEY: str = "unset"
+    STERLING_ACCOUNT: str = "unset"
+    STERLING_ROUTE: str = ""
+
+    # Local OHLCV bar store (Parquet, one segment per symbol/day)
+    BAR_STORE_ENABLED: bool = True
+    BAR_STORE_DIR: str = str(PROJECT_DIR / "data" / "bars")
+    BAR_STORE_MAX_BYTES: int = 2 * 1024 ** 3
+    BAR_STORE_MAX_AGE_DAYS: float = 30.0
+    BAR_STORE_SWEEP_SECONDS: float = 3600.0
+
+    # Threads for blocking historical fetches / decode (bounded so bursts queue instead of piling up)
+    HISTORY_FETCH_WORKERS: int = 4
+
+    # /history ranges: loaded and streamed HISTORY_CHUNK_BARS bars at a time. A page (limit=N) is looked for
+    # at most HISTORY_PAGE_SCAN_DAYS back; ranges are capped at HISTORY_MAX_RANGE_DAYS and pages at
+    # HISTORY_MAX_LIMIT bars. Ranges with a fixed end in the past are cached HISTORY_CACHE_MAX_AGE seconds
+    # by browsers/proxies, the rolling latest window HISTORY_CACHE_LATEST_MAX_AGE.
+    HISTORY_CHUNK_BARS: int = 5000
+    HISTORY_PAGE_SCAN_DAYS: float = 7.0
+    HISTORY_MAX_RANGE_DAYS: float = 366.0
+    HISTORY_MAX_LIMIT: int = 50_000
+    HISTORY_CACHE_MAX_AGE: int = 86400
+    HISTORY_CACHE_LATEST_MAX_AGE: int = 30
+
+    # Resampled bars (5m, 4h, 1d...) are aligned to this many seconds after 00:00 UTC (session open)
+    SESSION_ORIGIN_SECONDS: int = 0
+
+    # UTBot parameter sweeps (0 = one worker process per CPU), and the largest grid one request may ask for
+    SWEEP_MAX_WORKERS: int = 0
+    SWEEP_MAX_COMBINATIONS: int = 10_000
+
+    # Databento live: symbols per subscription request, buffered bars per symbol channel. A dropped
+    # session reconnects after LIVE_RECONNECT_SECONDS (doubling up to 30s) and resubscribes its symbols.
+    LIVE_SUBSCRIBE_BATCH_SIZE: int = 500
+    LIVE_CHANNEL_SIZE: int = 1024
+    LIVE_RECONNECT_SECONDS: float = 1.0
+
+    # Live stream source: "ohlcv-1m", or "trades" / "mbp-1" to build bars in-process
+    # every TICK_BAR_SECONDS (sub-second allowed), with partial updates capped at TICK_PARTIAL_RATE_HZ
+    STREAM_SCHEMA: str = "ohlcv-1m"
+    TICK_BAR_SECONDS: float = 1.0
+    TICK_PARTIAL_RATE_HZ: float = 4.0
+
+    # Simulation replay: recordings (<symbol>.parquet / <symbol>[.<schema>].dbn[.zst]) are read from
+    # REPLAY_DIR, then the bar store. Speed 1 = real time, N = N x, 0 = as fast as possible.
+    # The first REPLAY_WARMUP_BARS bars serve history; the seed drives the synthetic fallback.
+    REPLAY_DIR: str = str(PROJECT_DIR / "data" / "replay")
+    REPLAY_SPEED: float = 1.0
+    REPLAY_SEED: int = 0
+    REPLAY_WARMUP_BARS: int = 500
+
+    # WebSocket fan-out: outbound messages buffered per client, and how far behind (seconds)
+    # a client may fall before it is disconnected (0 = never)
+    WS_CLIENT_QUEUE_SIZE: int = 256
+    WS_MAX_CLIENT_LAG_SECONDS: float = 10.0
+
+    # ATR smoothing of every live UTBot (WebSocket channels, pre-warm, scanner): "sma" re-sums the
+    # ATR window each bar (bit-exact with the original), "rolling" is the same SMA from a running
+    # sum in O(1), "rma" is Wilder's smoothing in O(1). Use an O(1) mode for long periods on 1s bars.
+    UTBOT_SMOOTHING: str = "sma"
+
+    # Live strategy state checkpoints (empty = disabled) and how often to write them
+    STRATEGY_CHECKPOINT_DIR: str = ""
+    STRATEGY_CHECKPOINT_INTERVAL: float = 60.0
+
+    # Order pipeline: concurrent dispatch workers, max queued intents, per-account
+    # send rate (orders/second, with bursts of ORDER_RATE_BURST) and finished orders kept
+    # in memory (working ones are always kept)
+    ORDER_WORKERS: int = 16
+    ORDER_QUEUE_SIZE: int = 10_000
+    ORDER_RATE_PER_SECOND: float = 20.0
+    ORDER_RATE_BURST: int = 40
+    ORDER_HISTORY_SIZE: int = 10_000
+
+    # Pre-trade risk (0 = limit off): shares per symbol, gross/net notional, orders per second,
+    # loss (realized + unrealized) that blocks new exposure, fat-finger band in % from the last bar
+    RISK_MAX_POSITION: int = 0
+    RISK_MAX_GROSS_NOTIONAL: float = 0.0
+    RISK_MAX_NET_NOTIONAL: float = 0.0
+    RISK_MAX_ORDERS_PER_SECOND: int = 50
+    RISK_MAX_LOSS: float = 0.0
+    RISK_PRICE_BAND_PCT: float = 5.0
+
+    # Order journal: append-only log of intents, risk decisions, sends and acks in memory-mapped
+    # segments under JOURNAL_DIR (empty = off), replayed on startup to rebuild orders and positions.
+    # Appends are safe across process crashes at once; flushes to disk are grouped every
+    # JOURNAL_COMMIT_INTERVAL_MS. JOURNAL_SYNC_BEFORE_SEND also waits for the disk before each send.
+    JOURNAL_DIR: str = str(PROJECT_DIR / "data" / "journal")
+    JOURNAL_SEGMENT_BYTES: int = 64 * 1024 ** 2
+    JOURNAL_COMMIT_INTERVAL_MS: float = 2.0
+    JOURNAL_SYNC_BEFORE_SEND: bool = False
+    # One process owns JOURNAL_DIR (flock). On startup the replayed journal is compacted into a snapshot
+    # (orders still in memory + positions), so the next replay only covers what came after it.
+    JOURNAL_COMPACT_ON_START: bool = True
+
+    # Per-stage latency histograms for the live bar path (served on /metrics)
+    METRICS_ENABLED: bool = True
+
+    # Startup pre-warm: history + strategy state for these symbols (comma separated) is loaded in
+    # parallel before /ready reports ready; WARMUP_INTERVALS adds resampled views (e.g. "5m,15m")
+    # next to the raw stream. Readiness is reported anyway after WARMUP_TIMEOUT_SECONDS.
+    WARMUP_SYMBOLS: str = ""
+    WARMUP_INTERVALS: str = ""
+    WARMUP_TIMEOUT_SECONDS: float = 60.0
+
+    # Watchlist scanner (empty = off): UTBot for every SCANNER_SYMBOLS (comma separated) x SCANNER_TIMEFRAMES
+    # kept as one NumPy grid, warmed from 1m history and advanced on completed live bars. Bars are
+    # batched for SCANNER_BATCH_MS; position flips are pushed on /ws/scanner. At most
+    # SCANNER_WARMUP_CONCURRENCY symbols subscribe and load history at once.
+    SCANNER_SYMBOLS: str = ""
+    SCANNER_TIMEFRAMES: str = "1m,5m,15m"
+    SCANNER_BATCH_MS: float = 5.0
+    SCANNER_WARMUP_CONCURRENCY: int = 16
+
+    # Multi-worker deployments: with STREAM_BUS set to a Unix socket path, web workers take bars and
+    # UTBot state from one ingest process (python -m src.app.ingest) instead of each opening its own
+    # upstream sessions. Frames for a worker more than STREAM_BUS_MAX_BUFFER_BYTES behind are dropped.
+    # Orders and risk run in the ingest process too; workers' order calls give up after
+    # STREAM_BUS_CALL_TIMEOUT_SECONDS (plus the wait asked for by ?wait=true).
+    STREAM_BUS: str = ""
+    STREAM_BUS_MAX_BUFFER_BYTES: int = 8 * 1024 ** 2
+    STREAM_BUS_CALL_TIMEOUT_SECONDS: float = 30.0
 
     model_config = SettingsConfigDict(
         env_file=str(ENV_PATH),
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI
+from src.app.core.config import settings
+from src.app.core.metrics import metrics
+from src.app.infrastructure.brokers.factory import broker_client
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.bar_bus import BarBusClient, streams
+from src.app.infrastructure.market_data.scanner_feed import scanner_feed
+from src.app.infrastructure.market_data.stream_hub import StreamHub
+from src.app.domain.services.order_pipeline import order_pipeline
+from src.app.domain.services.order_service import OrderService, order_service
+from src.app.domain.services.strategy_registry import strategy_registry
+
+logger = logging.getLogger("lifespan")
+
+
+def _csv(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+async def prewarm_hot_symbols(hub: StreamHub):
+    """Pre-warms WARMUP_SYMBOLS x WARMUP_INTERVALS on `hub`, giving up waiting after WARMUP_TIMEOUT_SECONDS"""
+    symbols = _csv(settings.WARMUP_SYMBOLS)
+    if not symbols:
+        return
+    intervals = [None] + _csv(settings.WARMUP_INTERVALS)
+    logger.info(f"🔥 Pre-warming {len(symbols)} symbols x {len(intervals)} views")
+    try:
+        await asyncio.wait_for(hub.prewarm(symbols, intervals), settings.WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ Pre-warm still running after {settings.WARMUP_TIMEOUT_SECONDS}s; reporting ready anyway")
+
+
+async def _warm_up(app: FastAPI):
+    """
+    Everything slow about starting up, off the startup path: SDK imports and
+    clients, broker token + connection pre-warm, and history / strategy state
+    for WARMUP_SYMBOLS (the broker and warmup run in the ingest process instead,
+    behind a bar bus).
+    The watchlist scanner starts here too and keeps warming after ready.
+    The app serves (and /health answers) meanwhile; /ready flips once this is done.
+    """
+    started = time.perf_counter()
+    steps = [market_data_client.start()]
+    if isinstance(order_service, OrderService):
+        steps.append(broker_client.start())
+    results = await asyncio.gather(*steps, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"❌ Startup step failed: {result}")
+    if isinstance(streams, StreamHub):
+        await scanner_feed.start()
+        await prewarm_hot_symbols(streams)
+
+    app.state.ready = True
+    logger.info(f"✅ Ready in {time.perf_counter() - started:.2f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    App startup / shutdown.
+    Owns the long-lived background machinery (upstream market data streams,
+    strategy state checkpoints, the pooled broker connection, order workers).
+    Only the cheap parts run before the app accepts connections; the rest is
+    `_warm_up`, in the background. With STREAM_BUS set, streams, strategy
+    state, orders and risk live in the ingest process and this worker only
+    connects to it.
+    """
+    logger.info("🚀 Application starting up")
+    app.state.ready = False
+    if isinstance(order_service, OrderService):
+        await order_pipeline.start()
+        if isinstance(streams, StreamHub):
+            # Paper / fake brokers fill resting limit orders off live bars
+            streams.listeners.append(broker_client.on_bar)
+    if isinstance(streams, BarBusClient):
+        await streams.start()
+    warmup = asyncio.create_task(_warm_up(app), name="startup-warmup")
+    folder = asyncio.create_task(metrics.run(), name="metrics-fold") if metrics.enabled else None
+    checkpoints = None
+    if strategy_registry.checkpoint_dir is not None and isinstance(streams, StreamHub):
+        logger.info(f"💾 Checkpointing strategy state to {strategy_registry.checkpoint_dir}")
+        checkpoints = asyncio.create_task(
+            strategy_registry.run_checkpoints(settings.STRATEGY_CHECKPOINT_INTERVAL),
+            name="strategy-checkpoints"
+        )
+    yield
+    logger.info("🛑 Application shutting down. Stopping market data streams...")
+    for task in (warmup, checkpoints, folder):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await scanner_feed.stop()
+    strategy_registry.checkpoint_all()
+    await streams.shutdown()
+    await market_data_client.close_live()
+    market_data_client.close()
+    await order_pipeline.stop()
+    await broker_client.close()
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from src.app.core.config import settings
+
+# Stream bars carry their receive time (perf_counter_ns) under this key until the hub takes it off
+RECEIVED_KEY = "_recv_ns"
+
+# Per-bar stages, in pipeline order
+STAGES = (
+    "upstream",     # Databento ts_event (bar close for OHLCV) -> our receive, wall clock
+    "normalize",    # record -> stream bar(s)
+    "queue",        # session channel -> stream hub
+    "strategy",     # UTBot update for one channel
+    "serialize",    # JSON / binary encode
+    "send",         # enqueued for a client -> written to its socket
+    "end_to_end",   # receive -> written to a client socket
+)
+
+# Log-linear (HDR-style) buckets: 2^_SUB_BITS linear sub-buckets per power of two,
+# i.e. ~3% relative precision from 1ns up to 2^(_SUB_BITS + _MAX_SHIFT) ns (~9 hours)
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS
+_HALF = _SUB >> 1
+_MAX_SHIFT = 40
+_MAX_VALUE = (1 << (_SUB_BITS + _MAX_SHIFT)) - 1
+BUCKETS = _SUB + _MAX_SHIFT * _HALF
+
+
+
+def _bucket_bounds():
+    index = np.arange(BUCKETS, dtype=np.int64)
+    shift = np.where(index < _SUB, 0, (index - _SUB) // _HALF + 1)
+    mantissa = np.where(index < _SUB, index, (index - _SUB) % _HALF + _HALF)
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+_LOWER, _UPPER = _bucket_bounds()
+
+
+def bucket_indices(values: np.ndarray) -> np.ndarray:
+    values = np.clip(values, 0, _MAX_VALUE).astype(np.int64)
+    # frexp's exponent is the bit length for positive integers below 2^53
+    shift = np.maximum(np.frexp(values.astype(np.float64))[1] - _SUB_BITS, 0)
+    return np.where(shift == 0, values, _SUB + (shift - 1) * _HALF + (values >> shift) - _HALF)
+
+
+class LatencyHistogram:
+    """
+    Latency distribution in nanoseconds.
+
+    `record` is a bare list append (bound once, ~30ns). Raw samples are
+    bucketed in vectorized batches by `fold`, which the Metrics folder task
+    runs every second and every read runs first. Percentiles are exact to
+    the bucket width (~3%).
+    """
+    __slots__ = ("counts", "pending", "record", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = np.zeros(BUCKETS, dtype=np.int64)
+        self.pending: List[int] = []
+        self.record = self.pending.append
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def fold(self):
+        if not self.pending:
+            return
+        # Wall-clock stages can come out slightly negative under clock skew
+        values = np.maximum(np.asarray(self.pending, dtype=np.int64), 0)
+        self.pending.clear()
+        self.counts += np.bincount(bucket_indices(values), minlength=BUCKETS)
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.count == 0 else min(self.min, low)
+        self.max = max(self.max, high)
+        self.count += len(values)
+        self.total += int(values.sum())
+
+    def percentiles(self, quantiles) -> List[float]:
+        """Values (ns) at each quantile in [0, 1], taken at bucket midpoints"""
+        self.fold()
+        if self.count == 0:
+            return [0.0 for _ in quantiles]
+        cumulative = np.cumsum(self.counts)
+        ranks = np.ceil(np.asarray(quantiles) * self.count).clip(1, self.count)
+        index = np.searchsorted(cumulative, ranks)
+        values = (_LOWER[index] + _UPPER[index] - 1) / 2
+        return [float(min(max(v, self.min), self.max)) for v in values]
+
+    def summary(self) -> Dict[str, float]:
+        """count plus min/mean/p50/p90/p99/p99.9/max in microseconds"""
+        p50, p90, p99, p999 = self.percentiles((0.5, 0.9, 0.99, 0.999))
+        us = 1000.0
+        return {
+            "count": self.count,
+            "min_us": round(self.min / us, 2),
+            "mean_us": round(self.total / self.count / us, 2) if self.count else 0.0,
+            "p50_us": round(p50 / us, 2),
+            "p90_us": round(p90 / us, 2),
+            "p99_us": round(p99 / us, 2),
+            "p999_us": round(p999 / us, 2),
+            "max_us": round(self.max / us, 2),
+        }
+
+
+class SymbolStages:
+    """One histogram per stage for a symbol; call sites hold on to this to skip lookups"""
+    __slots__ = STAGES
+
+    def __init__(self):
+        for stage in STAGES:
+            setattr(self, stage, LatencyHistogram())
+
+    def items(self):
+        return ((stage, getattr(self, stage)) for stage in STAGES)
+
+
+class Metrics:
+    """
+    Per-symbol, per-stage latency histograms for the live bar path.
+    Call sites check `enabled` before reading any clock.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._symbols: Dict[str, SymbolStages] = {}
+        # perf_counter_ns + offset ~= time_ns, so wall-clock stages need no extra clock read
+        self.wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def stages(self, symbol: str) -> SymbolStages:
+        stages = self._symbols.get(symbol)
+        if stages is None:
+            stages = self._symbols[symbol] = SymbolStages()
+        return stages
+
+    def snapshot(self, symbol: Optional[str] = None) -> Dict[str, Dict[str, Dict]]:
+        """{symbol: {stage: summary}} for stages that have samples"""
+        out = {}
+        for name, stages in self._symbols.items():
+            if symbol is not None and name != symbol:
+                continue
+            summaries = {}
+            for stage, histogram in stages.items():
+                histogram.fold()
+                if histogram.count:
+                    summaries[stage] = histogram.summary()
+            if summaries:
+                out[name] = summaries
+        return out
+
+    def fold(self):
+        for stages in self._symbols.values():
+            for _, histogram in stages.items():
+                histogram.fold()
+
+    async def run(self, interval: float = 1.0):
+        """Folds buffered samples into buckets so buffers stay small between reads"""
+        while True:
+            await asyncio.sleep(interval)
+            self.fold()
+
+    def reset(self):
+        self._symbols.clear()
+        self.started = time.time()
+
+
+def to_prometheus(latency: Dict[str, Dict[str, Dict]], gauges: Dict[str, float]) -> str:
+    """Text exposition format: a summary per symbol/stage plus flat gauges"""
+    lines = [
+        "# HELP utbot_stage_latency_microseconds Per-stage latency of the live bar path",
+        "# TYPE utbot_stage_latency_microseconds summary",
+    ]
+    quantiles = (("0.5", "p50_us"), ("0.9", "p90_us"), ("0.99", "p99_us"), ("0.999", "p999_us"))
+    for symbol, stages in latency.items():
+        for stage, summary in stages.items():
+            labels = f'symbol="{symbol}",stage="{stage}"'
+            for quantile, field in quantiles:
+                lines.append(f'utbot_stage_latency_microseconds{{{labels},quantile="{quantile}"}} {summary[field]}')
+            lines.append(f"utbot_stage_latency_microseconds_sum{{{labels}}} {round(summary['mean_us'] * summary['count'], 2)}")
+            lines.append(f"utbot_stage_latency_microseconds_count{{{labels}}} {summary['count']}")
+    for name, value in gauges.items():
+        lines.append(f"# TYPE utbot_{name} gauge")
+        lines.append(f"utbot_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def symbol_of(channel: str) -> str:
+    """'TSLA@5m#14x2.5' -> 'TSLA'"""
+    return channel.split("@", 1)[0].split("#", 1)[0]
+
+
+# Global Instance
+metrics = Metrics(enabled=settings.METRICS_ENABLED)
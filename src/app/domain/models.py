@@ -0,0 +1,89 @@
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional
+
+# Order lifecycle
+ORDER_QUEUED = "queued"
+ORDER_REJECTED = "rejected"    # failed pre-trade risk
+ORDER_SENT = "sent"
+ORDER_ACKED = "acked"          # broker accepted (or paper-filled) the order
+ORDER_FAILED = "failed"        # broker refused it or the request errored
+ORDER_UNKNOWN = "unknown"      # sent, but the answer was lost (timeout, restart); shares stay reserved until the broker reports on it
+
+TERMINAL_STATUSES = (ORDER_REJECTED, ORDER_ACKED, ORDER_FAILED, ORDER_UNKNOWN)
+
+
+def now_ns() -> int:
+    return time.time_ns()
+
+
+@dataclass
+class OrderIntent:
+    """What a strategy (or a user) wants to trade, before any checks"""
+    symbol: str
+    action: str                  # "BUY" or "SELL"
+    quantity: int
+    price: float = 0.0           # reference price (market orders), used by risk
+    account_id: Optional[str] = None
+    # Same key -> same order: retries of one intent can never double-fill
+    idempotency_key: Optional[str] = None
+    # When the signal fired (epoch ns); defaults to when the intent was accepted
+    signal_ts: Optional[int] = None
+
+
+@dataclass
+class Order:
+    """
+    One order through the pipeline, with a timestamp (epoch ns) per stage:
+    signal -> queued -> risk pass -> send -> ack -> fill. The fill stage and
+    broker_status come from the broker's order event stream.
+    """
+    intent: OrderIntent
+    account_id: str
+    idempotency_key: str
+    client_order_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = ORDER_QUEUED
+    signal_ts: int = 0
+    queued_ts: int = 0
+    risk_ts: Optional[int] = None
+    send_ts: Optional[int] = None
+    ack_ts: Optional[int] = None
+    fill_ts: Optional[int] = None
+    broker_order_id: Optional[str] = None
+    # Last state the broker pushed (accepted, partially_filled, filled, canceled, ...)
+    broker_status: Optional[str] = None
+    filled_quantity: int = 0
+    fill_price: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def latencies_ms(self) -> Dict[str, Optional[float]]:
+        """Stage-to-stage latency; None for stages the order never reached"""
+        def span(a: Optional[int], b: Optional[int]) -> Optional[float]:
+            return round((b - a) / 1e6, 3) if a is not None and b is not None else None
+
+        return {
+            "signal_to_queue": span(self.signal_ts, self.queued_ts),
+            "queue_to_risk": span(self.queued_ts, self.risk_ts),
+            "risk_to_send": span(self.risk_ts, self.send_ts),
+            "send_to_ack": span(self.send_ts, self.ack_ts),
+            "ack_to_fill": span(self.ack_ts, self.fill_ts),
+            "signal_to_ack": span(self.signal_ts, self.ack_ts),
+            "signal_to_fill": span(self.signal_ts, self.fill_ts),
+        }
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        intent = data.pop("intent")
+        data.update(
+            symbol=intent["symbol"],
+            action=intent["action"],
+            quantity=intent["quantity"],
+            price=intent["price"],
+            latency_ms=self.latencies_ms()
+        )
+        return data
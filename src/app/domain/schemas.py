@@ -0,0 +1,35 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from src.app.core.config import settings
+
+
+class SweepRequest(BaseModel):
+    """UTBot parameter grid to backtest over locally stored bars"""
+    symbols: List[str] = Field(..., min_length=1, max_length=100, examples=[["ES.c.0", "NQ.c.0"]])
+    intervals: List[str] = Field(default=["1m"], min_length=1, max_length=10, examples=[["1m"]])
+    atr_periods: List[int] = Field(default=[10], min_length=1, max_length=100, examples=[[5, 10, 14, 21]])
+    atr_multipliers: List[float] = Field(default=[1.0], min_length=1, max_length=100, examples=[[0.5, 1.0, 2.0]])
+    lookback_days: int = Field(default=30, ge=1, le=3650)
+    smoothing: str = Field(default="sma", pattern="^(sma|rolling|rma)$")
+    top: int = Field(default=50, ge=1, description="Return the N best combinations by PnL")
+
+    @model_validator(mode="after")
+    def _grid_size(self) -> "SweepRequest":
+        combinations = len(self.symbols) * len(self.intervals) * len(self.atr_periods) * len(self.atr_multipliers)
+        if combinations > settings.SWEEP_MAX_COMBINATIONS:
+            raise ValueError(
+                f"{combinations} combinations (symbols x intervals x atr_periods x atr_multipliers) "
+                f"is over the limit of {settings.SWEEP_MAX_COMBINATIONS}"
+            )
+        return self
+
+
+class OrderRequest(BaseModel):
+    """A single order intent; retries with the same idempotency_key return the original order"""
+    symbol: str = Field(..., examples=["TSLA"])
+    action: str = Field(..., pattern="^(BUY|SELL)$")
+    quantity: int = Field(default=10, ge=1)
+    price: float = Field(default=0.0, ge=0, description="Reference price for risk checks (market orders)")
+    account_id: Optional[str] = None
+    idempotency_key: Optional[str] = Field(default=None, max_length=128)
+    signal_ts: Optional[int] = Field(default=None, description="When the signal fired, epoch ns")
@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from src.app.core.config import settings
+from src.app.domain.services.utbot import SMOOTHING_SMA, compute_atr, trail_utbot
+from src.app.infrastructure.market_data.bar_store import BarStore
+
+logger = logging.getLogger("backtest")
+
+
+@dataclass(frozen=True)
+class SeriesSpec:
+    """One bar series to backtest, already resolved to its bar store key"""
+    symbol: str
+    interval: str
+    dataset: str
+    schema: str
+
+
+@dataclass
+class BacktestResult:
+    symbol: str
+    interval: str
+    atr_period: int
+    atr_multiplier: float
+    bars: int
+    pnl: float           # price points per 1 unit, always-in-market stop-and-reverse
+    hit_rate: float      # winning closed trades / closed trades
+    flips: int
+    trades: int          # closed trades
+    max_drawdown: float  # price points, peak-to-trough of the equity curve
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def evaluate_positions(close: np.ndarray, position: np.ndarray, flips: np.ndarray) -> Dict:
+    """
+    PnL statistics for a UTBot position series (as produced by `trail_utbot`).
+    position[i] is held from bar i's close to bar i+1's close.
+    """
+    n = len(close)
+    active = np.flatnonzero(position)
+    if n < 2 or len(active) == 0:
+        return {"pnl": 0.0, "hit_rate": 0.0, "flips": 0, "trades": 0, "max_drawdown": 0.0}
+
+    bar_pnl = position[:-1] * np.diff(close)
+    equity = np.cumsum(bar_pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    max_drawdown = float(np.max(peak - equity))
+
+    # Each flip closes the running trade and opens the next one
+    flip_idx = np.flatnonzero(flips)
+    starts = np.concatenate(([active[0]], flip_idx))
+    starts = starts[starts < n - 1]
+    trade_pnl = np.add.reduceat(bar_pnl, starts)
+    closed = trade_pnl[:len(flip_idx)]
+
+    return {
+        "pnl": float(equity[-1]),
+        "hit_rate": float(np.mean(closed > 0)) if len(closed) else 0.0,
+        "flips": int(len(flip_idx)),
+        "trades": int(len(closed)),
+        "max_drawdown": max_drawdown,
+    }
+
+
+def backtest_arrays(
+    symbol: str,
+    interval: str,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    atr_periods: Sequence[int],
+    atr_multipliers: Sequence[float],
+    smoothing: str = SMOOTHING_SMA
+) -> List[BacktestResult]:
+    """Runs every (period, multiplier) combination over one series, computing each ATR once"""
+    results = []
+    for period in atr_periods:
+        atr = compute_atr(high, low, close, period, smoothing)
+        for mult in atr_multipliers:
+            _, position, flips = trail_utbot(close, atr, period, mult)
+            results.append(BacktestResult(
+                symbol=symbol,
+                interval=interval,
+                atr_period=int(period),
+                atr_multiplier=float(mult),
+                bars=len(close),
+                **evaluate_positions(close, position, flips)
+            ))
+    return results
+
+
+def load_series(spec: SeriesSpec, start: int, end: int, store_dir: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Reads [start, end) bars for a series from the local bar store (no network)"""
+    store = BarStore(
+        root=Path(store_dir or settings.BAR_STORE_DIR),
+        max_bytes=settings.BAR_STORE_MAX_BYTES,
+        max_age_days=settings.BAR_STORE_MAX_AGE_DAYS,
+        sweep_seconds=settings.BAR_STORE_SWEEP_SECONDS
+    )
+    return store.read(spec.dataset, spec.symbol, spec.schema, start, end)
+
+
+def _sweep_task(spec: SeriesSpec, start: int, end: int, atr_periods: List[int], atr_multipliers: List[float], smoothing: str, store_dir: Optional[str]) -> List[Dict]:
+    """Process-pool entry point: one series x a slice of the periods"""
+    bars = load_series(spec, start, end, store_dir)
+    if len(bars["close"]) == 0:
+        return []
+    results = backtest_arrays(
+        spec.symbol, spec.interval,
+        bars["high"], bars["low"], bars["close"],
+        atr_periods, atr_multipliers, smoothing
+    )
+    return [r.to_dict() for r in results]
+
+
+def run_sweep(
+    series: Sequence[SeriesSpec],
+    atr_periods: Sequence[int],
+    atr_multipliers: Sequence[float],
+    start: int,
+    end: int,
+    smoothing: str = SMOOTHING_SMA,
+    max_workers: Optional[int] = None,
+    store_dir: Optional[str] = None
+) -> List[Dict]:
+    """
+    Grid of atr_period x atr_multiplier over every series on a process pool.
+    Work is split by (series, period slice) so a single-symbol sweep still
+    uses every core, while each worker computes an ATR once per period.
+    """
+    max_workers = max_workers or settings.SWEEP_MAX_WORKERS or os.cpu_count() or 1
+    periods = sorted(set(int(p) for p in atr_periods))
+    multipliers = sorted(set(float(m) for m in atr_multipliers))
+    if not series or not periods or not multipliers:
+        return []
+
+    # Aim for ~4 tasks per worker for load balancing
+    slices_per_series = max(1, min(len(periods), (4 * max_workers) // len(series)))
+    period_slices = [periods[i::slices_per_series] for i in range(slices_per_series)]
+
+    logger.info(
+        f"📊 Sweep: {len(series)} series x {len(periods)} periods x {len(multipliers)} multipliers "
+        f"on {max_workers} workers ({len(series) * len(period_slices)} tasks)"
+    )
+
+    results: List[Dict] = []
+    # spawn: never fork a process that is running an event loop and worker threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(_sweep_task, spec, start, end, chunk, multipliers, smoothing, store_dir)
+            for spec in series
+            for chunk in period_slices
+        ]
+        for future in as_completed(futures):
+            results.extend(future.result())
+    return results
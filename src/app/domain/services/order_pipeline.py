@@ -0,0 +1,642 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.app.core.config import settings
+from src.app.domain.models import (
+    ORDER_ACKED, ORDER_FAILED, ORDER_REJECTED, ORDER_SENT, ORDER_UNKNOWN,
+    Order, OrderIntent, now_ns
+)
+from src.app.domain.services.risk import RiskEngine, risk_engine
+from src.app.infrastructure.brokers.base import (
+    BROKER_FILLED, BROKER_PARTIAL, FINAL_BROKER_STATES, BrokerAck, BrokerOrder, OrderEvent
+)
+from src.app.infrastructure.brokers.factory import broker_client
+from src.app.infrastructure.persistence.order_journal import (
+    REC_ACCEPTED, REC_ACKED, REC_FAILED, REC_FILL, REC_FINAL, REC_INTENT, REC_POSITION, REC_REJECTED, REC_REPLACED,
+    REC_SENT, JournalLocked, OrderJournal, order_journal
+)
+
+logger = logging.getLogger("order_pipeline")
+
+# Broker events for orders whose submit hasn't returned yet (the stream can beat the ack)
+EARLY_EVENTS_SIZE = 1000
+
+
+class TokenBucket:
+    """`rate` orders per second with bursts of up to `burst`"""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OrderPipeline:
+    """
+    Order execution: intents go into an async queue and a pool of workers
+    dispatches them concurrently, so a burst of flips across many symbols
+    goes out in parallel instead of one awaited HTTP call at a time.
+
+    Per order: idempotency check -> queue -> risk -> per-account rate limit
+    -> send -> ack, with an epoch-ns timestamp recorded at every stage.
+    The same idempotency key always maps to the same order, so a retried
+    intent can't double-fill.
+
+    Every step is written ahead to the order journal; on startup the journal
+    is replayed to rebuild orders, idempotency keys and risk positions.
+
+    Risk keeps the order's shares reserved through the ack; the broker's
+    pushed order events move them into the position as they fill, and a
+    cancel / reject / expiry releases whatever never filled.
+    """
+    def __init__(self, broker=broker_client, risk: Optional[RiskEngine] = risk_engine,
+                 journal: Optional[OrderJournal] = order_journal):
+        self.broker = broker
+        self.risk = risk
+        self.journal = journal
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # client_order_id -> Order, oldest first (finished ones bounded by ORDER_HISTORY_SIZE)
+        self._orders: "OrderedDict[str, Order]" = OrderedDict()
+        self._by_key: Dict[Tuple[str, str], str] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        # broker_order_id -> client_order_id, and events that arrived before their ack
+        self._by_broker: Dict[str, str] = {}
+        self._early: "OrderedDict[str, List[OrderEvent]]" = OrderedDict()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._interrupted: List[Order] = []
+        # The journal is replayed once per process; a later start only reopens it
+        self._recovered = False
+
+    # --- lifecycle ---
+    async def start(self):
+        if self._workers:
+            return
+        if self.journal is not None:
+            try:
+                self.journal.lock()
+            except JournalLocked as e:
+                # Orders (and risk) must live in exactly one process: with several web workers,
+                # that is the ingest process behind STREAM_BUS
+                logger.error(f"❌ {e}; orders are off in this process")
+                return
+            if not self._recovered:
+                self._recover()
+                self._recovered = True
+                if settings.JOURNAL_COMPACT_ON_START:
+                    self.journal.compact(self._write_snapshot)
+            await self.journal.start()
+            self._resolve_interrupted()
+        self._queue = asyncio.Queue(maxsize=settings.ORDER_QUEUE_SIZE)
+        if self._on_broker_event not in self.broker.listeners:
+            self.broker.listeners.append(self._on_broker_event)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"order-worker:{i}")
+            for i in range(settings.ORDER_WORKERS)
+        ]
+        logger.info(f"📮 Order pipeline up with {len(self._workers)} workers")
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        if self._on_broker_event in self.broker.listeners:
+            self.broker.listeners.remove(self._on_broker_event)
+        for task in workers:
+            task.cancel()
+        for task in workers:
+            with suppress(asyncio.CancelledError):
+                await task
+        if self.journal is not None:
+            await self.journal.close()
+
+    # --- recovery ---
+    def _recover(self):
+        """Replays the journal: orders and idempotency keys, plus every reservation and fill for risk"""
+        started = time.perf_counter()
+        # Keyed by the raw id bytes; only finished orders' ids are ever hexed
+        open_orders: Dict[bytes, Order] = {}
+        # Acked, not final at the broker yet: fills and replaces still apply
+        working: Dict[bytes, Order] = {}
+        orders, by_key = self._orders, self._by_key
+        records = 0
+        for kind, ts, order_id, data in self.journal.replay():
+            records += 1
+            if kind == REC_POSITION:
+                if self.risk is not None:
+                    self.risk.restore(*data)
+                continue
+            if kind == REC_INTENT:
+                quantity, price, signal_ts, symbol, account_id, key = data
+                intent = OrderIntent(
+                    symbol, "BUY" if quantity > 0 else "SELL", abs(quantity), price,
+                    account_id, key, signal_ts
+                )
+                order = Order(intent, account_id, key, client_order_id=order_id.hex(), signal_ts=signal_ts, queued_ts=ts)
+                open_orders[order_id] = order
+                # Finished orders need no done-event; history is trimmed once at the end
+                orders[order.client_order_id] = order
+                by_key[(account_id, key)] = order.client_order_id
+                continue
+
+            if kind in (REC_FILL, REC_REPLACED, REC_FINAL):
+                order = working.get(order_id)
+                if order is None:
+                    continue
+                if kind == REC_FILL:
+                    self._book_fill(order, *data, ts)
+                elif kind == REC_REPLACED:
+                    self._resize(order, data)
+                else:
+                    del working[order_id]
+                    self._finish(order, *data)
+                continue
+
+            order = open_orders.get(order_id)
+            if order is None:
+                continue
+            if kind == REC_ACCEPTED:
+                order.risk_ts = ts
+                if self.risk is not None:
+                    self.risk.reserve(order)
+            elif kind == REC_SENT:
+                order.status = ORDER_SENT
+                order.send_ts = ts
+            elif kind == REC_ACKED:
+                order.status = ORDER_ACKED
+                order.ack_ts = ts
+                # Acked shares stay reserved: fills come from the broker's order stream
+                _, order.broker_order_id = data
+                del open_orders[order_id]
+                working[order_id] = order
+            elif kind == REC_REJECTED:
+                order.status = ORDER_REJECTED
+                order.risk_ts = ts
+                order.error = data
+                del open_orders[order_id]
+            elif kind == REC_FAILED:
+                order.status = ORDER_FAILED
+                order.error = data
+                if order.risk_ts is not None and self.risk is not None:
+                    self.risk.release(order)
+                del open_orders[order_id]
+
+        self._trim()
+        self._by_broker = {
+            order.broker_order_id: client_order_id
+            for client_order_id, order in orders.items() if order.broker_order_id is not None
+        }
+        self._interrupted = list(open_orders.values())
+        if records:
+            # Working orders keep their reservations; the broker's stream reports on them again
+            logger.info(
+                f"📒 Replayed {records} journal records in {(time.perf_counter() - started) * 1000:.0f}ms: "
+                f"{len(self._orders)} orders, {len(working)} working at the broker, {len(self._interrupted)} interrupted"
+            )
+
+    def _write_snapshot(self):
+        """
+        Journal compaction: the records of every order still in memory, then each
+        symbol's absolute position (which overrides what those records rebuild)
+        """
+        journal = self.journal
+        for order in self._orders.values():
+            journal.intent(order)
+            if order.status == ORDER_REJECTED:
+                journal.rejected(order)
+                continue
+            if order.risk_ts is not None:
+                journal.accepted(order)
+            if order.send_ts is not None:
+                journal.sent(order)
+            if order.status == ORDER_ACKED:
+                journal.acked(order, order.intent.price)
+                ts = order.fill_ts or order.ack_ts
+                if order.filled_quantity:
+                    journal.fill(order, ts)
+                if order.broker_status in FINAL_BROKER_STATES:
+                    journal.final(order, ts)
+            elif order.status == ORDER_FAILED:
+                journal.failed(order, order.ack_ts or order.send_ts or order.queued_ts)
+        if self.risk is not None:
+            ts = now_ns()
+            for symbol, filled, avg_price, realized, mark in self.risk.positions():
+                journal.position(symbol, filled, avg_price, realized, mark, ts)
+
+    def _resolve_interrupted(self):
+        """
+        Orders the last run never finished. Unsent ones are failed (never
+        re-sent on their own) and their reservations released. Sent ones may
+        have filled, so their shares stay reserved as `unknown` until reconciled.
+        """
+        interrupted, self._interrupted = self._interrupted, []
+        for order in interrupted:
+            event = self._done.get(order.client_order_id)
+            if event is not None:
+                event.set()
+            if order.status == ORDER_SENT:
+                order.status = ORDER_UNKNOWN
+                order.error = "sent before a restart; outcome unknown"
+                self._assign(order)
+                logger.warning(f"⚠️ Order {order.client_order_id} ({order.intent.action} {order.intent.quantity} {order.intent.symbol}) has no ack in the journal")
+                continue
+            order.status = ORDER_FAILED
+            order.error = "interrupted by a restart before it was sent"
+            if order.risk_ts is not None and self.risk is not None:
+                self.risk.release(order)
+            self.journal.failed(order, now_ns())
+
+    # --- intake ---
+    def submit(self, intent: OrderIntent) -> Tuple[Order, bool]:
+        """
+        Queues an intent. Returns (order, created); created is False when the
+        idempotency key was seen before and the existing order is returned.
+        Raises asyncio.QueueFull when the pipeline is saturated.
+        """
+        received = now_ns()
+        account_id = intent.account_id or self.broker.account_id
+        key = intent.idempotency_key or uuid.uuid4().hex
+
+        existing = self._by_key.get((account_id, key))
+        if existing is not None and existing in self._orders:
+            return self._orders[existing], False
+
+        if self._queue is None:
+            raise RuntimeError("Order pipeline is not running")
+
+        order = Order(
+            intent=intent,
+            account_id=account_id,
+            idempotency_key=key,
+            signal_ts=intent.signal_ts or received,
+            queued_ts=received
+        )
+        self._queue.put_nowait(order)
+        self._remember(order)
+        if self.journal is not None:
+            self.journal.intent(order)
+        return order, True
+
+    def submit_batch(self, intents: List[OrderIntent]) -> List[Tuple[Order, bool]]:
+        """
+        Queues all intents or none: raises asyncio.QueueFull up front when the queue
+        has no room for the whole batch, so no part of it is left queued unreported.
+        """
+        if self._queue is None:
+            raise RuntimeError("Order pipeline is not running")
+        if self._queue.maxsize and len(intents) > self._queue.maxsize - self._queue.qsize():
+            raise asyncio.QueueFull
+        return [self.submit(intent) for intent in intents]
+
+    def _remember(self, order: Order):
+        self._orders[order.client_order_id] = order
+        self._by_key[(order.account_id, order.idempotency_key)] = order.client_order_id
+        self._done[order.client_order_id] = asyncio.Event()
+        self._trim()
+
+    @staticmethod
+    def _finished(order: Order) -> bool:
+        """Nothing more can happen to it: refused, or final at the broker"""
+        if order.status in (ORDER_REJECTED, ORDER_FAILED):
+            return True
+        return order.status == ORDER_ACKED and order.broker_status in FINAL_BROKER_STATES
+
+    def _trim(self):
+        """
+        Drops the oldest finished orders past ORDER_HISTORY_SIZE. Orders still queued,
+        working or unknown are kept whatever their age: their reservations and fills
+        (and the journal snapshot) need them.
+        """
+        excess = len(self._orders) - settings.ORDER_HISTORY_SIZE
+        if excess <= 0:
+            return
+        evict = []
+        for client_order_id, order in self._orders.items():
+            if self._finished(order):
+                evict.append(client_order_id)
+                if len(evict) == excess:
+                    break
+        for client_order_id in evict:
+            old = self._orders.pop(client_order_id)
+            self._by_key.pop((old.account_id, old.idempotency_key), None)
+            self._done.pop(client_order_id, None)
+            if old.broker_order_id is not None:
+                self._by_broker.pop(old.broker_order_id, None)
+
+    async def wait(self, client_order_id: str, timeout: Optional[float] = None) -> Optional[Order]:
+        """Waits until the order is acked/rejected/failed (or `timeout` passes)"""
+        event = self._done.get(client_order_id)
+        if event is not None:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(event.wait(), timeout)
+        return self._orders.get(client_order_id)
+
+    # --- dispatch ---
+    def _bucket(self, account_id: str) -> TokenBucket:
+        bucket = self._buckets.get(account_id)
+        if bucket is None:
+            bucket = self._buckets[account_id] = TokenBucket(
+                settings.ORDER_RATE_PER_SECOND, settings.ORDER_RATE_BURST
+            )
+        return bucket
+
+    async def _worker(self):
+        while True:
+            order = await self._queue.get()
+            try:
+                await self._execute(order)
+            except Exception as e:
+                order.status = ORDER_FAILED
+                order.error = str(e)
+                logger.error(f"❌ Order {order.client_order_id} crashed: {e}")
+                if self.journal is not None:
+                    self.journal.failed(order, now_ns())
+            finally:
+                self._queue.task_done()
+                event = self._done.get(order.client_order_id)
+                if event is not None:
+                    event.set()
+
+    async def _execute(self, order: Order):
+        intent = order.intent
+        journal = self.journal
+        reason = self.risk.pre_trade(order) if self.risk is not None else None
+        order.risk_ts = now_ns()
+        if reason is not None:
+            order.status = ORDER_REJECTED
+            order.error = reason
+            if journal is not None:
+                journal.rejected(order)
+            logger.warning(f"🛑 Risk rejected {intent.action} {intent.quantity} {intent.symbol}: {reason}")
+            return
+        if journal is not None:
+            journal.accepted(order)
+
+        try:
+            await self._bucket(order.account_id).acquire()
+            order.status = ORDER_SENT
+            order.send_ts = now_ns()
+            if journal is not None:
+                journal.sent(order)
+                if settings.JOURNAL_SYNC_BEFORE_SEND:
+                    await journal.sync()
+            self._assign(order)
+            ack = await self.broker.submit(BrokerOrder(
+                intent.symbol, intent.action, intent.quantity,
+                price=intent.price, client_order_id=order.client_order_id,
+                position=self.risk.position(intent.symbol) if self.risk is not None else 0
+            ))
+        except BaseException:
+            if self.risk is not None:
+                self.risk.release(order)
+            raise
+        order.ack_ts = now_ns()
+
+        if ack.accepted:
+            order.status = ORDER_ACKED
+            order.broker_order_id = ack.broker_order_id
+            if journal is not None:
+                journal.acked(order, intent.price)
+            if ack.broker_order_id is not None:
+                self._by_broker[ack.broker_order_id] = order.client_order_id
+                for event in self._early.pop(ack.broker_order_id, ()):
+                    self._apply(order, event)
+        elif ack.unknown:
+            # It may be working at the broker: the shares stay reserved until its order stream says
+            order.status = ORDER_UNKNOWN
+            order.error = f"outcome unknown: {ack.error}"
+            logger.warning(f"⚠️ Order {order.client_order_id} ({intent.action} {intent.quantity} {intent.symbol}) {order.error}")
+            self._reconcile_early(order)
+        else:
+            order.status = ORDER_FAILED
+            order.error = ack.error
+            if order.broker_order_id is not None:
+                self._by_broker.pop(order.broker_order_id, None)
+                order.broker_order_id = None
+            if self.risk is not None:
+                self.risk.release(order)
+            if journal is not None:
+                journal.failed(order, order.ack_ts)
+
+    # --- broker events ---
+    def _assign(self, order: Order):
+        """Registers the id the adapter will report the order under, when it picks one before sending"""
+        assigned = self.broker.assigned_id(order.client_order_id)
+        if assigned is not None:
+            order.broker_order_id = assigned
+            self._by_broker[assigned] = order.client_order_id
+
+    def _on_broker_event(self, event: OrderEvent):
+        client_order_id = self._by_broker.get(event.broker_order_id)
+        order = self._orders.get(client_order_id) if client_order_id is not None else None
+        if order is None and event.client_order_id is not None:
+            # An order whose submit outcome was lost: the stream says what became of it
+            order = self._orders.get(event.client_order_id)
+            if order is not None and order.status != ORDER_UNKNOWN:
+                order = None
+        if order is None or order.status == ORDER_SENT:
+            # Ours but not acked yet, or not ours at all (other sessions, stream snapshots): kept briefly
+            self._early.setdefault(event.broker_order_id, []).append(event)
+            while len(self._early) > EARLY_EVENTS_SIZE:
+                self._early.popitem(last=False)
+            return
+        if order.status == ORDER_UNKNOWN:
+            self._adopt(order, event.broker_order_id)
+        self._apply(order, event)
+
+    def _reconcile_early(self, order: Order):
+        """Events that came in before an order's submit outcome turned out unknown"""
+        events = self._early.pop(order.broker_order_id, []) if order.broker_order_id is not None else []
+        for broker_order_id in [key for key, queued in self._early.items()
+                                if any(event.client_order_id == order.client_order_id for event in queued)]:
+            events.extend(self._early.pop(broker_order_id))
+        if events:
+            self._adopt(order, events[0].broker_order_id)
+            for event in events:
+                self._apply(order, event)
+
+    def _adopt(self, order: Order, broker_order_id: str):
+        """The broker reports on an order whose outcome was unknown: it was placed after all"""
+        order.status = ORDER_ACKED
+        order.error = None
+        order.broker_order_id = broker_order_id
+        order.ack_ts = order.ack_ts or now_ns()
+        self._by_broker[broker_order_id] = order.client_order_id
+        if self.journal is not None:
+            self.journal.acked(order, order.intent.price)
+        logger.info(f"✅ Order {order.client_order_id} reconciled from the order stream as {broker_order_id}")
+
+    def _apply(self, order: Order, event: OrderEvent):
+        # Stream replays and reconnects repeat older states; a final order never changes again
+        if order.broker_status in FINAL_BROKER_STATES:
+            return
+        order.broker_status = event.status
+        journal = self.journal
+        # Not capped at the order's quantity: during a replace the broker can fill the new one first
+        if event.filled_quantity > order.filled_quantity:
+            self._book_fill(order, event.filled_quantity, event.fill_price, event.ts)
+            if journal is not None:
+                journal.fill(order, event.ts)
+        if event.final:
+            self._finish(order, event.status, event.reason)
+            if journal is not None:
+                journal.final(order, event.ts)
+            if order.filled_quantity < order.intent.quantity:
+                logger.warning(
+                    f"⚠️ Order {order.client_order_id} {event.status} by the broker with "
+                    f"{order.filled_quantity}/{order.intent.quantity} filled"
+                )
+
+    def _book_fill(self, order: Order, filled: int, fill_price: Optional[float], ts: int):
+        """The order's cumulative fill grew to `filled` at average `fill_price`: risk books the difference"""
+        delta = filled - order.filled_quantity
+        if delta <= 0:
+            return
+        # The broker reports the average over everything filled; this fill's price is the difference
+        price = 0.0
+        if fill_price:
+            price = (fill_price * filled - (order.fill_price or 0.0) * order.filled_quantity) / delta
+        if self.risk is not None:
+            self.risk.on_fill(order, delta, price)
+        order.filled_quantity = filled
+        order.fill_price = fill_price or order.fill_price
+        if filled >= order.intent.quantity:
+            order.fill_ts = order.fill_ts or ts
+        if order.broker_status not in FINAL_BROKER_STATES:
+            order.broker_status = BROKER_FILLED if filled >= order.intent.quantity else BROKER_PARTIAL
+
+    def _finish(self, order: Order, status: str, reason: Optional[str]):
+        """Final at the broker: whatever never filled is released"""
+        order.broker_status = status
+        if reason:
+            order.error = reason
+        unfilled = order.intent.quantity - order.filled_quantity
+        if unfilled > 0 and self.risk is not None:
+            self.risk.release(order, unfilled)
+
+    def _resize(self, order: Order, quantity: int):
+        """Journal replay of an accepted replace: the reservation follows the new quantity"""
+        growth = quantity - order.intent.quantity
+        if self.risk is not None:
+            if growth > 0:
+                self.risk.reserve(order, growth)
+            elif growth < 0:
+                self.risk.release(order, -growth)
+        order.intent.quantity = quantity
+
+    async def cancel(self, client_order_id: str) -> Optional[BrokerAck]:
+        """Cancels the rest of a working order at the broker (None if it isn't working)"""
+        order = self._working(client_order_id)
+        if order is None:
+            return None
+        return await self.broker.cancel(order.broker_order_id)
+
+    async def replace(self, client_order_id: str, quantity: Optional[int] = None,
+                      limit_price: Optional[float] = None) -> Optional[BrokerAck]:
+        """
+        Changes a working order's quantity and/or limit price (None if it isn't
+        working). A bigger quantity is risk-checked and reserved before it is
+        sent; the reservation follows whatever the broker accepts.
+        """
+        order = self._working(client_order_id)
+        if order is None:
+            return None
+        growth = 0
+        if quantity is not None:
+            if quantity <= order.filled_quantity:
+                return BrokerAck(False, order.broker_order_id, error="Quantity is not above the filled quantity")
+            growth = quantity - order.intent.quantity
+        risk = self.risk
+        if growth > 0 and risk is not None:
+            signed = growth if order.intent.action == "BUY" else -growth
+            reason = risk.check(order.intent.symbol, signed, order.intent.price)
+            if reason is not None:
+                return BrokerAck(False, order.broker_order_id, error=f"risk: {reason}")
+            risk.reserve(order, growth)
+
+        previous = order.intent.quantity
+        ack = await self.broker.replace(order.broker_order_id, quantity, limit_price)
+        if not ack.accepted or order.broker_status in FINAL_BROKER_STATES:
+            # Refused, or the order finished meanwhile: its final event released the unfilled part of
+            # the old quantity, so only the growth that didn't fill is left to release
+            if growth > 0 and risk is not None:
+                unused = growth - max(0, order.filled_quantity - previous) if ack.accepted else growth
+                if unused > 0:
+                    risk.release(order, unused)
+            if ack.accepted and quantity is not None:
+                order.intent.quantity = quantity
+            return ack
+        if growth < 0 and risk is not None:
+            risk.release(order, -growth)
+        if quantity is not None:
+            order.intent.quantity = quantity
+            if self.journal is not None:
+                self.journal.replaced(order, now_ns())
+        return ack
+
+    def _working(self, client_order_id: str) -> Optional[Order]:
+        order = self._orders.get(client_order_id)
+        if order is None or order.broker_order_id is None or order.broker_status in FINAL_BROKER_STATES:
+            return None
+        if order.status not in (ORDER_ACKED, ORDER_UNKNOWN):
+            return None
+        return order
+
+    # --- queries ---
+    def get(self, client_order_id: str) -> Optional[Order]:
+        return self._orders.get(client_order_id)
+
+    def orders(self, symbol: Optional[str] = None, status: Optional[str] = None, limit: int = 100) -> List[Order]:
+        """Most recent first"""
+        out = []
+        for order in reversed(self._orders.values()):
+            if symbol is not None and order.intent.symbol != symbol:
+                continue
+            if status is not None and order.status != status:
+                continue
+            out.append(order)
+            if len(out) >= limit:
+                break
+        return out
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p90/p99/max per stage over the orders in memory, in ms"""
+        stages: Dict[str, List[float]] = {}
+        for order in self._orders.values():
+            for stage, value in order.latencies_ms().items():
+                if value is not None:
+                    stages.setdefault(stage, []).append(value)
+        summary = {}
+        for stage, values in stages.items():
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            summary[stage] = {
+                "count": len(values),
+                "p50": round(float(p50), 3),
+                "p90": round(float(p90), 3),
+                "p99": round(float(p99), 3),
+                "max": round(max(values), 3),
+            }
+        return summary
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+
+# Global Instance, started/stopped by the app lifespan
+order_pipeline = OrderPipeline()
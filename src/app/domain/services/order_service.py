@@ -0,0 +1,160 @@
+"""
+Order Service - what the order API talks to.
+
+Orders and pre-trade risk must run in exactly ONE process: every pipeline
+has its own queue, position book, limits and journal, so one per web worker
+would multiply every limit by the worker count. Without STREAM_BUS that
+process is the app itself (`OrderService`). With STREAM_BUS it is the ingest
+process, which serves `OrderService.handlers` on the bar bus, and web workers
+reach it through `RemoteOrderService`. Both answer the same coroutines with
+JSON-ready dicts and raise OrderServiceError with the HTTP status to answer.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+from src.app.core.config import settings
+from src.app.domain.models import OrderIntent
+from src.app.domain.services.order_pipeline import OrderPipeline, order_pipeline
+from src.app.domain.services.risk import RiskEngine, risk_engine
+from src.app.infrastructure.market_data.bar_bus import BarBusClient, BusCallError, streams
+
+
+class OrderServiceError(Exception):
+    """A call the API answers with `status` (404 unknown order, 409 refused, 503 not running / full, 504 no broker answer)"""
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class OrderService:
+    """The order pipeline and risk engine of this process"""
+    # Served on the bar bus as "orders.<name>"
+    CALLS = ("submit", "submit_batch", "orders", "get", "cancel", "replace", "latency",
+             "risk", "kill", "resume", "stats")
+
+    def __init__(self, pipeline: OrderPipeline = order_pipeline, risk: RiskEngine = risk_engine):
+        self.pipeline = pipeline
+        self.risk_engine = risk
+
+    @property
+    def handlers(self) -> Dict:
+        return {f"orders.{name}": getattr(self, name) for name in self.CALLS}
+
+    @staticmethod
+    def _queued(submit, *args):
+        try:
+            return submit(*args)
+        except asyncio.QueueFull:
+            raise OrderServiceError(503, "Order queue is full, retry shortly")
+        except RuntimeError as e:
+            raise OrderServiceError(503, str(e))
+
+    async def submit(self, intent: Dict, wait: bool = False, timeout: float = 10.0) -> Dict:
+        """Queues an intent: {"order", "created", "done"}; `wait` holds on until the broker acks"""
+        order, created = self._queued(self.pipeline.submit, OrderIntent(**intent))
+        if wait:
+            order = await self.pipeline.wait(order.client_order_id, timeout)
+        return {"order": order.to_dict(), "created": created, "done": order.done}
+
+    async def submit_batch(self, intents: List[Dict]) -> List[Dict]:
+        """All or nothing: a batch the queue can't hold is refused whole (503)"""
+        batch = self._queued(self.pipeline.submit_batch, [OrderIntent(**intent) for intent in intents])
+        return [order.to_dict() for order, _ in batch]
+
+    async def orders(self, symbol: Optional[str] = None, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        return [order.to_dict() for order in self.pipeline.orders(symbol, status, limit)]
+
+    async def get(self, order_id: str) -> Dict:
+        order = self.pipeline.get(order_id)
+        if order is None:
+            raise OrderServiceError(404, f"Unknown order {order_id}")
+        return order.to_dict()
+
+    async def cancel(self, order_id: str) -> Dict:
+        return self._ack(order_id, await self.pipeline.cancel(order_id))
+
+    async def replace(self, order_id: str, quantity: Optional[int] = None, limit_price: Optional[float] = None) -> Dict:
+        return self._ack(order_id, await self.pipeline.replace(order_id, quantity, limit_price))
+
+    @staticmethod
+    def _ack(order_id: str, ack) -> Dict:
+        if ack is None:
+            raise OrderServiceError(404, f"No working order {order_id}")
+        if ack.unknown:
+            raise OrderServiceError(504, f"No answer from the broker, outcome unknown: {ack.error}")
+        if not ack.accepted:
+            raise OrderServiceError(409, ack.error or "Refused by the broker")
+        return {"accepted": True, "broker_order_id": ack.broker_order_id}
+
+    async def latency(self) -> Dict:
+        return {"queued": self.pipeline.queue_depth, "stages": self.pipeline.latency_summary()}
+
+    async def risk(self) -> Dict:
+        return self.risk_engine.snapshot()
+
+    async def kill(self, reason: str = "manual") -> Dict:
+        self.risk_engine.kill(reason)
+        return {"killed": self.risk_engine.killed}
+
+    async def resume(self) -> Dict:
+        self.risk_engine.resume()
+        return {"killed": self.risk_engine.killed}
+
+    async def stats(self) -> Dict:
+        pipeline = self.pipeline
+        return {
+            "queued": pipeline.queue_depth,
+            "journal": pipeline.journal.stats() if pipeline.journal else None,
+            "broker": pipeline.broker.stats(),
+        }
+
+
+class RemoteOrderService:
+    """A web worker's OrderService: every call goes to the ingest process over the bar bus"""
+    def __init__(self, bus: BarBusClient):
+        self.bus = bus
+
+    async def _call(self, name: str, params: Optional[Dict] = None, timeout: Optional[float] = None):
+        try:
+            return await self.bus.call(f"orders.{name}", params, timeout)
+        except BusCallError as e:
+            raise OrderServiceError(e.status, e.detail)
+
+    async def submit(self, intent: Dict, wait: bool = False, timeout: float = 10.0) -> Dict:
+        call_timeout = settings.STREAM_BUS_CALL_TIMEOUT_SECONDS + (timeout if wait else 0.0)
+        return await self._call("submit", {"intent": intent, "wait": wait, "timeout": timeout}, call_timeout)
+
+    async def submit_batch(self, intents: List[Dict]) -> List[Dict]:
+        return await self._call("submit_batch", {"intents": intents})
+
+    async def orders(self, symbol: Optional[str] = None, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        return await self._call("orders", {"symbol": symbol, "status": status, "limit": limit})
+
+    async def get(self, order_id: str) -> Dict:
+        return await self._call("get", {"order_id": order_id})
+
+    async def cancel(self, order_id: str) -> Dict:
+        return await self._call("cancel", {"order_id": order_id})
+
+    async def replace(self, order_id: str, quantity: Optional[int] = None, limit_price: Optional[float] = None) -> Dict:
+        return await self._call("replace", {"order_id": order_id, "quantity": quantity, "limit_price": limit_price})
+
+    async def latency(self) -> Dict:
+        return await self._call("latency")
+
+    async def risk(self) -> Dict:
+        return await self._call("risk")
+
+    async def kill(self, reason: str = "manual") -> Dict:
+        return await self._call("kill", {"reason": reason})
+
+    async def resume(self) -> Dict:
+        return await self._call("resume")
+
+    async def stats(self) -> Dict:
+        return await self._call("stats")
+
+
+# Global Instance: this process's pipeline, or with STREAM_BUS set, the ingest process's
+order_service = RemoteOrderService(streams) if isinstance(streams, BarBusClient) else OrderService()
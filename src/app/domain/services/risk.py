@@ -0,0 +1,292 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Optional
+from src.app.core.config import settings
+from src.app.domain.models import Order
+
+logger = logging.getLogger("risk")
+
+
+@dataclass
+class RiskLimits:
+    """Pre-trade limits; 0 disables a limit"""
+    max_position: int = 0              # |shares| per symbol
+    max_gross_notional: float = 0.0    # sum of |position| x mark
+    max_net_notional: float = 0.0      # |sum of position x mark|
+    max_orders_per_second: int = 0
+    max_loss: float = 0.0              # realized + unrealized drawdown that blocks new exposure
+    price_band_pct: float = 0.0        # fat finger: max % away from the last bar
+
+    @classmethod
+    def from_settings(cls) -> "RiskLimits":
+        return cls(
+            max_position=settings.RISK_MAX_POSITION,
+            max_gross_notional=settings.RISK_MAX_GROSS_NOTIONAL,
+            max_net_notional=settings.RISK_MAX_NET_NOTIONAL,
+            max_orders_per_second=settings.RISK_MAX_ORDERS_PER_SECOND,
+            max_loss=settings.RISK_MAX_LOSS,
+            price_band_pct=settings.RISK_PRICE_BAND_PCT,
+        )
+
+
+class _Book:
+    """
+    One symbol. `exposure` = filled + in-flight shares: notional limits are
+    checked against it so concurrent orders can't each pass on a stale position.
+    A position filled without any price reference has avg_price 0 (unpriced):
+    it carries no PnL until the first mark prices it.
+    """
+    __slots__ = ("filled", "pending", "avg_price", "mark", "realized")
+
+    def __init__(self):
+        self.filled = 0
+        self.pending = 0
+        self.avg_price = 0.0
+        self.mark = 0.0
+        self.realized = 0.0
+
+    @property
+    def exposure(self) -> int:
+        return self.filled + self.pending
+
+    def unrealized(self) -> float:
+        return self.filled * (self.mark - self.avg_price) if self.filled and self.avg_price else 0.0
+
+
+class RiskEngine:
+    """
+    In-memory pre-trade risk that sits between a signal and the broker.
+
+    Every check is O(1) regardless of how many symbols are open: gross/net
+    notional and PnL are aggregates updated incrementally on each mark,
+    reservation and fill (a symbol's old contribution is subtracted and
+    its new one added), never recomputed from positions or order history.
+    The order-rate limit is a deque of the last N pass timestamps.
+
+    Lifecycle per order: `pre_trade` (check + reserve in-flight shares) ->
+    `on_fill` per fill the broker pushes (reserved shares become position) ->
+    `release` of whatever is left unfilled when the order fails, is canceled,
+    rejected or expires. The broker's ack alone moves nothing.
+    """
+    def __init__(self, limits: Optional[RiskLimits] = None):
+        self.limits = limits or RiskLimits()
+        self._books: Dict[str, _Book] = {}
+        self.gross = 0.0         # sum |exposure| x mark
+        self.net = 0.0           # sum exposure x mark
+        self.realized = 0.0
+        self.unrealized = 0.0
+        self._sent: deque = deque()
+        self.killed: Optional[str] = None
+        self.rejections = 0
+
+    def _book(self, symbol: str) -> _Book:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _Book()
+        return book
+
+    # --- incremental aggregates ---
+    def _set(self, book: _Book, exposure: int, mark: float, filled: Optional[int] = None):
+        """Moves one symbol's contribution to the aggregates from its old state to the new one"""
+        old_exposure, old_mark = book.exposure, book.mark
+        self.gross += abs(exposure) * mark - abs(old_exposure) * old_mark
+        self.net += exposure * mark - old_exposure * old_mark
+        self.unrealized -= book.unrealized()
+        if filled is not None:
+            book.pending = exposure - filled
+            book.filled = filled
+        else:
+            book.pending = exposure - book.filled
+        book.mark = mark
+        self.unrealized += book.unrealized()
+
+    def mark(self, symbol: str, price: float):
+        """Last traded price / bar close for a symbol"""
+        if price <= 0:
+            return
+        book = self._book(symbol)
+        self._set(book, book.exposure, price)
+        if book.filled and not book.avg_price:
+            # First price for an unpriced position: it starts flat
+            book.avg_price = price
+
+    # --- kill switch ---
+    def kill(self, reason: str = "manual"):
+        self.killed = reason
+        logger.warning(f"🛑 Risk kill switch engaged: {reason}")
+
+    def resume(self):
+        if self.killed is not None:
+            logger.info("✅ Risk kill switch released")
+        self.killed = None
+
+    # --- checks ---
+    def check(self, symbol: str, signed_qty: int, price: float = 0.0, now: Optional[float] = None) -> Optional[str]:
+        """
+        Returns why an order for `signed_qty` shares (+buy / -sell) would be
+        rejected, or None if it passes. Doesn't change any state.
+        """
+        limits = self.limits
+        if self.killed is not None:
+            return f"kill switch: {self.killed}"
+        if signed_qty == 0:
+            return "zero quantity"
+
+        book = self._books.get(symbol)
+        last = book.mark if book is not None else 0.0
+        if price > 0 and last > 0 and limits.price_band_pct > 0:
+            if abs(price - last) > last * limits.price_band_pct / 100:
+                return f"price {price} is more than {limits.price_band_pct}% from last {last}"
+
+        if limits.max_orders_per_second > 0 and len(self._sent) >= limits.max_orders_per_second:
+            now = time.monotonic() if now is None else now
+            if now - self._sent[-limits.max_orders_per_second] < 1.0:
+                return f"more than {limits.max_orders_per_second} orders/second"
+
+        exposure = book.exposure if book is not None else 0
+        after = exposure + signed_qty
+        increasing = abs(after) > abs(exposure)
+        if not increasing:
+            # Reducing or flattening is always allowed past position/notional/loss limits
+            return None
+
+        if limits.max_position > 0 and abs(after) > limits.max_position:
+            return f"position {after} in {symbol} exceeds {limits.max_position}"
+
+        if limits.max_loss > 0 and self.realized + self.unrealized <= -limits.max_loss:
+            return f"loss limit {limits.max_loss} reached"
+
+        mark = price if price > 0 else last
+        if limits.max_gross_notional > 0 or limits.max_net_notional > 0:
+            if mark <= 0:
+                # Fail closed: without a price the notional can't be bounded
+                return f"no price for {symbol}: notional limits can't be checked"
+            if limits.max_gross_notional > 0:
+                gross = self.gross + (abs(after) - abs(exposure)) * mark
+                if gross > limits.max_gross_notional:
+                    return f"gross notional {gross:.0f} exceeds {limits.max_gross_notional:.0f}"
+            if limits.max_net_notional > 0:
+                net = self.net + signed_qty * mark
+                if abs(net) > limits.max_net_notional:
+                    return f"net notional {net:.0f} exceeds {limits.max_net_notional:.0f}"
+        return None
+
+    # --- order lifecycle ---
+    @staticmethod
+    def signed_quantity(order: Order) -> int:
+        return order.intent.quantity if order.intent.action == "BUY" else -order.intent.quantity
+
+    def pre_trade(self, order: Order) -> Optional[str]:
+        """Check, then reserve the shares as in-flight. Hook for the order pipeline."""
+        intent = order.intent
+        qty = self.signed_quantity(order)
+        now = time.monotonic()
+        reason = self.check(intent.symbol, qty, intent.price, now)
+        if reason is not None:
+            self.rejections += 1
+            return reason
+
+        if self.limits.max_orders_per_second > 0:
+            self._sent.append(now)
+            if len(self._sent) > self.limits.max_orders_per_second:
+                self._sent.popleft()
+        self.reserve(order)
+        return None
+
+    def reserve(self, order: Order, quantity: Optional[int] = None):
+        """
+        Holds `quantity` (default: all) of the order's shares as in-flight without
+        checking (pre_trade, a replace that grows the order, journal replay)
+        """
+        book = self._book(order.intent.symbol)
+        qty = self._signed(order, quantity)
+        self._set(book, book.exposure + qty, book.mark or order.intent.price)
+
+    def release(self, order: Order, quantity: Optional[int] = None):
+        """Unfilled shares (default: all) that will never fill: failed, canceled, rejected, expired"""
+        book = self._book(order.intent.symbol)
+        self._set(book, book.exposure - self._signed(order, quantity), book.mark)
+
+    def on_fill(self, order: Order, quantity: int, fill_price: float = 0.0) -> float:
+        """
+        `quantity` more shares of the order filled at `fill_price`: they move from
+        in-flight to the position. Returns the price booked.
+        """
+        book = self._book(order.intent.symbol)
+        qty = self._signed(order, quantity)
+        # No price at all: the shares go in at the average (no PnL), never at 0
+        price = fill_price or order.intent.price or book.mark or book.avg_price
+        filled = book.filled + qty
+
+        if book.filled == 0 or (book.filled > 0) == (qty > 0):
+            # Opening / adding: new average price
+            total = abs(book.filled) + abs(qty)
+            # (unpriced shares already held take this fill's price)
+            avg = ((book.avg_price or price) * abs(book.filled) + price * abs(qty)) / total
+        else:
+            # Reducing / flipping: realize PnL on the closed part
+            closed = min(abs(qty), abs(book.filled))
+            direction = 1 if book.filled > 0 else -1
+            pnl = closed * (price - book.avg_price) * direction if book.avg_price else 0.0
+            book.realized += pnl
+            self.realized += pnl
+            avg = book.avg_price if filled and (filled > 0) == (book.filled > 0) else price
+
+        self.unrealized -= book.unrealized()
+        book.avg_price = avg if filled else 0.0
+        self.unrealized += book.unrealized()
+        self._set(book, book.exposure, book.mark or price, filled=filled)
+        return price
+
+    def restore(self, symbol: str, filled: int, avg_price: float, realized: float, mark: float):
+        """Sets a symbol's position outright (journal snapshot); in-flight shares are kept"""
+        book = self._book(symbol)
+        self.realized += realized - book.realized
+        book.realized = realized
+        self.unrealized -= book.unrealized()
+        book.avg_price = avg_price
+        self.unrealized += book.unrealized()
+        self._set(book, filled + book.pending, mark or book.mark, filled=filled)
+
+    def position(self, symbol: str) -> int:
+        """Filled shares in `symbol` (signed)"""
+        book = self._books.get(symbol)
+        return book.filled if book is not None else 0
+
+    def positions(self):
+        """(symbol, filled, avg_price, realized, mark) for every symbol seen, for journal snapshots"""
+        return [(symbol, book.filled, book.avg_price, book.realized, book.mark) for symbol, book in self._books.items()]
+
+    def _signed(self, order: Order, quantity: Optional[int]) -> int:
+        quantity = order.intent.quantity if quantity is None else quantity
+        return quantity if order.intent.action == "BUY" else -quantity
+
+    # --- reporting ---
+    def snapshot(self) -> Dict:
+        open_positions = {
+            symbol: {
+                "position": book.filled,
+                "pending": book.pending,
+                "avg_price": round(book.avg_price, 4),
+                "mark": book.mark,
+                "unrealized": round(book.unrealized(), 2),
+                "realized": round(book.realized, 2),
+            }
+            for symbol, book in self._books.items() if book.filled or book.pending
+        }
+        return {
+            "killed": self.killed,
+            "gross_notional": round(self.gross, 2),
+            "net_notional": round(self.net, 2),
+            "realized": round(self.realized, 2),
+            "unrealized": round(self.unrealized, 2),
+            "rejections": self.rejections,
+            "limits": self.limits.__dict__,
+            "positions": open_positions,
+        }
+
+
+# Global Instance, consulted by the order pipeline before every send
+risk_engine = RiskEngine(RiskLimits.from_settings())
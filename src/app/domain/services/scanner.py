@@ -0,0 +1,353 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from src.app.domain.services.utbot import (
+    FLIP_BUY, FLIP_SELL, SMOOTHING_MODES, SMOOTHING_RMA, SMOOTHING_ROLLING, SMOOTHING_SMA, UTBotStrategy, run_utbot_batch
+)
+from src.app.infrastructure.market_data.normalizer import bucket_start, parse_interval, resample_columns
+
+# Cell position encoding (same as the batch kernel)
+POS_FLAT = 0
+POS_LONG = 1
+POS_SHORT = -1
+
+_POSITION_NAMES = {POS_FLAT: "FLAT", POS_LONG: "LONG", POS_SHORT: "SHORT"}
+_POSITION_CODES = {"FLAT": POS_FLAT, "LONG": POS_LONG, "SHORT": POS_SHORT}
+
+# No bucket yet / nothing closed yet
+_NO_BUCKET = np.iinfo(np.int64).min
+
+
+class UTBotScanner:
+    """
+    UTBot state for a whole watchlist x timeframes grid, as struct-of-arrays.
+
+    One cell per (symbol, timeframe), at index symbol_index * len(timeframes) + tf_index.
+    Each cell carries its own in-progress bucket (the `BarResampler` logic) and
+    the full `UTBotStrategy` state: TR ring, running sum, ATR, stop and position.
+    `update` takes one base bar for each of many symbols and advances every
+    affected cell in a handful of whole-array operations, returning only the
+    cells whose position flipped. The arithmetic is the streaming engine's,
+    op for op, so a cell matches a `UTBotStrategy` fed the same bars exactly.
+    """
+    def __init__(self, timeframes: Sequence[str], atr_period: int = 10, atr_multiplier: float = 1.0,
+                 smoothing: str = SMOOTHING_SMA, origin: int = 0, capacity: int = 64):
+        if atr_period < 1:
+            raise ValueError(f"atr_period must be >= 1, got {atr_period}")
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown ATR smoothing '{smoothing}'. Expected one of {SMOOTHING_MODES}")
+        if not timeframes:
+            raise ValueError("The scanner needs at least one timeframe")
+        self.timeframes = list(timeframes)
+        self.seconds = np.array([parse_interval(tf) for tf in self.timeframes], dtype=np.int64)
+        self.atr_period = atr_period
+        self.mult = atr_multiplier
+        self.smoothing = smoothing
+        self.origin = origin
+
+        self.symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._capacity = 0
+        self._allocate(max(capacity, 1))
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    # --- layout ---
+    def _allocate(self, capacity: int):
+        """(Re)allocates every per-cell array for `capacity` symbols, keeping existing cells"""
+        n = capacity * len(self.timeframes)
+        fresh = {
+            # Bucket being built and the last one closed (start timestamps)
+            "bucket": np.full(n, _NO_BUCKET, dtype=np.int64),
+            "closed": np.full(n, _NO_BUCKET, dtype=np.int64),
+            "b_open": np.zeros(n),
+            "b_high": np.zeros(n),
+            "b_low": np.zeros(n),
+            "b_close": np.zeros(n),
+            # UTBot state; prev_close NaN = no bar seen yet
+            "tr": np.zeros((n, self.atr_period)),
+            "tr_idx": np.zeros(n, dtype=np.int64),
+            "tr_count": np.zeros(n, dtype=np.int64),
+            "tr_sum": np.zeros(n),
+            "prev_close": np.full(n, np.nan),
+            "atr": np.zeros(n),
+            "stop": np.zeros(n),
+            "position": np.zeros(n, dtype=np.int8),
+            "initialized": np.zeros(n, dtype=bool),
+        }
+        used = len(self.symbols) * len(self.timeframes)
+        for name, array in fresh.items():
+            if used:
+                array[:used] = getattr(self, name)[:used]
+            setattr(self, name, array)
+        self._capacity = capacity
+
+    def add(self, symbol: str) -> int:
+        """Index of `symbol`'s row, adding empty cells for it if it is new"""
+        index = self._index.get(symbol)
+        if index is None:
+            if len(self.symbols) == self._capacity:
+                self._allocate(self._capacity * 2)
+            index = self._index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return index
+
+    def index(self, symbol: str) -> Optional[int]:
+        return self._index.get(symbol)
+
+    def _cell(self, symbol: str, timeframe: str) -> int:
+        return self._index[symbol] * len(self.timeframes) + self.timeframes.index(timeframe)
+
+    # --- warmup ---
+    def prime(self, symbol: str, timeframe: str, strategy: UTBotStrategy,
+              closed: Optional[int] = None, partial: Optional[Dict] = None):
+        """
+        Loads a warmed `UTBotStrategy` into one cell. `closed` is the start of the
+        last bar it processed (older live bars are ignored); `partial` is the
+        in-progress bucket ({timestamp, open, high, low, close}) to keep building.
+        """
+        if strategy.atr_period != self.atr_period or strategy.smoothing != self.smoothing:
+            raise ValueError("Strategy parameters do not match the scanner")
+        self.add(symbol)
+        cell = self._cell(symbol, timeframe)
+        self.tr[cell] = strategy._tr
+        self.tr_idx[cell] = strategy._tr_idx
+        self.tr_count[cell] = strategy._tr_count
+        self.tr_sum[cell] = strategy._tr_sum
+        self.prev_close[cell] = np.nan if strategy._prev_close is None else strategy._prev_close
+        self.atr[cell] = strategy.atr
+        self.stop[cell] = strategy.stop_val
+        self.position[cell] = _POSITION_CODES[strategy.position]
+        self.initialized[cell] = strategy.is_initialized
+        self.closed[cell] = _NO_BUCKET if closed is None else int(closed)
+        if partial is None:
+            self.bucket[cell] = _NO_BUCKET
+        else:
+            self.bucket[cell] = int(partial["timestamp"])
+            self.b_open[cell] = partial["open"]
+            self.b_high[cell] = partial["high"]
+            self.b_low[cell] = partial["low"]
+            self.b_close[cell] = partial["close"]
+
+    def prime_history(self, symbol: str, columns: Dict, base_seconds: float):
+        """
+        Warms every timeframe of `symbol` from one base history (columnar, e.g. 1m bars).
+        A last bucket the history doesn't complete is carried over as in progress, not processed.
+        """
+        self.add(symbol)
+        ts = np.asarray(columns["timestamps"], dtype=np.int64)
+        for timeframe, seconds in zip(self.timeframes, self.seconds.tolist()):
+            bars = resample_columns(columns, seconds, self.origin)
+            count = len(bars["timestamps"])
+            partial = None
+            if count and ts[-1] + base_seconds < bars["timestamps"][-1] + seconds:
+                count -= 1
+                partial = {name: bars[name][count] for name in ("open", "high", "low", "close")}
+                partial["timestamp"] = bars["timestamps"][count]
+            strategy = run_utbot_batch(
+                bars["high"][:count], bars["low"][:count], bars["close"][:count],
+                self.atr_period, self.mult, self.smoothing, prime=True
+            ).strategy
+            closed = int(bars["timestamps"][count - 1]) if count else None
+            self.prime(symbol, timeframe, strategy, closed, partial)
+
+    # --- live ---
+    def update(self, rows: np.ndarray, timestamps: np.ndarray, opens: np.ndarray, high: np.ndarray,
+               low: np.ndarray, close: np.ndarray, base_seconds: np.ndarray) -> List[Dict]:
+        """
+        Ingests one completed base bar for each symbol row in `rows` (each row at
+        most once per call). Every timeframe of those symbols is resampled and
+        completed buckets are run through UTBot. Returns the flipped cells.
+        """
+        n_tf = len(self.timeframes)
+        if len(rows) == 0:
+            return []
+        ts_float = np.asarray(timestamps, dtype=np.float64)
+        ts = ts_float.astype(np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        # Bar x timeframe grid, flattened (bar-major, same order as the cells)
+        cells = (rows[:, None] * n_tf + np.arange(n_tf)).ravel()
+        seconds = np.broadcast_to(self.seconds, (len(rows), n_tf)).ravel()
+        ts = np.repeat(ts, n_tf)
+        start = bucket_start(ts, seconds, self.origin)
+        o = np.repeat(np.asarray(opens, dtype=np.float64), n_tf)
+        h = np.repeat(np.asarray(high, dtype=np.float64), n_tf)
+        l = np.repeat(np.asarray(low, dtype=np.float64), n_tf)
+        c = np.repeat(np.asarray(close, dtype=np.float64), n_tf)
+
+        bucket = self.bucket[cells]
+        active = bucket != _NO_BUCKET
+        # Late bars for a closed (or older than the current) bucket are ignored
+        keep = (start > self.closed[cells]) & ~(active & (start < bucket))
+        flips: List[Dict] = []
+
+        # A bar from a later bucket closes the one in progress first
+        stale = keep & active & (start > bucket)
+        if stale.any():
+            flips += self._finalize(cells[stale])
+            active &= ~stale
+
+        ends = np.repeat(ts_float + np.asarray(base_seconds, dtype=np.float64), n_tf)[keep]
+        cells, start, seconds = cells[keep], start[keep], seconds[keep]
+        o, h, l, c = o[keep], h[keep], l[keep], c[keep]
+        fresh = ~active[keep]
+        new = cells[fresh]
+        self.bucket[new] = start[fresh]
+        self.b_open[new] = o[fresh]
+        self.b_high[new] = h[fresh]
+        self.b_low[new] = l[fresh]
+        cont = cells[~fresh]
+        self.b_high[cont] = np.maximum(self.b_high[cont], h[~fresh])
+        self.b_low[cont] = np.minimum(self.b_low[cont], l[~fresh])
+        self.b_close[cells] = c
+
+        # Finalize as soon as the base bar that completes the bucket is in
+        complete = ends >= start + seconds
+        if complete.any():
+            flips += self._finalize(cells[complete])
+        return flips
+
+    def _finalize(self, cells: np.ndarray) -> List[Dict]:
+        high, low, close = self.b_high[cells], self.b_low[cells], self.b_close[cells]
+        flipped, actions = self._step(cells, high, low, close)
+        hit = cells[flipped]
+        rows, tfs = np.divmod(hit, len(self.timeframes))
+        symbols, timeframes = self.symbols, self.timeframes
+        flips = [
+            {
+                "symbol": symbols[row],
+                "interval": timeframes[tf],
+                "timestamp": ts,
+                "action": "BUY" if action == FLIP_BUY else "SELL",
+                "position": "LONG" if action == FLIP_BUY else "SHORT",
+                "stop": round(stop, 2),
+                "price": price,
+            }
+            for row, tf, ts, action, stop, price in zip(
+                rows.tolist(), tfs.tolist(), self.bucket[hit].tolist(), actions.tolist(),
+                self.stop[hit].tolist(), close[flipped].tolist()
+            )
+        ]
+        self.closed[cells] = self.bucket[cells]
+        self.bucket[cells] = _NO_BUCKET
+        return flips
+
+    def _step(self, cells: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        """
+        `UTBotStrategy.process_bar` for many cells at once (each at most once).
+        Returns a mask over `cells` of the ones that flipped, and their FLIP_* codes.
+        """
+        period = self.atr_period
+        prev = self.prev_close[cells]
+        self.prev_close[cells] = close
+        has_prev = ~np.isnan(prev)
+        idx = cells[has_prev]
+        h, l, c, prev = high[has_prev], low[has_prev], close[has_prev], prev[has_prev]
+
+        tr = np.maximum(np.maximum(h - l, np.abs(h - prev)), np.abs(l - prev))
+        slot = self.tr_idx[idx]
+        evicted = self.tr[idx, slot]
+        self.tr[idx, slot] = tr
+        slot = slot + 1
+        slot[slot == period] = 0
+        self.tr_idx[idx] = slot
+
+        count = self.tr_count[idx]
+        filling = count < period
+        count = count + filling
+        self.tr_count[idx] = count
+        just_full = filling & (count == period)
+        full = ~filling
+
+        tr_sum = self.tr_sum[idx]
+        atr = self.atr[idx]
+        if self.smoothing == SMOOTHING_RMA:
+            tr_sum = np.where(filling, tr_sum + tr, tr_sum)
+            atr = np.where(just_full, tr_sum / period, atr)
+            atr = np.where(full, (atr * (period - 1) + tr) / period, atr)
+        else:
+            tr_sum = np.where(filling, tr_sum + tr, tr_sum + (tr - evicted))
+            ready = just_full | full
+            if self.smoothing == SMOOTHING_ROLLING:
+                atr = np.where(ready, tr_sum / period, atr)
+            elif ready.any():
+                # Oldest -> newest, like the streaming loop, so the sums are bit-identical
+                ring = self.tr[idx[ready]]
+                rows = np.arange(len(ring))
+                oldest = slot[ready]
+                acc = ring[rows, oldest]
+                for k in range(1, period):
+                    pos = oldest + k
+                    pos[pos >= period] -= period
+                    acc = acc + ring[rows, pos]
+                atr[ready] = acc / period
+        self.tr_sum[idx] = tr_sum
+        self.atr[idx] = atr
+
+        # Trailing stop for every cell whose ATR is ready
+        ready = just_full | full
+        idx, c, atr = idx[ready], c[ready], atr[ready]
+        dist = atr * self.mult
+        stop = self.stop[idx]
+        position = self.position[idx]
+        initialized = self.initialized[idx]
+
+        long_ = initialized & (position == POS_LONG)
+        short = initialized & (position == POS_SHORT)
+        stop = np.where(long_, np.maximum(stop, c - dist), stop)
+        stop = np.where(short, np.minimum(stop, c + dist), stop)
+        sell = long_ & (c < stop)
+        buy = short & (c > stop)
+        stop = np.where(sell, c + dist, stop)
+        stop = np.where(buy | ~initialized, c - dist, stop)
+        position = np.where(sell, POS_SHORT, np.where(buy | ~initialized, POS_LONG, position)).astype(np.int8)
+
+        self.stop[idx] = stop
+        self.position[idx] = position
+        self.initialized[idx] = True
+
+        flipped = np.zeros(len(cells), dtype=bool)
+        actions = np.zeros(len(cells), dtype=np.int8)
+        where = np.flatnonzero(has_prev)[ready]
+        flipped[where] = sell | buy
+        actions[where] = np.where(buy, FLIP_BUY, FLIP_SELL)
+        return flipped, actions[flipped]
+
+    # --- queries ---
+    def snapshot(self) -> List[Dict]:
+        """Position and stop of every initialized cell, for a newly connected client"""
+        n_tf = len(self.timeframes)
+        used = len(self.symbols) * n_tf
+        cells = np.flatnonzero(self.initialized[:used])
+        return [
+            {
+                "symbol": self.symbols[cell // n_tf],
+                "interval": self.timeframes[cell % n_tf],
+                "timestamp": closed if closed != _NO_BUCKET else None,
+                "position": _POSITION_NAMES[position],
+                "stop": round(stop, 2),
+            }
+            for cell, position, stop, closed in zip(
+                cells.tolist(), self.position[cells].tolist(), self.stop[cells].tolist(), self.closed[cells].tolist()
+            )
+        ]
+
+    def state(self, symbol: str, timeframe: str) -> Dict:
+        """One cell's full UTBot state, in `UTBotStrategy.to_state()` shape"""
+        cell = self._cell(symbol, timeframe)
+        prev_close = float(self.prev_close[cell])
+        return {
+            "atr_period": self.atr_period,
+            "atr_multiplier": self.mult,
+            "smoothing": self.smoothing,
+            "position": _POSITION_NAMES[int(self.position[cell])],
+            "stop_val": float(self.stop[cell]),
+            "is_initialized": bool(self.initialized[cell]),
+            "atr": float(self.atr[cell]),
+            "tr": self.tr[cell].tolist(),
+            "tr_idx": int(self.tr_idx[cell]),
+            "tr_count": int(self.tr_count[cell]),
+            "tr_sum": float(self.tr_sum[cell]),
+            "prev_close": None if np.isnan(prev_close) else prev_close,
+        }
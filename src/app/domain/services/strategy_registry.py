@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import numpy as np
+from src.app.core.config import settings
+from src.app.domain.services.utbot import SMOOTHING_SMA, UTBotStrategy, run_utbot_batch
+
+logger = logging.getLogger("strategy_registry")
+
+# (symbol, interval, atr_period, atr_multiplier, smoothing); interval None = raw upstream bars
+StrategyKey = Tuple[str, Optional[str], int, float, str]
+
+# Loads columnar history ({timestamps: [...], high: [...], ...}) for warmup
+HistoryLoader = Callable[[], Awaitable[Dict]]
+
+
+class _Entry:
+    __slots__ = ("key", "refs", "strategy", "warmup", "last_timestamp", "last_event")
+
+    def __init__(self, key: StrategyKey):
+        self.key = key
+        self.refs = 0
+        self.strategy: Optional[UTBotStrategy] = None
+        self.warmup: Optional[asyncio.Task] = None
+        self.last_timestamp: Optional[float] = None
+        self.last_event: Optional[Dict] = None
+
+
+class StrategyRegistry:
+    """
+    Process-wide live UTBot instances keyed by (symbol, interval, atr_period, multiplier, smoothing).
+
+    Every consumer of a key shares ONE strategy: it is warmed once (concurrent
+    acquirers await the same warmup), fed by the live stream through `on_bar`,
+    and can hand new clients an immediate snapshot of position/stop.
+
+    With STRATEGY_CHECKPOINT_DIR set, state is written to disk when a key is
+    released, periodically, and on shutdown. A restart then restores the
+    checkpoint and only replays history bars newer than it instead of re-warming.
+    """
+    def __init__(self, checkpoint_dir: Optional[str] = None):
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self._entries: Dict[StrategyKey, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: StrategyKey) -> Optional[UTBotStrategy]:
+        entry = self._entries.get(key)
+        return entry.strategy if entry else None
+
+    # --- lifecycle ---
+    def acquire(self, key: StrategyKey, load_history: HistoryLoader) -> asyncio.Task:
+        """
+        Takes a reference on `key`, starting its warmup if it is new.
+        Returns the warmup task; await it (shielded) to get the ready strategy.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(key)
+            entry.warmup = asyncio.create_task(self._warm(entry, load_history), name=f"warmup:{key}")
+        entry.refs += 1
+        return entry.warmup
+
+    def retry(self, key: StrategyKey, load_history: HistoryLoader) -> Optional[asyncio.Task]:
+        """Restarts the warmup of `key` if it failed; returns the (new or current) warmup task"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        warmup = entry.warmup
+        if warmup is None or (warmup.done() and (warmup.cancelled() or warmup.exception() is not None)):
+            entry.warmup = asyncio.create_task(self._warm(entry, load_history), name=f"warmup:{key}")
+        return entry.warmup
+
+    async def release(self, key: StrategyKey):
+        """Drops a reference; the last one checkpoints the state and forgets the key"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+
+        del self._entries[key]
+        if entry.warmup is not None and not entry.warmup.done():
+            entry.warmup.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await entry.warmup
+        self._checkpoint(entry)
+
+    async def wait_ready(self, key: StrategyKey) -> Optional[UTBotStrategy]:
+        entry = self._entries.get(key)
+        if entry is None or entry.warmup is None:
+            return None
+        return await asyncio.shield(entry.warmup)
+
+    async def _warm(self, entry: _Entry, load_history: HistoryLoader) -> UTBotStrategy:
+        symbol, interval, atr_period, atr_multiplier, smoothing = entry.key
+        label = f"{symbol}@{interval or 'raw'} ({atr_period}, {atr_multiplier}, {smoothing})"
+        history = await load_history()
+        ts = np.asarray(history["timestamps"], dtype=np.float64)
+        high = np.asarray(history["high"], dtype=np.float64)
+        low = np.asarray(history["low"], dtype=np.float64)
+        close = np.asarray(history["close"], dtype=np.float64)
+
+        restored = self._restore(entry.key)
+        if restored is not None and len(ts) and ts[0] <= restored[1]:
+            strategy, last_ts = restored
+            newer = np.flatnonzero(ts > last_ts)
+            for i in newer.tolist():
+                strategy.process_bar({'high': high[i], 'low': low[i], 'close': close[i]})
+            entry.last_timestamp = float(ts[newer[-1]]) if len(newer) else last_ts
+            logger.info(f"♻️ Restored {label} from checkpoint, replayed {len(newer)} newer bars")
+        else:
+            # Prime in one vectorized pass instead of replaying bar by bar
+            strategy = run_utbot_batch(high, low, close, atr_period, atr_multiplier, smoothing, prime=True).strategy
+            entry.last_timestamp = float(ts[-1]) if len(ts) else None
+            logger.info(f"🔥 Warmed up {label} on {len(ts)} bars")
+
+        entry.strategy = strategy
+        logger.info(f"✅ {label} ready. Current State: {strategy.position} @ {strategy.stop_val}")
+        return strategy
+
+    # --- live feed ---
+    def on_bar(self, key: StrategyKey, event: Dict) -> Dict:
+        """
+        Runs completed bars through the shared strategy and stamps the current
+        state on every message. Partial bars ("final": False) don't advance it.
+        """
+        entry = self._entries[key]
+        strategy = entry.strategy
+        if event.get("final", True):
+            signal = strategy.process_bar({
+                'close': event['price'],
+                'high': event['high'],
+                'low': event['low'],
+                'open': event['open'],
+                'volume': event.get('volume', 100)
+            })
+            event['ut_action'] = signal.action
+            event['ut_stop'] = signal.stop_price
+            entry.last_timestamp = event.get('timestamp', entry.last_timestamp)
+        else:
+            event['ut_action'] = "HOLD"
+            event['ut_stop'] = round(strategy.stop_val, 2)
+        event['ut_position'] = strategy.position
+        entry.last_event = event
+        return event
+
+    def snapshot(self, key: StrategyKey) -> Optional[Dict]:
+        """Latest bar + strategy state for a newly connected client (None while warming)"""
+        entry = self._entries.get(key)
+        if entry is None or entry.strategy is None:
+            return None
+        strategy = entry.strategy
+        if entry.last_event is not None:
+            snapshot = dict(entry.last_event)
+        else:
+            price = strategy.last_close or 0.0
+            snapshot = {
+                "symbol": key[0],
+                "price": price,
+                "open": price,
+                "high": price,
+                "low": price,
+                "timestamp": entry.last_timestamp,
+            }
+            if key[1] is not None:
+                snapshot["interval"] = key[1]
+        snapshot["ut_action"] = "HOLD"
+        snapshot["ut_stop"] = round(strategy.stop_val, 2)
+        snapshot["ut_position"] = strategy.position
+        snapshot["snapshot"] = True
+        return snapshot
+
+    # --- checkpoints ---
+    def _checkpoint_path(self, key: StrategyKey) -> Path:
+        symbol, interval, atr_period, atr_multiplier, smoothing = key
+        safe_symbol = "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol)
+        name = f"{safe_symbol}_{interval or 'raw'}_{atr_period}_{atr_multiplier!r}"
+        # The original SMA keeps the old file names, so existing checkpoints still restore
+        if smoothing != SMOOTHING_SMA:
+            name = f"{name}_{smoothing}"
+        return self.checkpoint_dir / f"{name}.json"
+
+    def _checkpoint(self, entry: _Entry):
+        if self.checkpoint_dir is None or entry.strategy is None:
+            return
+        try:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            path = self._checkpoint_path(entry.key)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({
+                "saved_at": time.time(),
+                "last_timestamp": entry.last_timestamp,
+                "state": entry.strategy.to_state(),
+            }))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"❌ Strategy checkpoint failed for {entry.key}: {e}")
+
+    def checkpoint_all(self):
+        for entry in list(self._entries.values()):
+            self._checkpoint(entry)
+
+    def _restore(self, key: StrategyKey) -> Optional[Tuple[UTBotStrategy, float]]:
+        if self.checkpoint_dir is None:
+            return None
+        path = self._checkpoint_path(key)
+        try:
+            data = json.loads(path.read_text())
+            if data["last_timestamp"] is None:
+                return None
+            strategy = UTBotStrategy.from_state(data["state"])
+            if strategy.smoothing != key[4]:
+                return None
+            return strategy, float(data["last_timestamp"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable strategy checkpoint {path.name}: {e}")
+            return None
+
+    async def run_checkpoints(self, interval_seconds: float):
+        """Background task (started by the lifespan) that checkpoints every live strategy"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self.checkpoint_all()
+
+
+# Global Instance
+strategy_registry = StrategyRegistry(settings.STRATEGY_CHECKPOINT_DIR or None)
@@ -1,5 +1,16 @@
-from typing import Optional
+from typing import Optional, Tuple
 from dataclasses import dataclass
+import numpy as np
+
+# ATR smoothing modes
+SMOOTHING_SMA = "sma"          # Simple average of the last N true ranges (original behaviour, bit-exact)
+SMOOTHING_ROLLING = "rolling"  # Same SMA via a running sum: O(1) per bar, may differ in the last ulp
+SMOOTHING_RMA = "rma"          # Wilder's smoothing (TradingView's ta.atr), O(1) per bar
+SMOOTHING_MODES = (SMOOTHING_SMA, SMOOTHING_ROLLING, SMOOTHING_RMA)
+
+# Batch kernel encodings
+FLIP_BUY = 1
+FLIP_SELL = -1
 
 @dataclass
 class Signal:
@@ -12,58 +23,142 @@ class UTBotStrategy:
     """
     Python implementation of the UT Bot Strategy.
     Source Logic: focus-chart-fixed7.html lines 351-428
+
+    Streaming engine: true ranges live in a fixed-size ring buffer, so each
+    bar costs one TR computation and no list/dict churn. The default "sma"
+    mode re-adds the ring oldest-first to stay bit-for-bit identical to the
+    original implementation; "rolling" and "rma" are strictly O(1).
     """
-    def __init__(self, atr_period: int = 10, atr_multiplier: float = 1.0):
+    __slots__ = (
+        "atr_period", "mult", "smoothing",
+        "position", "stop_val", "is_initialized", "atr",
+        "_tr", "_tr_idx", "_tr_count", "_tr_sum", "_prev_close",
+    )
+
+    def __init__(self, atr_period: int = 10, atr_multiplier: float = 1.0, smoothing: str = SMOOTHING_SMA):
+        if atr_period < 1:
+            raise ValueError(f"atr_period must be >= 1, got {atr_period}")
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown ATR smoothing '{smoothing}'. Expected one of {SMOOTHING_MODES}")
+
         self.atr_period = atr_period
         self.mult = atr_multiplier
-        
+        self.smoothing = smoothing
+
         # State
-        self.bars = [] # Keep history for ATR calc
         self.position = "FLAT" # FLAT, LONG, SHORT
         self.stop_val = 0.0
         self.is_initialized = False
+        self.atr = 0.0
+
+        # ATR ring buffer: last `atr_period` true ranges, _tr_idx = next slot (oldest once full)
+        self._tr = [0.0] * atr_period
+        self._tr_idx = 0
+        self._tr_count = 0
+        self._tr_sum = 0.0
+        self._prev_close: Optional[float] = None
+
+    @property
+    def last_close(self) -> Optional[float]:
+        return self._prev_close
+
+    def to_state(self) -> dict:
+        """Plain-JSON snapshot of the full streaming state (for checkpoints)"""
+        return {
+            "atr_period": self.atr_period,
+            "atr_multiplier": self.mult,
+            "smoothing": self.smoothing,
+            "position": self.position,
+            "stop_val": self.stop_val,
+            "is_initialized": self.is_initialized,
+            "atr": self.atr,
+            "tr": list(self._tr),
+            "tr_idx": self._tr_idx,
+            "tr_count": self._tr_count,
+            "tr_sum": self._tr_sum,
+            "prev_close": self._prev_close,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "UTBotStrategy":
+        """Rebuilds a strategy from `to_state()` output, continuing exactly where it left off"""
+        strategy = cls(state["atr_period"], state["atr_multiplier"], state["smoothing"])
+        if len(state["tr"]) != strategy.atr_period:
+            raise ValueError("Checkpoint ring buffer does not match atr_period")
+        strategy.position = state["position"]
+        strategy.stop_val = state["stop_val"]
+        strategy.is_initialized = state["is_initialized"]
+        strategy.atr = state["atr"]
+        strategy._tr = [float(x) for x in state["tr"]]
+        strategy._tr_idx = state["tr_idx"]
+        strategy._tr_count = state["tr_count"]
+        strategy._tr_sum = state["tr_sum"]
+        strategy._prev_close = state["prev_close"]
+        return strategy
+
+    def _update_atr(self, high: float, low: float, close: float) -> Optional[float]:
+        """
+        Pushes one bar into the ATR state.
+        Returns None until `atr_period` true ranges have been seen.
+        """
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            return None
+
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        period = self.atr_period
+        ring = self._tr
+        idx = self._tr_idx
+        evicted = ring[idx]
+        ring[idx] = tr
+        idx += 1
+        if idx == period:
+            idx = 0
+        self._tr_idx = idx
+
+        if self._tr_count < period:
+            self._tr_count += 1
+            self._tr_sum += tr
+            if self._tr_count < period:
+                return None
+            if self.smoothing == SMOOTHING_RMA:
+                # Wilder seeds with the simple average of the first window
+                self.atr = self._tr_sum / period
+                return self.atr
+        elif self.smoothing == SMOOTHING_RMA:
+            self.atr = (self.atr * (period - 1) + tr) / period
+            return self.atr
+        else:
+            self._tr_sum += tr - evicted
 
-    def _calculate_atr(self) -> float:
-        """Standard ATR Calculation"""
-        if len(self.bars) < 2:
-            return 0.0
-        
-        # We only need the last 'period' bars
-        # Optimization: In production, we'd use a rolling window buffer
-        period_bars = self.bars[-(self.atr_period + 1):] 
+        if self.smoothing == SMOOTHING_ROLLING:
+            self.atr = self._tr_sum / period
+            return self.atr
+
+        # SMOOTHING_SMA: sum oldest -> newest, exactly like the original loop
         tr_sum = 0.0
-        
-        for i in range(1, len(period_bars)):
-            curr = period_bars[i]
-            prev = period_bars[i-1]
-            
-            high = curr['high']
-            low = curr['low']
-            prev_close = prev['close']
-            
-            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr_sum += tr
-            
-        return tr_sum / self.atr_period
+        for i in range(idx, period):
+            tr_sum += ring[i]
+        for i in range(0, idx):
+            tr_sum += ring[i]
+        self.atr = tr_sum / period
+        return self.atr
 
     def process_bar(self, bar: dict) -> Signal:
         """
         Ingests a new candle and updates the trailing stop.
         Returns a Signal if the state flips.
         """
-        self.bars.append(bar)
-        # Keep memory small
-        if len(self.bars) > self.atr_period + 5:
-            self.bars.pop(0)
+        close = bar['close']
+        atr = self._update_atr(bar['high'], bar['low'], close)
 
         # Need enough data for ATR
-        if len(self.bars) <= self.atr_period:
-            return Signal("HOLD", 0.0, bar['close'], "Warming Up")
+        if atr is None:
+            return Signal("HOLD", 0.0, close, "Warming Up")
 
-        atr = self._calculate_atr()
         dist = atr * self.mult
-        close = bar['close']
-        
+
         # Initialize Stop if first run
         if not self.is_initialized:
             self.stop_val = close - dist
@@ -72,31 +167,224 @@ class UTBotStrategy:
             return Signal("HOLD", self.stop_val, close, "Init")
 
         action = "HOLD"
-        
+
         # Logic Ported from JS:
         if self.position == "LONG":
             new_stop = close - dist
             # Trail up only
             self.stop_val = max(self.stop_val, new_stop)
-            
+
             if close < self.stop_val:
                 self.position = "SHORT"
                 self.stop_val = close + dist # Flip to Short Stop
                 action = "SELL"
-                
+
         elif self.position == "SHORT":
             new_stop = close + dist
             # Trail down only
             self.stop_val = min(self.stop_val, new_stop)
-            
+
             if close > self.stop_val:
                 self.position = "LONG"
                 self.stop_val = close - dist # Flip to Long Stop
                 action = "BUY"
 
         return Signal(
-            action=action, 
-            stop_price=round(self.stop_val, 2), 
+            action=action,
+            stop_price=round(self.stop_val, 2),
             entry_price=close,
             reason="UTBot Flip"
-        )
\ No newline at end of file
+        )
+
+
+@dataclass
+class UTBotBatchResult:
+    """
+    Per-bar output of `run_utbot_batch`, aligned with the input arrays.
+      atr:      ATR after each bar (NaN while warming up)
+      stop:     trailing stop after each bar, unrounded (NaN until initialized)
+      position: 1 LONG, -1 SHORT, 0 FLAT
+      flips:    1 BUY, -1 SELL, 0 no flip
+      strategy: streaming UTBotStrategy primed at the final bar (only if prime=True)
+    """
+    atr: np.ndarray
+    stop: np.ndarray
+    position: np.ndarray
+    flips: np.ndarray
+    strategy: Optional[UTBotStrategy] = None
+
+
+def compute_true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """TR per bar; tr[0] is NaN because it has no previous close"""
+    tr = np.full(len(close), np.nan)
+    if len(close) > 1:
+        prev_close = close[:-1]
+        h, l = high[1:], low[1:]
+        tr[1:] = np.maximum(np.maximum(h - l, np.abs(h - prev_close)), np.abs(l - prev_close))
+    return tr
+
+
+def _rolling_tr_sum(tr: np.ndarray, period: int) -> np.ndarray:
+    """
+    Running-sum TR window exactly as the streaming engine maintains it:
+    first window summed left to right, then s += tr_new - tr_evicted.
+    Element k is the sum for the window ending at bar k (NaN before the first full window).
+    """
+    n = len(tr)
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+    first = np.add.accumulate(tr[1:period + 1])[-1]
+    steps = tr[period + 1:] - tr[1:n - period]
+    # add.accumulate is strictly sequential, so this matches the streaming float ops
+    out[period:] = np.add.accumulate(np.concatenate(([first], steps)))
+    return out
+
+
+def compute_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr_period: int = 10, smoothing: str = SMOOTHING_SMA) -> np.ndarray:
+    """
+    Vectorized ATR matching `UTBotStrategy` bar for bar (NaN while warming up).
+    "sma" sums each window oldest-first with `atr_period` whole-array adds, which
+    reproduces the streaming float results exactly.
+    """
+    if smoothing not in SMOOTHING_MODES:
+        raise ValueError(f"Unknown ATR smoothing '{smoothing}'. Expected one of {SMOOTHING_MODES}")
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    tr = compute_true_range(high, low, close)
+    n = len(tr)
+    atr = np.full(n, np.nan)
+    if n <= atr_period:
+        return atr
+
+    if smoothing == SMOOTHING_SMA:
+        count = n - atr_period
+        acc = tr[1:1 + count].copy()
+        for offset in range(1, atr_period):
+            acc += tr[1 + offset:1 + offset + count]
+        atr[atr_period:] = acc / atr_period
+    elif smoothing == SMOOTHING_ROLLING:
+        atr[atr_period:] = _rolling_tr_sum(tr, atr_period)[atr_period:] / atr_period
+    else:
+        # Wilder's recursion is inherently sequential
+        value = np.add.accumulate(tr[1:atr_period + 1])[-1] / atr_period
+        atr[atr_period] = value
+        keep = atr_period - 1
+        trs = tr.tolist()
+        out = atr.tolist()
+        for i in range(atr_period + 1, n):
+            value = (value * keep + trs[i]) / atr_period
+            out[i] = value
+        atr = np.array(out)
+    return atr
+
+
+def run_utbot_batch(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    atr_period: int = 10,
+    atr_multiplier: float = 1.0,
+    smoothing: str = SMOOTHING_SMA,
+    prime: bool = False
+) -> UTBotBatchResult:
+    """
+    Runs UTBot over whole OHLC arrays in one call (warmup, backtests, charts).
+    Produces the same per-bar state as feeding `UTBotStrategy.process_bar`
+    one bar at a time. With prime=True the result also carries a streaming
+    strategy positioned at the last bar, ready for live `process_bar` calls.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    atr = compute_atr(high, low, close, atr_period, smoothing)
+    stop, position, flips = trail_utbot(close, atr, atr_period, atr_multiplier)
+
+    strategy = None
+    if prime:
+        strategy = _prime_strategy(high, low, close, atr, position, stop, atr_period, atr_multiplier, smoothing)
+
+    return UTBotBatchResult(atr=atr, stop=stop, position=position, flips=flips, strategy=strategy)
+
+
+def trail_utbot(close: np.ndarray, atr: np.ndarray, atr_period: int, atr_multiplier: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Trailing stop / position / flip arrays for a precomputed ATR series.
+    Split out of `run_utbot_batch` so sweeps can reuse one ATR across many multipliers.
+    """
+    n = len(close)
+    stop = np.full(n, np.nan)
+    if n <= atr_period:
+        return stop, np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int8)
+
+    # The trailing stop is path dependent, so walk it once over plain floats
+    closes = close.tolist()
+    dists = (atr * atr_multiplier).tolist()
+    stops = stop.tolist()
+    positions = [0] * n
+    flip_list = [0] * n
+
+    start = atr_period
+    c = closes[start]
+    stop_val = c - dists[start]
+    pos = 1
+    stops[start] = stop_val
+    positions[start] = 1
+
+    for i in range(start + 1, n):
+        c = closes[i]
+        d = dists[i]
+        if pos == 1:
+            candidate = c - d
+            if candidate > stop_val:
+                stop_val = candidate
+            if c < stop_val:
+                pos = -1
+                stop_val = c + d
+                flip_list[i] = FLIP_SELL
+        else:
+            candidate = c + d
+            if candidate < stop_val:
+                stop_val = candidate
+            if c > stop_val:
+                pos = 1
+                stop_val = c - d
+                flip_list[i] = FLIP_BUY
+        stops[i] = stop_val
+        positions[i] = pos
+
+    return np.array(stops), np.array(positions, dtype=np.int8), np.array(flip_list, dtype=np.int8)
+
+
+def _prime_strategy(high, low, close, atr, position, stop, atr_period, atr_multiplier, smoothing) -> UTBotStrategy:
+    """Builds a streaming strategy whose internal state equals having processed every bar"""
+    strategy = UTBotStrategy(atr_period=atr_period, atr_multiplier=atr_multiplier, smoothing=smoothing)
+    n = len(close)
+    if n == 0:
+        return strategy
+
+    tr = compute_true_range(high, low, close)
+    tr_total = n - 1
+    # The k-th true range (bar k+1) sits in ring slot k % period
+    for k in range(max(0, tr_total - atr_period), tr_total):
+        strategy._tr[k % atr_period] = float(tr[k + 1])
+    strategy._tr_idx = tr_total % atr_period
+    strategy._tr_count = min(tr_total, atr_period)
+    strategy._prev_close = float(close[-1])
+
+    if tr_total == 0:
+        return strategy
+    if tr_total < atr_period or smoothing == SMOOTHING_RMA:
+        strategy._tr_sum = float(np.add.accumulate(tr[1:min(tr_total, atr_period) + 1])[-1])
+    else:
+        strategy._tr_sum = float(_rolling_tr_sum(tr, atr_period)[-1])
+
+    if n > atr_period:
+        strategy.atr = float(atr[-1])
+        strategy.is_initialized = True
+        strategy.position = "LONG" if position[-1] == 1 else "SHORT"
+        strategy.stop_val = float(stop[-1])
+    return strategy
@@ -0,0 +1,197 @@
+"""
+Broker interface.
+
+Adapters implement `submit` / `cancel` / `replace` (each answers with the
+broker's acknowledgement, not the fill) and push everything that happens to
+an order afterwards as `OrderEvent`s: accepted, partial and full fills,
+cancels, rejects. Events come off one long-lived stream per adapter, so a
+fill reaches listeners as soon as the broker reports it instead of being
+polled for.
+
+Consumers either register a callback in `listeners` (called inline, must
+not block) or iterate `events()`.
+"""
+
+import abc
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import httpx
+
+logger = logging.getLogger("broker")
+
+# Normalized order states on the event stream
+BROKER_ACCEPTED = "accepted"
+BROKER_PARTIAL = "partially_filled"
+BROKER_FILLED = "filled"
+BROKER_CANCELED = "canceled"
+BROKER_REJECTED = "rejected"
+BROKER_EXPIRED = "expired"
+
+FINAL_BROKER_STATES = (BROKER_FILLED, BROKER_CANCELED, BROKER_REJECTED, BROKER_EXPIRED)
+
+ORDER_TYPE_MARKET = "Market"
+ORDER_TYPE_LIMIT = "Limit"
+
+# Buffered events per `events()` consumer; the oldest is dropped when a consumer falls behind
+EVENT_QUEUE_SIZE = 10_000
+
+
+@dataclass
+class BrokerOrder:
+    """What is sent to the broker"""
+    symbol: str
+    action: str                           # "BUY" or "SELL"
+    quantity: int
+    order_type: str = ORDER_TYPE_MARKET
+    limit_price: Optional[float] = None
+    # Reference price (last bar) for market orders; only paper/fake fills use it
+    price: float = 0.0
+    client_order_id: Optional[str] = None
+    time_in_force: str = "DAY"
+    # Signed filled position in the symbol when the order is sent (tells a sell from a short sale)
+    position: int = 0
+
+    @property
+    def short(self) -> bool:
+        """A sell of more than the long position: a short sale (FIX Side 5, TradeStation SellShort)"""
+        return self.action.upper() == "SELL" and self.quantity > self.position
+
+    @property
+    def cover(self) -> bool:
+        """A buy against a short position (TradeStation BuyToCover)"""
+        return self.action.upper() == "BUY" and self.position < 0
+
+
+@dataclass
+class BrokerAck:
+    """
+    The broker's answer to submit/cancel/replace. `accepted` is None when the
+    request may have reached the broker but no answer came back (timeout,
+    connection dropped after sending): the outcome is unknown, not refused.
+    """
+    accepted: Optional[bool]
+    broker_order_id: Optional[str] = None
+    error: Optional[str] = None
+    raw: Optional[Dict] = None
+
+    @property
+    def unknown(self) -> bool:
+        return self.accepted is None
+
+
+# Failures before anything was sent: the broker never saw the request
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def error_ack(error: Exception, broker_order_id: Optional[str] = None) -> BrokerAck:
+    """A request that raised: refused if it never left, outcome unknown if it may have reached the broker"""
+    sent = isinstance(error, httpx.TransportError) and not isinstance(error, UNSENT_ERRORS)
+    return BrokerAck(None if sent else False, broker_order_id, error=str(error) or type(error).__name__)
+
+
+@dataclass
+class OrderEvent:
+    """One status change of an order, as pushed by the broker"""
+    broker_order_id: str
+    status: str                           # one of the BROKER_* states
+    symbol: str = ""
+    filled_quantity: int = 0              # cumulative
+    fill_price: Optional[float] = None    # average over filled_quantity
+    remaining_quantity: Optional[int] = None
+    client_order_id: Optional[str] = None
+    reason: Optional[str] = None
+    # When we received it (epoch ns)
+    ts: int = field(default_factory=time.time_ns)
+    raw: Optional[Dict] = None
+
+    @property
+    def final(self) -> bool:
+        return self.status in FINAL_BROKER_STATES
+
+
+EventListener = Callable[[OrderEvent], None]
+
+
+class Broker(abc.ABC):
+    """
+    Base class for broker adapters: the order calls are abstract, event
+    fan-out (`_publish`, `listeners`, `events()`) is shared.
+    """
+    name = "broker"
+
+    def __init__(self, account_id: str = ""):
+        self.account_id = account_id
+        self.listeners: List[EventListener] = []
+        self._queues: List[asyncio.Queue] = []
+        self.events_received = 0
+
+    # --- lifecycle ---
+    async def start(self):
+        """Opens connections and the order event stream"""
+
+    async def close(self):
+        pass
+
+    # --- orders ---
+    @abc.abstractmethod
+    async def submit(self, order: BrokerOrder) -> BrokerAck:
+        """Sends a new order; the ack means accepted for routing, fills come as events"""
+
+    @abc.abstractmethod
+    async def cancel(self, broker_order_id: str) -> BrokerAck:
+        """Cancels what is left of an open order"""
+
+    @abc.abstractmethod
+    async def replace(self, broker_order_id: str, quantity: Optional[int] = None,
+                      limit_price: Optional[float] = None) -> BrokerAck:
+        """Changes an open order's total quantity and/or limit price"""
+
+    async def execute_order(self, symbol: str, action: str, quantity: int = 10, price: float = 0.0) -> Dict:
+        """
+        Market order, answered in the old {"status": "accepted" | "failed" | "unknown", ...} shape.
+        Accepted is not filled: fills arrive later as order events.
+        """
+        ack = await self.submit(BrokerOrder(symbol, action, quantity, price=price))
+        if ack.accepted:
+            return {"status": "accepted", "id": ack.broker_order_id, "response": ack.raw}
+        return {"status": "unknown" if ack.unknown else "failed", "error": ack.error}
+
+    def assigned_id(self, client_order_id: str) -> Optional[str]:
+        """
+        The broker_order_id an order sent with `client_order_id` is reported under,
+        for adapters that pick it themselves before sending (None: the broker assigns it)
+        """
+        return None
+
+    # --- market data ---
+    def on_bar(self, symbol: str, bar: Dict):
+        """StreamHub bar listener; adapters that fill in-process cross resting limit orders on it"""
+
+    # --- events ---
+    def _publish(self, event: OrderEvent):
+        self.events_received += 1
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"❌ Order event listener failed: {e}")
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def events(self) -> AsyncIterator[OrderEvent]:
+        """Every order event from now on, until the consumer stops iterating"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+    def stats(self) -> Dict:
+        return {"broker": self.name, "events": self.events_received, "event_consumers": len(self._queues)}
@@ -0,0 +1,20 @@
+from src.app.core.config import settings
+from src.app.infrastructure.brokers.base import Broker
+
+
+def create_broker(name: str) -> Broker:
+    """The adapter for BROKER ("tradestation", "sterling" or "fake")"""
+    if name == "tradestation":
+        from src.app.infrastructure.brokers.tradestation import TradeStationAdapter
+        return TradeStationAdapter()
+    if name == "sterling":
+        from src.app.infrastructure.brokers.sterling import SterlingAdapter
+        return SterlingAdapter()
+    if name == "fake":
+        from src.app.infrastructure.brokers.fake import FakeBroker
+        return FakeBroker(fill_delay=settings.FAKE_BROKER_FILL_DELAY_MS / 1000)
+    raise ValueError(f"Unknown broker {name!r}")
+
+
+# Global Instance, opened/closed by the app lifespan
+broker_client = create_broker(settings.BROKER)
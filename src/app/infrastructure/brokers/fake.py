@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+from typing import Dict, Optional
+from src.app.infrastructure.brokers.base import (
+    BROKER_ACCEPTED, BROKER_CANCELED, BROKER_FILLED, BROKER_PARTIAL, BROKER_REJECTED,
+    ORDER_TYPE_MARKET, Broker, BrokerAck, BrokerOrder, OrderEvent
+)
+
+
+class _Resting:
+    __slots__ = ("order", "filled", "fill_price")
+
+    def __init__(self, order: BrokerOrder):
+        self.order = order
+        self.filled = 0
+        self.fill_price: Optional[float] = None
+
+    @property
+    def remaining(self) -> int:
+        return self.order.quantity - self.filled
+
+
+class FakeBroker(Broker):
+    """
+    In-process broker for paper trading and tests, with the same events a
+    real adapter pushes. Market orders are acked, then filled at their
+    reference price `fill_delay` seconds later (0 = on the next loop turn).
+    Limit orders rest until `on_price` (or a live bar's range, `on_bar`)
+    crosses them, `fill` is called, or they are canceled / replaced. `reject_reason` rejects every submit.
+    """
+    name = "fake"
+
+    def __init__(self, account_id: str = "FAKE", fill_delay: float = 0.0, prefix: str = "fake"):
+        super().__init__(account_id)
+        self.fill_delay = fill_delay
+        self.prefix = prefix
+        self.reject_reason: Optional[str] = None
+        self._ids = itertools.count(1)
+        # broker_order_id -> open order
+        self._open: Dict[str, _Resting] = {}
+
+    async def submit(self, order: BrokerOrder) -> BrokerAck:
+        if self.reject_reason is not None:
+            return BrokerAck(False, error=self.reject_reason)
+        broker_order_id = f"{self.prefix}_{next(self._ids)}"
+        resting = self._open[broker_order_id] = _Resting(order)
+        self._event(broker_order_id, resting, BROKER_ACCEPTED)
+        if order.order_type == ORDER_TYPE_MARKET:
+            loop = asyncio.get_running_loop()
+            if self.fill_delay > 0:
+                loop.call_later(self.fill_delay, self.fill, broker_order_id)
+            else:
+                loop.call_soon(self.fill, broker_order_id)
+        return BrokerAck(True, broker_order_id, raw={"OrderID": broker_order_id})
+
+    async def cancel(self, broker_order_id: str) -> BrokerAck:
+        resting = self._open.pop(broker_order_id, None)
+        if resting is None:
+            return BrokerAck(False, broker_order_id, error="Order is not open")
+        self._event(broker_order_id, resting, BROKER_CANCELED)
+        return BrokerAck(True, broker_order_id)
+
+    async def replace(self, broker_order_id: str, quantity: Optional[int] = None,
+                      limit_price: Optional[float] = None) -> BrokerAck:
+        resting = self._open.get(broker_order_id)
+        if resting is None:
+            return BrokerAck(False, broker_order_id, error="Order is not open")
+        if quantity is not None:
+            if quantity <= resting.filled:
+                return BrokerAck(False, broker_order_id, error="Quantity is not above the filled quantity")
+            resting.order.quantity = quantity
+        if limit_price is not None:
+            resting.order.limit_price = limit_price
+        self._event(broker_order_id, resting, BROKER_ACCEPTED)
+        return BrokerAck(True, broker_order_id)
+
+    # --- fills ---
+    def fill(self, broker_order_id: str, price: Optional[float] = None, quantity: Optional[int] = None):
+        """Fills `quantity` (default: the rest) of an open order at `price` (default: limit, else reference)"""
+        resting = self._open.get(broker_order_id)
+        if resting is None:
+            return
+        order = resting.order
+        if price is None:
+            price = order.limit_price if order.limit_price is not None else order.price
+        quantity = min(quantity or resting.remaining, resting.remaining)
+        filled = resting.filled + quantity
+        previous = (resting.fill_price or 0.0) * resting.filled
+        resting.fill_price = (previous + price * quantity) / filled
+        resting.filled = filled
+        if resting.remaining == 0:
+            del self._open[broker_order_id]
+            self._event(broker_order_id, resting, BROKER_FILLED)
+        else:
+            self._event(broker_order_id, resting, BROKER_PARTIAL)
+
+    def on_price(self, symbol: str, price: float):
+        """Fills every resting limit order on `symbol` that `price` crosses"""
+        crossed = [
+            broker_order_id for broker_order_id, resting in self._open.items()
+            if resting.order.symbol == symbol and resting.order.limit_price is not None
+            and (price <= resting.order.limit_price if resting.order.action.upper() == "BUY"
+                 else price >= resting.order.limit_price)
+        ]
+        for broker_order_id in crossed:
+            self.fill(broker_order_id, self._open[broker_order_id].order.limit_price)
+
+    def on_bar(self, symbol: str, bar: Dict):
+        """Fills resting limits that the bar's low..high range crossed"""
+        price = bar.get("price")
+        low, high = bar.get("low", price), bar.get("high", price)
+        if low is not None:
+            self.on_price(symbol, low)
+        if high is not None:
+            self.on_price(symbol, high)
+
+    def reject(self, broker_order_id: str, reason: str = "Rejected"):
+        """Rejects an open order after its ack, as a venue would"""
+        resting = self._open.pop(broker_order_id, None)
+        if resting is not None:
+            self._event(broker_order_id, resting, BROKER_REJECTED, reason)
+
+    def _event(self, broker_order_id: str, resting: _Resting, status: str, reason: Optional[str] = None):
+        self._publish(OrderEvent(
+            broker_order_id=broker_order_id,
+            status=status,
+            symbol=resting.order.symbol,
+            filled_quantity=resting.filled,
+            fill_price=resting.fill_price,
+            remaining_quantity=0 if status in (BROKER_CANCELED, BROKER_REJECTED) else resting.remaining,
+            client_order_id=resting.order.client_order_id,
+            reason=reason
+        ))
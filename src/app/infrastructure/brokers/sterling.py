@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import uuid
+import httpx
+from contextlib import suppress
+from typing import Dict, Optional
+from src.app.core.config import settings
+from src.app.infrastructure.brokers.base import (
+    BROKER_ACCEPTED, BROKER_CANCELED, BROKER_EXPIRED, BROKER_FILLED, BROKER_PARTIAL, BROKER_REJECTED,
+    ORDER_TYPE_LIMIT, Broker, BrokerAck, BrokerOrder, OrderEvent, error_ack
+)
+
+logger = logging.getLogger("sterling_adapter")
+
+# FIX OrdStatus (tag 39) on execution reports -> normalized states. Pending states
+# (A pending new, 6 pending cancel, E pending replace) are not pushed on.
+STATUS_MAP = {
+    "0": BROKER_ACCEPTED,     # new
+    "5": BROKER_ACCEPTED,     # replaced
+    "1": BROKER_PARTIAL,
+    "2": BROKER_FILLED,
+    "4": BROKER_CANCELED,
+    "C": BROKER_EXPIRED,
+    "8": BROKER_REJECTED,
+}
+
+# FIX Side / OrdType / TimeInForce
+SIDE_BUY = "1"
+SIDE_SELL = "2"
+SIDE_SELL_SHORT = "5"
+ORD_TYPES = {"Market": "1", "Limit": "2"}
+TIME_IN_FORCE = {"DAY": "0", "GTC": "1", "IOC": "3", "FOK": "4"}
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+# ClOrdIDs are cut to the gateway's 20 characters
+CL_ORD_ID_LENGTH = 20
+
+
+def _cl_ord_id() -> str:
+    return uuid.uuid4().hex[:CL_ORD_ID_LENGTH]
+
+
+class SterlingAdapter(Broker):
+    """
+    Sterling through its order gateway: FIX-style JSON orders over REST and
+    execution reports (MsgType 8) on one NDJSON stream, kept open and
+    reconnected with backoff.
+
+    Cancels and replaces get a new ClOrdID each (FIX chaining). The first
+    ClOrdID is the order's `broker_order_id` for its whole life; reports for
+    later ClOrdIDs in the chain are mapped back to it. It is derived from the
+    pipeline's client order id (`assigned_id`), so reports for an order whose
+    submit timed out still find it, even after a restart.
+    """
+    name = "sterling"
+
+    def __init__(self):
+        super().__init__(settings.STERLING_ACCOUNT)
+        self.base_url = settings.STERLING_GATEWAY_URL
+        self._client: Optional[httpx.AsyncClient] = None
+        self._streamer: Optional[asyncio.Task] = None
+        # ClOrdID -> the order's first ClOrdID; and the live ClOrdID of each order
+        self._root: Dict[str, str] = {}
+        self._current: Dict[str, str] = {}
+        self.stream_connected = False
+        self.stream_reconnects = 0
+
+    # --- lifecycle ---
+    async def start(self):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"X-API-Key": settings.STERLING_API_KEY},
+            limits=httpx.Limits(
+                max_connections=settings.BROKER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.BROKER_MAX_CONNECTIONS,
+                keepalive_expiry=settings.BROKER_KEEPALIVE_SECONDS * 2
+            ),
+            timeout=httpx.Timeout(settings.BROKER_TIMEOUT_SECONDS)
+        )
+        logger.info(f"🔐 Sterling gateway at {self.base_url} for account {self.account_id}")
+        self._streamer = asyncio.create_task(self._stream_executions(), name="sterling-exec-stream")
+
+    async def close(self):
+        if self._streamer is not None and not self._streamer.done():
+            self._streamer.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await self._streamer
+        self._streamer = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- execution report stream ---
+    async def _stream_executions(self):
+        delay = settings.BROKER_STREAM_RETRY_SECONDS
+        timeout = httpx.Timeout(settings.BROKER_TIMEOUT_SECONDS, read=settings.BROKER_STREAM_IDLE_SECONDS)
+        params = {"account": self.account_id}
+        while True:
+            try:
+                async with self._client.stream("GET", "/executions/stream", params=params, timeout=timeout) as response:
+                    response.raise_for_status()
+                    self.stream_connected = True
+                    logger.info(f"📡 Sterling execution stream open for {self.account_id}")
+                    delay = settings.BROKER_STREAM_RETRY_SECONDS
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            self._on_report(json.loads(line))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Sterling execution stream dropped: {e}")
+            self.stream_connected = False
+            self.stream_reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _on_report(self, message: Dict):
+        # Heartbeats (MsgType 0) and anything else that isn't an execution report
+        if message.get("MsgType") != "8":
+            return
+        status = STATUS_MAP.get(str(message.get("OrdStatus")))
+        cl_ord_id = message.get("ClOrdID")
+        if status is None or cl_ord_id is None:
+            return
+        root = self._root.get(cl_ord_id) or self._root.get(message.get("OrigClOrdID"), cl_ord_id)
+        if status in (BROKER_FILLED, BROKER_CANCELED, BROKER_REJECTED, BROKER_EXPIRED):
+            self._forget(root)
+        filled = _int(message.get("CumQty"))
+        self._publish(OrderEvent(
+            broker_order_id=root,
+            status=status,
+            symbol=message.get("Symbol", ""),
+            filled_quantity=filled,
+            fill_price=_float(message.get("AvgPx")) if filled else None,
+            remaining_quantity=_int(message.get("LeavesQty")),
+            reason=message.get("Text") if status == BROKER_REJECTED else None,
+            raw=message
+        ))
+
+    def _forget(self, root: str):
+        self._current.pop(root, None)
+        for cl_ord_id in [key for key, value in self._root.items() if value == root]:
+            del self._root[cl_ord_id]
+
+    # --- orders ---
+    async def _post(self, path: str, payload: Dict) -> httpx.Response:
+        if self._client is None:
+            await self.start()
+        return await self._client.post(path, json=payload)
+
+    def assigned_id(self, client_order_id: str) -> Optional[str]:
+        return client_order_id[:CL_ORD_ID_LENGTH]
+
+    async def submit(self, order: BrokerOrder) -> BrokerAck:
+        cl_ord_id = self.assigned_id(order.client_order_id) if order.client_order_id else _cl_ord_id()
+        payload = {
+            "ClOrdID": cl_ord_id,
+            "Account": self.account_id,
+            "Symbol": order.symbol,
+            "Side": SIDE_BUY if order.action.upper() == "BUY" else SIDE_SELL_SHORT if order.short else SIDE_SELL,
+            "OrderQty": order.quantity,
+            "OrdType": ORD_TYPES.get(order.order_type, ORD_TYPES["Market"]),
+            "TimeInForce": TIME_IN_FORCE.get(order.time_in_force, "0"),
+        }
+        if order.order_type == ORDER_TYPE_LIMIT:
+            payload["Price"] = order.limit_price
+        if settings.STERLING_ROUTE:
+            payload["ExDestination"] = settings.STERLING_ROUTE
+        # Registered before sending: the stream can report on it before the POST returns
+        self._root[cl_ord_id] = cl_ord_id
+        self._current[cl_ord_id] = cl_ord_id
+        ack = await self._request("/orders", payload, cl_ord_id)
+        if ack.accepted is False:
+            self._forget(cl_ord_id)
+        elif ack.accepted:
+            logger.info(f"✅ Sterling order placed: {cl_ord_id} {order.action} {order.quantity} {order.symbol}")
+        return ack
+
+    async def cancel(self, broker_order_id: str) -> BrokerAck:
+        return await self._chain("cancel", broker_order_id, {})
+
+    async def replace(self, broker_order_id: str, quantity: Optional[int] = None,
+                      limit_price: Optional[float] = None) -> BrokerAck:
+        payload = {}
+        if quantity is not None:
+            payload["OrderQty"] = quantity
+        if limit_price is not None:
+            payload["Price"] = limit_price
+        return await self._chain("replace", broker_order_id, payload)
+
+    async def _chain(self, action: str, broker_order_id: str, payload: Dict) -> BrokerAck:
+        current = self._current.get(broker_order_id)
+        if current is None:
+            return BrokerAck(False, broker_order_id, error="Order is not open")
+        cl_ord_id = _cl_ord_id()
+        self._root[cl_ord_id] = broker_order_id
+        ack = await self._request(
+            f"/orders/{current}/{action}",
+            {"ClOrdID": cl_ord_id, "OrigClOrdID": current, "Account": self.account_id, **payload},
+            broker_order_id
+        )
+        if ack.accepted:
+            self._current[broker_order_id] = cl_ord_id
+        elif ack.accepted is False:
+            # (an unknown outcome keeps the mapping: reports for it may still come)
+            self._root.pop(cl_ord_id, None)
+        return ack
+
+    async def _request(self, path: str, payload: Dict, broker_order_id: str) -> BrokerAck:
+        try:
+            response = await self._post(path, payload)
+        except Exception as e:
+            logger.error(f"CRITICAL HTTP ERROR: {str(e)}")
+            return error_ack(e, broker_order_id)
+        if response.status_code not in (200, 201, 202):
+            logger.error(f"❌ Sterling {path} FAILED: {response.status_code} - {response.text}")
+            return BrokerAck(False, broker_order_id, error=response.text)
+        return BrokerAck(True, broker_order_id, raw=response.json())
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "stream_connected": self.stream_connected,
+                "stream_reconnects": self.stream_reconnects, "open_orders": len(self._current)}
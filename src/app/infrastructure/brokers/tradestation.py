@@ -1,82 +1,390 @@
+import asyncio
+import importlib.util
+import json
 import logging
+import time
 import httpx
+from contextlib import suppress
 from datetime import datetime
+from typing import Dict, Optional
 from src.app.core.config import settings
+from src.app.infrastructure.brokers.base import (
+    BROKER_ACCEPTED, BROKER_CANCELED, BROKER_EXPIRED, BROKER_FILLED, BROKER_PARTIAL, BROKER_REJECTED,
+    ORDER_TYPE_LIMIT, Broker, BrokerAck, BrokerOrder, OrderEvent, error_ack
+)
+from src.app.infrastructure.brokers.fake import FakeBroker
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("broker_adapter")
 
-class TradeStationAdapter:
+# HTTP/2 multiplexes concurrent orders over one connection, but needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# TradeStation order status codes -> normalized states. Codes not listed (DON, UCN, UCH, LAT, ...)
+# are intermediate and not pushed on.
+STATUS_MAP = {
+    "ACK": BROKER_ACCEPTED,
+    "OPN": BROKER_ACCEPTED,
+    "FLP": BROKER_PARTIAL,
+    "FPR": BROKER_PARTIAL,
+    "FLL": BROKER_FILLED,
+    "CAN": BROKER_CANCELED,
+    "OUT": BROKER_CANCELED,
+    "EXP": BROKER_EXPIRED,
+    "REJ": BROKER_REJECTED,
+    "BRO": BROKER_REJECTED,
+}
+
+# Failed token refreshes are retried after this many seconds, doubling up to the max
+TOKEN_RETRY_SECONDS = 1.0
+TOKEN_RETRY_MAX_SECONDS = 300.0
+# OAuth errors that no retry will fix (revoked / wrong refresh token or client credentials)
+FATAL_AUTH_ERRORS = {"invalid_grant", "invalid_client", "unauthorized_client"}
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _fatal_auth_error(response: httpx.Response) -> Optional[str]:
+    """The reason a token request can never succeed as configured, or None if it may be retried"""
+    if response.status_code in (401, 403):
+        return f"{response.status_code} {response.text}"
+    if response.status_code == 400:
+        with suppress(ValueError, AttributeError):
+            error = response.json().get("error")
+            if error in FATAL_AUTH_ERRORS:
+                return error
+    return None
+
+
+def order_event(message: Dict) -> Optional[OrderEvent]:
+    """An order message from the TradeStation order stream as an OrderEvent (None for ones we skip)"""
+    status = STATUS_MAP.get(message.get("Status"))
+    order_id = message.get("OrderID")
+    if status is None or order_id is None:
+        return None
+    legs = message.get("Legs") or [{}]
+    filled = sum(_int(leg.get("ExecQuantity")) for leg in legs)
+    remaining = sum(_int(leg.get("QuantityRemaining")) for leg in legs)
+    return OrderEvent(
+        broker_order_id=str(order_id),
+        status=status,
+        symbol=legs[0].get("Symbol", ""),
+        filled_quantity=filled,
+        fill_price=_float(message.get("FilledPrice")) if filled else None,
+        remaining_quantity=remaining,
+        reason=message.get("RejectReason") or (message.get("StatusDescription") if status == BROKER_REJECTED else None),
+        raw=message
+    )
+
+
+class TradeStationAdapter(Broker):
+    """
+    TradeStation v3 over one pooled keep-alive client. Orders are POSTed;
+    their status comes back on the account's order stream
+    (/brokerage/stream/accounts/{id}/orders), held open for the app's
+    lifetime and reconnected with backoff. Without credentials, orders go
+    to an in-process FakeBroker instead (paper trading).
+    """
+    name = "tradestation"
+
     def __init__(self):
+        super().__init__(settings.TRADESTATION_ACCOUNT_ID)
         self.is_simulation = settings.USE_SIMULATION
-        
+
         if self.is_simulation:
             self.base_url = "https://sim-api.tradestation.com/v3"
         else:
             self.base_url = "https://api.tradestation.com/v3"
-            
-        self.account_id = settings.TRADESTATION_ACCOUNT_ID
+
         self.access_token = None
+        self.token_expires_at = 0.0
+        # Set once the token endpoint rejects our credentials; refreshes stop until restart
+        self.auth_error: Optional[str] = None
+
+        # Long-lived pooled client, opened by the app lifespan (`start`)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._maintainer: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._streamer: Optional[asyncio.Task] = None
+        self._last_request = 0.0
+        self.stream_connected = False
+        self.stream_reconnects = 0
+
+        # Paper trading: same events, filled in-process
+        self._paper = FakeBroker(self.account_id, prefix="paper")
+        self._paper.listeners.append(self._publish)
+
+    @property
+    def is_paper(self) -> bool:
+        return settings.TRADESTATION_REFRESH_TOKEN == "unset"
+
+    # --- lifecycle ---
+    async def start(self):
+        """
+        Opens the pooled client, fetches the first access token, pre-warms
+        connections so the first order doesn't pay DNS + TCP + TLS, and opens
+        the order status stream.
+        """
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.BROKER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.BROKER_MAX_CONNECTIONS,
+                keepalive_expiry=settings.BROKER_KEEPALIVE_SECONDS * 2
+            ),
+            timeout=httpx.Timeout(settings.BROKER_TIMEOUT_SECONDS)
+        )
+        if self.is_paper:
+            return
+
+        logger.info(f"🔐 Broker client up (HTTP/2: {HTTP2_AVAILABLE}). Fetching access token...")
+        try:
+            await self._refresh_token()
+        except Exception as e:
+            logger.error(f"❌ Initial token refresh failed: {e}")
+        await self._prewarm()
+        self._maintainer = asyncio.create_task(self._maintain(), name="broker-maintain")
+        self._streamer = asyncio.create_task(self._stream_orders(), name="broker-order-stream")
+
+    async def close(self):
+        for task in (self._streamer, self._maintainer, self._refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+        self._streamer = self._maintainer = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _prewarm(self):
+        """Opens BROKER_PREWARM_CONNECTIONS pooled connections with cheap authenticated GETs"""
+        async def ping():
+            with suppress(Exception):
+                await self._client.get("/brokerage/accounts", headers=await self._get_headers())
+
+        await asyncio.gather(*(ping() for _ in range(settings.BROKER_PREWARM_CONNECTIONS)))
+        self._last_request = time.monotonic()
+
+    async def _maintain(self):
+        """
+        Refreshes the token before it expires and keeps idle connections alive.
+        Failed refreshes back off; rejected credentials stop them for good.
+        """
+        delay = TOKEN_RETRY_SECONDS
+        retry_at = 0.0
+        while True:
+            await asyncio.sleep(1.0)
+            now = time.time()
+            if (self.auth_error is None and now >= retry_at
+                    and now >= self.token_expires_at - settings.TOKEN_REFRESH_MARGIN_SECONDS):
+                try:
+                    await self._refresh_token()
+                    delay = TOKEN_RETRY_SECONDS
+                except Exception as e:
+                    if self.auth_error is None:
+                        # The current token is still valid until it expires
+                        logger.error(f"❌ Token refresh failed, retrying in {delay:g}s: {e}")
+                        retry_at = now + delay
+                        delay = min(delay * 2, TOKEN_RETRY_MAX_SECONDS)
+            if time.monotonic() - self._last_request >= settings.BROKER_KEEPALIVE_SECONDS:
+                await self._prewarm()
+
+    # --- auth ---
+    async def _refresh_token(self):
+        """Single-flight OAuth refresh: concurrent callers share one request"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._request_token(), name="broker-token")
+        await asyncio.shield(self._refreshing)
+
+    async def _request_token(self):
+        response = await self._client.post(
+            settings.TRADESTATION_TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "client_id": settings.TRADESTATION_CLIENT_ID,
+                "client_secret": settings.TRADESTATION_CLIENT_SECRET,
+                "refresh_token": settings.TRADESTATION_REFRESH_TOKEN,
+            }
+        )
+        fatal = _fatal_auth_error(response)
+        if fatal is not None:
+            self.auth_error = fatal
+            logger.error(f"❌ Token refresh rejected ({fatal}); not retrying until TRADESTATION_* credentials are fixed")
+        response.raise_for_status()
+        data = response.json()
+        self.access_token = data["access_token"]
+        self.token_expires_at = time.time() + float(data.get("expires_in", 1200))
+        logger.info(f"🔑 Access token refreshed, valid for {int(self.token_expires_at - time.time())}s")
 
     async def _get_headers(self):
         """
         Helper to construct auth headers.
-        In a full implementation, this would refresh the token if expired.
+        Tokens are refreshed in the background; only a missing/expired one is awaited here.
         """
-        # For now, we assume the user put a valid Access Token in .env or we skip if strictly Sim
+        if self.auth_error is not None:
+            raise RuntimeError(f"TradeStation credentials rejected: {self.auth_error}")
+        if self.access_token is None or time.time() >= self.token_expires_at:
+            await self._refresh_token()
         return {
-            "Authorization": f"Bearer {settings.TRADESTATION_REFRESH_TOKEN}",
+            "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
         }
 
-    async def execute_order(self, symbol: str, action: str, quantity: int = 10, price: float = 0.0):
+    # --- order status stream ---
+    async def _stream_orders(self):
+        """Keeps the account's order stream open, pushing each status change as an OrderEvent"""
+        delay = settings.BROKER_STREAM_RETRY_SECONDS
+        path = f"/brokerage/stream/accounts/{self.account_id}/orders"
+        # No overall read timeout on the stream, only the idle limit between heartbeats
+        timeout = httpx.Timeout(settings.BROKER_TIMEOUT_SECONDS, read=settings.BROKER_STREAM_IDLE_SECONDS)
+        while True:
+            try:
+                async with self._client.stream("GET", path, headers=await self._get_headers(), timeout=timeout) as response:
+                    response.raise_for_status()
+                    self.stream_connected = True
+                    logger.info(f"📡 Order stream open for {self.account_id}")
+                    delay = settings.BROKER_STREAM_RETRY_SECONDS
+                    async for line in response.aiter_lines():
+                        if line.strip() and not self._on_stream_message(json.loads(line)):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Order stream dropped: {e}")
+            self.stream_connected = False
+            if self.auth_error is not None:
+                return
+            self.stream_reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _on_stream_message(self, message: Dict) -> bool:
+        """Handles one stream message; False means the server wants us to reconnect"""
+        if "Heartbeat" in message:
+            return True
+        if "StreamStatus" in message:
+            # EndSnapshot: open orders were replayed, live updates follow. GoAway: reconnect.
+            return message["StreamStatus"] != "GoAway"
+        if "Error" in message:
+            logger.error(f"❌ Order stream error: {message.get('Error')} {message.get('Message', '')}")
+            return False
+        event = order_event(message)
+        if event is not None:
+            self._publish(event)
+        return True
+
+    # --- orders ---
+    async def _send(self, method: str, path: str, payload: Optional[Dict] = None) -> httpx.Response:
+        try:
+            if self._client is None:
+                await self.start()
+            headers = await self._get_headers()
+        except Exception as e:
+            # No client or no token: the request never went out
+            raise RuntimeError(f"Not sent: {e}") from e
+        response = await self._client.request(method, path, json=payload, headers=headers)
+        self._last_request = time.monotonic()
+        return response
+
+    async def submit(self, order: BrokerOrder) -> BrokerAck:
         """
-        Executes an order on TradeStation (Live or Sim API).
+        Places an order on TradeStation (Live or Sim API). The ack means it was
+        accepted for routing; fills arrive on the order stream.
         """
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # 1. Map generic action to TradeStation specific values
+        # Map generic action to TradeStation specific values
         # TS expects: "Buy", "Sell", "SellShort", "BuyToCover"
-        ts_action = "Buy" if action.upper() == "BUY" else "SellShort" 
+        if order.action.upper() == "BUY":
+            ts_action = "BuyToCover" if order.cover else "Buy"
+        else:
+            ts_action = "SellShort" if order.short else "Sell"
 
-        # 2. Construct the Payload
         order_payload = {
             "AccountID": self.account_id,
-            "Symbol": symbol,
-            "Quantity": str(quantity),
-            "OrderType": "Market",
+            "Symbol": order.symbol,
+            "Quantity": str(order.quantity),
+            "OrderType": order.order_type,
             "TradeAction": ts_action,
-            "TimeInForce": {"Duration": "DAY"},
+            "TimeInForce": {"Duration": order.time_in_force},
             "Route": "Intelligent"
         }
+        if order.order_type == ORDER_TYPE_LIMIT:
+            order_payload["LimitPrice"] = str(order.limit_price)
 
-        # 3. EXECUTION MODE
         # If we have no keys, default to "Paper Print" safely
-        if settings.TRADESTATION_REFRESH_TOKEN == "unset":
-             logger.info(f"🔵 [PAPER TRADE] {timestamp} | {ts_action} {quantity} {symbol} @ ${price:.2f}")
-             logger.info(f"    Payload: {order_payload}")
-             return {"status": "filled", "id": "paper_123"}
+        if self.is_paper:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            logger.info(f"🔵 [PAPER TRADE] {timestamp} | {ts_action} {order.quantity} {order.symbol} @ ${order.price:.2f}")
+            logger.info(f"    Payload: {order_payload}")
+            return await self._paper.submit(order)
 
-        # 4. REAL HTTP REQUEST (Async)
         try:
-            url = f"{self.base_url}/orderexecution/orders"
-            headers = await self._get_headers()
-            
-            async with httpx.AsyncClient() as client:
-                logger.info(f"🚀 SENDING ORDER to {url}...")
-                response = await client.post(url, json=order_payload, headers=headers)
-                
-                if response.status_code in [200, 201]:
-                    data = response.json()
-                    logger.info(f"✅ ORDER PLACED: ID {data.get('Orders', [{}])[0].get('OrderID')}")
-                    return {"status": "filled", "response": data}
-                else:
-                    logger.error(f"❌ ORDER FAILED: {response.status_code} - {response.text}")
-                    return {"status": "failed", "error": response.text}
-                    
+            logger.info(f"🚀 SENDING ORDER to {self.base_url}/orderexecution/orders...")
+            response = await self._send("POST", "/orderexecution/orders", order_payload)
+        except Exception as e:
+            # A timeout after sending may still have placed it: the order stream will tell
+            logger.error(f"CRITICAL HTTP ERROR: {str(e)}")
+            return error_ack(e)
+
+        if response.status_code not in (200, 201):
+            logger.error(f"❌ ORDER FAILED: {response.status_code} - {response.text}")
+            return BrokerAck(False, error=response.text)
+        data = response.json()
+        placed = (data.get("Orders") or [{}])[0]
+        if placed.get("Error") or not placed.get("OrderID"):
+            errors = data.get("Errors") or [placed]
+            message = errors[0].get("Message") or errors[0].get("Error") or "Order not placed"
+            logger.error(f"❌ ORDER FAILED: {message}")
+            return BrokerAck(False, error=message, raw=data)
+        logger.info(f"✅ ORDER PLACED: ID {placed['OrderID']}")
+        return BrokerAck(True, str(placed["OrderID"]), raw=data)
+
+    async def cancel(self, broker_order_id: str) -> BrokerAck:
+        if self.is_paper:
+            return await self._paper.cancel(broker_order_id)
+        return await self._modify("DELETE", broker_order_id)
+
+    async def replace(self, broker_order_id: str, quantity: Optional[int] = None,
+                      limit_price: Optional[float] = None) -> BrokerAck:
+        if self.is_paper:
+            return await self._paper.replace(broker_order_id, quantity, limit_price)
+        payload = {}
+        if quantity is not None:
+            payload["Quantity"] = str(quantity)
+        if limit_price is not None:
+            payload["LimitPrice"] = str(limit_price)
+        return await self._modify("PUT", broker_order_id, payload)
+
+    async def _modify(self, method: str, broker_order_id: str, payload: Optional[Dict] = None) -> BrokerAck:
+        try:
+            response = await self._send(method, f"/orderexecution/orders/{broker_order_id}", payload)
         except Exception as e:
             logger.error(f"CRITICAL HTTP ERROR: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            return error_ack(e, broker_order_id)
+        if response.status_code not in (200, 201):
+            logger.error(f"❌ {method} {broker_order_id} FAILED: {response.status_code} - {response.text}")
+            return BrokerAck(False, broker_order_id, error=response.text)
+        return BrokerAck(True, broker_order_id, raw=response.json())
+
+    def on_bar(self, symbol: str, bar: Dict):
+        if self.is_paper:
+            self._paper.on_bar(symbol, bar)
 
-# Global Instance
-broker_client = TradeStationAdapter()
\ No newline at end of file
+    def stats(self) -> Dict:
+        return {**super().stats(), "paper": self.is_paper, "stream_connected": self.stream_connected,
+                "stream_reconnects": self.stream_reconnects, "auth_error": self.auth_error}
@@ -0,0 +1,407 @@
+"""
+Bar Bus - one ingest process, any number of web workers.
+
+The ingest process (python -m src.app.ingest) owns the upstream sessions,
+the StreamHub and every UTBot strategy, and listens on a Unix socket
+(STREAM_BUS). Each uvicorn worker connects as a client, forwards the views
+its WebSocket clients subscribe to, and fans the bars it gets back out
+through its own ConnectionManager. Upstream subscriptions stay at exactly
+one per symbol however many workers serve clients.
+
+The same socket carries calls from workers to services that must exist once
+(the order pipeline and risk engine, the watchlist scanner): {"id", "method",
+"params"} in, and {"id", "result"} or {"id", "error": {"status", "detail"}} back.
+`fanout` channels (the scanner's flips) go to every worker unasked.
+
+Frames are a fixed header followed by the channel name and a payload:
+    op (u8) | received perf_counter_ns (u64, 0 = untimed) | channel len (u16) | payload len (u32)
+Bars are serialized to JSON once in the ingest process and that text is sent
+as-is by every worker. perf_counter_ns is CLOCK_MONOTONIC, shared by all
+processes on the host, so latency metrics span the hop.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from src.app.core.config import settings
+from src.app.infrastructure.market_data.stream_hub import (
+    DEFAULT_ATR_MULTIPLIER, DEFAULT_ATR_PERIOD, StreamHub, channel_key, stream_hub
+)
+from src.app.infrastructure.websockets.manager import ws_manager
+
+logger = logging.getLogger("bar_bus")
+
+OP_BAR = 1
+OP_SUBSCRIBE = 2
+OP_UNSUBSCRIBE = 3
+OP_SNAPSHOT = 4
+OP_CALL = 5
+
+HEADER = struct.Struct("!BQHI")
+
+# (symbol, interval, atr_period, atr_multiplier)
+View = Tuple[str, Optional[str], int, float]
+
+# Serves one call method: keyword params in, JSON-ready result out
+CallHandler = Callable[..., Awaitable]
+
+
+class BusCallError(Exception):
+    """A failed bus call, with the HTTP status it maps to (503 = ingest process unreachable)"""
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def pack(op: int, channel: str = "", payload: bytes = b"", received: Optional[int] = None) -> bytes:
+    name = channel.encode()
+    return HEADER.pack(op, received or 0, len(name), len(payload)) + name + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, str, bytes, Optional[int]]:
+    op, received, name_len, payload_len = HEADER.unpack(await reader.readexactly(HEADER.size))
+    body = await reader.readexactly(name_len + payload_len)
+    return op, body[:name_len].decode(), body[name_len:], received or None
+
+
+def _view(symbol: str, interval: Optional[str], atr_period: int, atr_multiplier: float) -> View:
+    return (symbol, interval, int(atr_period), float(atr_multiplier))
+
+
+class _Peer:
+    """One connected web worker, as seen by the ingest process"""
+    __slots__ = ("writer", "views", "requests", "sent", "dropped")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.views: Set[View] = set()
+        # Snapshots and calls in flight
+        self.requests: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, frame: bytes):
+        # Never wait on a worker: past the buffer cap its bars are dropped, newest-wins on the other side
+        if self.writer.transport.get_write_buffer_size() > settings.STREAM_BUS_MAX_BUFFER_BYTES:
+            self.dropped += 1
+            return
+        self.writer.write(frame)
+        self.sent += 1
+
+
+class BarBusServer:
+    """
+    Ingest side: serves a private StreamHub to web workers over a Unix socket.
+    Stands in for the ConnectionManager as the hub's `manager`, so `broadcast`
+    is the hub's fan-out point: one serialization, one write per interested worker.
+    `handlers` serve the workers' calls by method name; `fanout` channels are
+    broadcast to every worker, subscribed or not.
+    """
+    def __init__(self, path: str, hub: Optional[StreamHub] = None,
+                 handlers: Optional[Dict[str, CallHandler]] = None, fanout: Tuple[str, ...] = ()):
+        self.path = path
+        self.hub = hub or StreamHub(manager=self)
+        self.handlers = handlers or {}
+        self.fanout = set(fanout)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._inode: Optional[int] = None
+        self._peers: Set[_Peer] = set()
+        # {"TSLA@5m": {peer, ...}}
+        self._listeners: Dict[str, Set[_Peer]] = {}
+
+    async def start(self):
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        self._inode = os.stat(self.path).st_ino
+        logger.info(f"🚌 Bar bus listening on {self.path}")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        # Leave the path alone if a newer ingest process has taken it over
+        with suppress(FileNotFoundError):
+            if os.stat(self.path).st_ino == self._inode:
+                os.unlink(self.path)
+
+    async def broadcast(self, channel: str, data: dict, received: Optional[int] = None, ready: Optional[int] = None):
+        peers = self._peers if channel in self.fanout else self._listeners.get(channel)
+        if not peers:
+            return
+        frame = pack(OP_BAR, channel, json.dumps(data).encode(), received)
+        for peer in peers:
+            peer.send(frame)
+
+    def stats(self) -> Dict:
+        return {
+            **self.hub.stats(),
+            "workers": len(self._peers),
+            "sent": sum(peer.sent for peer in self._peers),
+            "dropped": sum(peer.dropped for peer in self._peers),
+        }
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = _Peer(writer)
+        self._peers.add(peer)
+        logger.info(f"🔌 Web worker connected ({len(self._peers)} total)")
+        try:
+            while True:
+                op, _, payload, _ = await read_frame(reader)
+                message = json.loads(payload)
+                if op == OP_SUBSCRIBE:
+                    await self._subscribe(peer, _view(*message))
+                elif op == OP_UNSUBSCRIBE:
+                    await self._unsubscribe(peer, _view(*message))
+                elif op in (OP_SNAPSHOT, OP_CALL):
+                    # Snapshots wait for warmup and calls for the broker; don't hold up the worker's other requests
+                    if op == OP_SNAPSHOT:
+                        task = asyncio.create_task(self._snapshot(peer, message["id"], _view(*message["view"])))
+                    else:
+                        task = asyncio.create_task(self._call(peer, message))
+                    peer.requests.add(task)
+                    task.add_done_callback(peer.requests.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._peers.discard(peer)
+            for task in list(peer.requests):
+                task.cancel()
+            for view in list(peer.views):
+                await self._unsubscribe(peer, view)
+            writer.close()
+            logger.info(f"🔌 Web worker disconnected ({len(self._peers)} left)")
+
+    async def _subscribe(self, peer: _Peer, view: View):
+        if view in peer.views:
+            return
+        peer.views.add(view)
+        self._listeners.setdefault(channel_key(*view), set()).add(peer)
+        await self.hub.subscribe(*view)
+
+    async def _unsubscribe(self, peer: _Peer, view: View):
+        if view not in peer.views:
+            return
+        peer.views.discard(view)
+        key = channel_key(*view)
+        listeners = self._listeners.get(key)
+        if listeners is not None:
+            listeners.discard(peer)
+            if not listeners:
+                del self._listeners[key]
+        await self.hub.unsubscribe(*view)
+
+    async def _snapshot(self, peer: _Peer, request_id: int, view: View):
+        snapshot = await self.hub.snapshot(*view)
+        peer.writer.write(pack(OP_SNAPSHOT, payload=json.dumps({"id": request_id, "data": snapshot}).encode()))
+
+    async def _call(self, peer: _Peer, message: Dict):
+        method = message.get("method")
+        handler = self.handlers.get(method)
+        try:
+            if handler is None:
+                raise BusCallError(501, f"Ingest process does not serve {method!r}")
+            reply = {"id": message["id"], "result": await handler(**message.get("params", {}))}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status = getattr(e, "status", 500)
+            if status >= 500:
+                logger.error(f"❌ Bus call {method} failed: {e}")
+            reply = {"id": message["id"], "error": {"status": status, "detail": getattr(e, "detail", str(e))}}
+        peer.writer.write(pack(OP_CALL, payload=json.dumps(reply).encode()))
+
+
+class BarBusClient:
+    """
+    Web worker side: a drop-in for StreamHub (subscribe / unsubscribe /
+    snapshot / stats / shutdown) backed by the ingest process, plus `call`
+    for the services that run there.
+
+    Subscriptions are reference counted locally, so the ingest process sees
+    one subscription per view per worker. They are replayed after a
+    reconnect; bars missed in between are not.
+    """
+    def __init__(self, path: str, manager=ws_manager):
+        self.path = path
+        self.manager = manager
+        self._views: Dict[View, int] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._snapshots: Dict[int, asyncio.Future] = {}
+        self._calls: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self.frames = 0
+        self.reconnects = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="bar-bus")
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def subscriber_count(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        return self._views.get(_view(symbol, interval, atr_period, atr_multiplier), 0)
+
+    @property
+    def active_symbols(self) -> list:
+        return list({view[0] for view in self._views})
+
+    def stats(self) -> Dict:
+        return {
+            "streams": len(self.active_symbols),
+            "channels": len(self._views),
+            "subscribers": sum(self._views.values()),
+            "warming": len(self._snapshots),
+            "bus": {"path": self.path, "connected": self.connected, "frames": self.frames, "reconnects": self.reconnects},
+        }
+
+    async def subscribe(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        view = _view(symbol, interval, atr_period, atr_multiplier)
+        count = self._views[view] = self._views.get(view, 0) + 1
+        if count == 1:
+            self._send(OP_SUBSCRIBE, list(view))
+        return count
+
+    async def unsubscribe(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        view = _view(symbol, interval, atr_period, atr_multiplier)
+        count = self._views.get(view, 0) - 1
+        if count > 0:
+            self._views[view] = count
+            return count
+        if self._views.pop(view, None) is not None:
+            self._send(OP_UNSUBSCRIBE, list(view))
+        return 0
+
+    async def snapshot(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> Optional[Dict]:
+        if not self.connected:
+            return None
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._snapshots[request_id] = asyncio.get_running_loop().create_future()
+        self._send(OP_SNAPSHOT, {"id": request_id, "view": list(_view(symbol, interval, atr_period, atr_multiplier))})
+        try:
+            return await future
+        finally:
+            self._snapshots.pop(request_id, None)
+
+    async def call(self, method: str, params: Optional[Dict] = None, timeout: Optional[float] = None):
+        """
+        Calls `method` in the ingest process and returns its result. Raises BusCallError
+        with the handler's status, 503 if the bus is down (or drops mid-call), 504 on timeout.
+        """
+        if not self.connected:
+            raise BusCallError(503, f"Ingest process is not connected ({self.path})")
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._calls[request_id] = asyncio.get_running_loop().create_future()
+        self._send(OP_CALL, {"id": request_id, "method": method, "params": params or {}})
+        timeout = timeout or settings.STREAM_BUS_CALL_TIMEOUT_SECONDS
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise BusCallError(504, f"No answer to {method} from the ingest process within {timeout:g}s")
+        finally:
+            self._calls.pop(request_id, None)
+        if "error" in reply:
+            raise BusCallError(reply["error"]["status"], reply["error"]["detail"])
+        return reply["result"]
+
+    def _send(self, op: int, message):
+        if self._writer is not None:
+            self._writer.write(pack(op, payload=json.dumps(message).encode()))
+
+    async def _run(self):
+        delay = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning(f"⚠️ Bar bus at {self.path} unavailable ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+
+            delay = 0.5
+            self._writer = writer
+            logger.info(f"🚌 Connected to bar bus {self.path} ({len(self._views)} views)")
+            for view in self._views:
+                self._send(OP_SUBSCRIBE, list(view))
+            try:
+                await self._read(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("⚠️ Bar bus connection lost. Reconnecting...")
+            finally:
+                self._writer = None
+                writer.close()
+                for future in self._snapshots.values():
+                    if not future.done():
+                        future.set_result(None)
+                for future in self._calls.values():
+                    if not future.done():
+                        future.set_exception(BusCallError(503, "Connection to the ingest process was lost mid-call"))
+            self.reconnects += 1
+
+    async def _read(self, reader: asyncio.StreamReader):
+        broadcast = self.manager.broadcast
+        while True:
+            op, channel, payload, received = await read_frame(reader)
+            if op == OP_BAR:
+                self.frames += 1
+                text = payload.decode()
+                data = json.loads(text)
+                await broadcast(channel, data, received, text=text)
+            elif op in (OP_SNAPSHOT, OP_CALL):
+                message = json.loads(payload)
+                if op == OP_SNAPSHOT:
+                    future, result = self._snapshots.get(message["id"]), message["data"]
+                else:
+                    future, result = self._calls.get(message["id"]), message
+                if future is not None and not future.done():
+                    future.set_result(result)
+
+
+# Global Instance: what the WebSocket endpoint subscribes through. The in-process hub, or with
+# STREAM_BUS set, a client of the ingest process. Owned by the app lifespan.
+streams = BarBusClient(settings.STREAM_BUS) if settings.STREAM_BUS else stream_hub
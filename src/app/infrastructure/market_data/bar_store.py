@@ -0,0 +1,257 @@
+import calendar
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger("bar_store")
+
+SECONDS_PER_DAY = 86400
+COLUMNS = ("timestamps", "open", "high", "low", "close", "volume")
+
+ARROW_TYPES = (
+    ("timestamps", "int64"),
+    ("open", "float64"),
+    ("high", "float64"),
+    ("low", "float64"),
+    ("close", "float64"),
+    ("volume", "int64"),
+)
+
+
+def pyarrow_modules():
+    """pyarrow is imported on the first segment read/write, not when the app starts"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+@lru_cache(maxsize=None)
+def arrow_schema():
+    """Segment schema, built once on first use (pyarrow is imported lazily)"""
+    pa, _ = pyarrow_modules()
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind in ARROW_TYPES])
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    return {
+        name: np.empty(0, dtype=np.int64 if name in ("timestamps", "volume") else np.float64)
+        for name in COLUMNS
+    }
+
+
+def concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    parts = [p for p in parts if len(p["timestamps"])]
+    if not parts:
+        return empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+
+
+def _sorted_unique(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Sorts by timestamp and keeps the LAST copy of duplicated bars (newest fetch wins)"""
+    ts = columns["timestamps"]
+    if len(ts) == 0:
+        return columns
+    # Reverse so np.unique's "first occurrence" is the most recently appended row
+    rev_ts = ts[::-1]
+    _, idx = np.unique(rev_ts, return_index=True)
+    keep = len(ts) - 1 - idx
+    return {name: columns[name][keep] for name in COLUMNS}
+
+
+class BarStore:
+    """
+    Persistent on-disk OHLCV cache keyed by (dataset, symbol, schema).
+
+    Layout:  <root>/<dataset>/<schema>/<symbol>/<YYYYMMDD>.parquet
+             <root>/<dataset>/<schema>/<symbol>/coverage.json
+
+    Bars are stored already normalized (epoch-second timestamps, dollar prices)
+    in one Parquet segment per UTC day, so appending the live tail only
+    rewrites today's segment. `coverage.json` records the contiguous
+    [start, end) range we have actually asked Databento for, which lets the
+    caller request only what is missing (including empty ranges like weekends).
+
+    Eviction: segments untouched for `max_age_days` are removed, then the
+    least recently used segments until the store fits in `max_bytes`. Writes
+    keep a running size total, so the full pass over the store only runs
+    when a write takes it past `max_bytes` or every `sweep_seconds`.
+    """
+    def __init__(self, root: Path, max_bytes: int, max_age_days: float, sweep_seconds: float = 3600.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * SECONDS_PER_DAY
+        self.sweep_seconds = sweep_seconds
+
+        # Bytes on disk: measured by each eviction pass, kept up to date by writes in between
+        self._size: Optional[int] = None
+        self._next_sweep = 0.0
+        self._size_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    # --- paths ---
+    def _dir(self, dataset: str, symbol: str, schema: str) -> Path:
+        safe_symbol = "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol)
+        return self.root / dataset / schema / safe_symbol
+
+    @staticmethod
+    def _segment_name(day: int) -> str:
+        return time.strftime("%Y%m%d", time.gmtime(day * SECONDS_PER_DAY)) + ".parquet"
+
+    @staticmethod
+    def _segment_day(path: Path) -> int:
+        return calendar.timegm(time.strptime(path.stem, "%Y%m%d")) // SECONDS_PER_DAY
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    # --- coverage ---
+    def coverage(self, dataset: str, symbol: str, schema: str) -> Optional[Tuple[int, int]]:
+        """Returns the [start, end) epoch-second range already fetched, if any"""
+        return self._read_coverage(self._dir(dataset, symbol, schema))
+
+    @staticmethod
+    def _read_coverage(directory: Path) -> Optional[Tuple[int, int]]:
+        try:
+            data = json.loads((directory / "coverage.json").read_text())
+            return int(data["start"]), int(data["end"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_coverage(self, directory: Path, coverage: Optional[Tuple[int, int]]):
+        path = directory / "coverage.json"
+        if coverage is None:
+            path.unlink(missing_ok=True)
+            return
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"start": coverage[0], "end": coverage[1]}))
+        os.replace(tmp, path)
+
+    # --- read / write ---
+    def _read_segment(self, path: Path) -> Dict[str, np.ndarray]:
+        _, pq = pyarrow_modules()
+        table = pq.read_table(path)
+        # Touch for LRU eviction
+        os.utime(path)
+        return {name: table.column(name).to_numpy() for name in COLUMNS}
+
+    def read(self, dataset: str, symbol: str, schema: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Loads cached bars with start <= timestamp < end"""
+        directory = self._dir(dataset, symbol, schema)
+        parts = []
+        for day in range(start // SECONDS_PER_DAY, (end - 1) // SECONDS_PER_DAY + 1):
+            path = directory / self._segment_name(day)
+            if path.exists():
+                parts.append(self._read_segment(path))
+
+        columns = concat_columns(parts)
+        ts = columns["timestamps"]
+        lo, hi = np.searchsorted(ts, start, "left"), np.searchsorted(ts, end, "left")
+        return {name: columns[name][lo:hi] for name in COLUMNS}
+
+    def write(self, dataset: str, symbol: str, schema: str, columns: Dict[str, np.ndarray], start: int, end: int):
+        """
+        Merges freshly fetched bars covering [start, end) into the store.
+        The recorded coverage grows if the new range touches the old one,
+        otherwise it is replaced.
+        """
+        directory = self._dir(dataset, symbol, schema)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        ts = columns["timestamps"]
+        days = ts // SECONDS_PER_DAY
+        grown = 0
+        for day in np.unique(days).tolist():
+            mask = days == day
+            new_part = {name: columns[name][mask] for name in COLUMNS}
+            path = directory / self._segment_name(day)
+            old_size = self._file_size(path)
+            if old_size:
+                new_part = concat_columns([self._read_segment(path), new_part])
+            merged = _sorted_unique(new_part)
+
+            tmp = path.with_suffix(".tmp")
+            pa, pq = pyarrow_modules()
+            pq.write_table(pa.table(merged, schema=arrow_schema()), tmp)
+            grown += self._file_size(tmp) - old_size
+            os.replace(tmp, path)
+
+        old = self.coverage(dataset, symbol, schema)
+        if old is not None and start <= old[1] and end >= old[0]:
+            coverage = (min(start, old[0]), max(end, old[1]))
+        else:
+            coverage = (start, end)
+        self._write_coverage(directory, coverage)
+
+        self._grow(grown)
+
+    # --- eviction ---
+    def _grow(self, delta: int):
+        """Adds a write to the running total; evicts once it is over max_bytes or the age sweep is due"""
+        with self._size_lock:
+            if self._size is not None:
+                self._size += delta
+            due = self._size is None or self._size > self.max_bytes or time.monotonic() >= self._next_sweep
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drops segments older than max_age, then LRU segments until under max_bytes"""
+        with self._evict_lock:
+            total = self._evict()
+        with self._size_lock:
+            self._size = total
+            self._next_sweep = time.monotonic() + self.sweep_seconds
+
+    def _evict(self) -> int:
+        """One pass over every segment; returns the bytes left on disk"""
+        segments = []
+        for path in self.root.glob("*/*/*/*.parquet"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            segments.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        total = sum(size for _, size, _ in segments)
+        segments.sort()
+
+        for mtime, size, path in segments:
+            too_old = now - mtime > self.max_age_seconds
+            too_big = total > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self._evict_segment(path)
+            total -= size
+        return total
+
+    def _evict_segment(self, path: Path):
+        directory = path.parent
+        day = self._segment_day(path)
+        path.unlink(missing_ok=True)
+        logger.info(f"🧹 Evicted bar segment {path.relative_to(self.root)}")
+
+        # Keep coverage honest: trimming the head is fine, a hole anywhere else invalidates it
+        coverage = self._read_coverage(directory)
+        if coverage is None:
+            return
+        day_start, day_end = day * SECONDS_PER_DAY, (day + 1) * SECONDS_PER_DAY
+        start, end = coverage
+        if day_end <= start or day_start >= end:
+            return
+        if day_start <= start and day_end < end:
+            self._write_coverage(directory, (day_end, end))
+        else:
+            self._write_coverage(directory, None)
@@ -1,18 +1,121 @@
-import databento
+import databento_dbn
 import logging
 import asyncio
-import random
-import pandas as pd
+import threading
+import time
+import numpy as np
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional, Tuple, Union
 from src.app.core.config import settings
+from src.app.core.metrics import RECEIVED_KEY, metrics
+from src.app.infrastructure.market_data.bar_store import BarStore, concat_columns, empty_columns
+from src.app.infrastructure.market_data.live_session import LiveSession
+from src.app.infrastructure.market_data.replay import ReplayEngine
+from src.app.infrastructure.market_data.normalizer import TickBarBuilder, bucket_start, parse_interval, resample_columns
+
+if TYPE_CHECKING:
+    import databento
+    import pandas as pd
+
+FIXED_PRICE_SCALE = 1e9
+TICK_SCHEMAS = ("trades", "mbp-1")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("databento_adapter")
 
+
+@dataclass
+class HistoryRange:
+    """A resolved /history request: [start, end) in epoch seconds and where its bars come from"""
+    symbol: str
+    interval: str
+    seconds: int
+    dataset: str
+    schema: str
+    resample_seconds: Optional[int]  # resampled from `schema` bars (5m, 4h...)
+    start: int
+    end: int
+    fixed: bool                      # the caller pinned an end in the past; the bars won't change
+    simulated: bool
+    columns: Optional[Dict[str, np.ndarray]] = None  # simulation source, held whole (it is small)
+
+
 class DatabentoAdapter:
+    """
+    Construction is cheap on purpose: the Databento SDK (and pandas with it)
+    is imported and the Historical client built by `start()` from the app
+    lifespan, or on first use, so importing the app doesn't pay for them.
+    """
     def __init__(self):
-        # DEBUG: Log configuration at startup
+        # Built by `start()` / the `historical` property
+        self._historical: Optional["databento.Historical"] = None
+        self._historical_guard = threading.Lock()
+
+        # Only use live sessions if strictly needed and key exists
+        self.live_enabled = not settings.USE_SIMULATION and settings.DATABENTO_KEY != "unset"
+        # One multiplexed live session per dataset, opened on first use
+        self._live_sessions: Dict[str, LiveSession] = {}
+        # ohlcv-1m, or trades / mbp-1 to build our own (sub-)second bars
+        self.stream_schema = settings.STREAM_SCHEMA
+        self._tick_builders: Dict[str, TickBarBuilder] = {}
+
+        self.futures_roots = ["ES", "NQ", "CL", "GC", "RTY", "MNQ", "MES", "BTC"]
+        
+        # Databento schema mapping for different intervals
+        self.INTERVAL_MAP = {
+            "1s": "ohlcv-1s",
+            "1m": "ohlcv-1m",
+            "1h": "ohlcv-1h",
+            "1d": "ohlcv-1d"
+        }
+
+        # Local OHLCV cache so repeated history requests only fetch the missing tail
+        if settings.BAR_STORE_ENABLED:
+            self.bar_store = BarStore(
+                root=Path(settings.BAR_STORE_DIR),
+                max_bytes=settings.BAR_STORE_MAX_BYTES,
+                max_age_days=settings.BAR_STORE_MAX_AGE_DAYS,
+                sweep_seconds=settings.BAR_STORE_SWEEP_SECONDS
+            )
+        else:
+            self.bar_store = None
+
+        # Simulation mode replays recorded sessions (or a seeded random walk)
+        self.replay = ReplayEngine(
+            root=Path(settings.REPLAY_DIR),
+            speed=settings.REPLAY_SPEED,
+            seed=settings.REPLAY_SEED,
+            warmup_bars=settings.REPLAY_WARMUP_BARS,
+            bar_store=self.bar_store,
+            dataset_for=self._get_dataset
+        )
+
+        # Blocking Databento calls + decode run here, never on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.HISTORY_FETCH_WORKERS,
+            thread_name_prefix="history-fetch"
+        )
+        # Single-flight: (dataset, symbol, schema, start, end) -> shared in-flight fetch
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # Serializes bar store writes per (dataset, symbol, schema) across executor threads
+        self._series_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._series_locks_guard = threading.Lock()
+
+    @property
+    def historical(self) -> "databento.Historical":
+        if self._historical is None:
+            with self._historical_guard:
+                if self._historical is None:
+                    import databento
+                    self._historical = databento.Historical(key=settings.DATABENTO_KEY)
+        return self._historical
+
+    async def start(self):
+        """Logs the config banner and builds the Historical client off the event loop"""
         logger.info("=" * 50)
         logger.info("🔧 DATABENTO ADAPTER INITIALIZING")
         logger.info(f"   USE_SIMULATION: {settings.USE_SIMULATION}")
@@ -20,29 +123,16 @@ class DatabentoAdapter:
         logger.info(f"   DATABENTO_KEY length: {len(settings.DATABENTO_KEY)}")
         logger.info(f"   DATABENTO_KEY prefix: {settings.DATABENTO_KEY[:10]}..." if len(settings.DATABENTO_KEY) > 10 else f"   DATABENTO_KEY: {settings.DATABENTO_KEY}")
         logger.info("=" * 50)
-        
+
         if settings.DATABENTO_KEY == "unset":
             logger.warning("⚠️ Databento Key is MISSING. Simulation will be forced.")
-        
-        self.historical = databento.Historical(key=settings.DATABENTO_KEY)
-        
-        # Only init live client if strictly needed and key exists
-        if not settings.USE_SIMULATION and settings.DATABENTO_KEY != "unset":
-            logger.info("✅ Initializing LIVE Databento client...")
-            self.live = databento.Live(key=settings.DATABENTO_KEY)
+        if self.live_enabled:
+            logger.info("✅ LIVE Databento sessions enabled")
         else:
             logger.warning("⚠️ Live client NOT initialized (simulation mode or missing key)")
-            self.live = None
 
-        self.futures_roots = ["ES", "NQ", "CL", "GC", "RTY", "MNQ", "MES", "BTC"]
-        
-        # Databento schema mapping for different intervals
-        self.INTERVAL_MAP = {
-            "1s": "ohlcv-1s",
-            "1m": "ohlcv-1m",
-            "1h": "ohlcv-1h",
-            "1d": "ohlcv-1d"
-        }
+        if settings.DATABENTO_KEY != "unset":
+            await asyncio.get_running_loop().run_in_executor(self._executor, lambda: self.historical)
 
     def _get_dataset(self, symbol: str) -> str:
         for root in self.futures_roots:
@@ -50,201 +140,508 @@ class DatabentoAdapter:
                 return "GLBX.MDP3"
         return "XNAS.ITCH"
 
+    def stream_base_seconds(self, symbol: str) -> float:
+        """Bar size of `start_stream` output: replayed/synthetic bars, tick-built bars or live ohlcv-1m"""
+        if settings.USE_SIMULATION:
+            recording = self.replay.recording(symbol)
+            if recording is None:
+                return 1
+            return recording.base_seconds or settings.TICK_BAR_SECONDS
+        return settings.TICK_BAR_SECONDS if self.tick_mode else 60
+
+    def series_key(self, symbol: str, interval: str) -> Tuple[str, str]:
+        """(dataset, schema) under which bars for symbol/interval are stored"""
+        return self._get_dataset(symbol), self.INTERVAL_MAP.get(interval, "ohlcv-1m")
+
     def _needs_normalization(self, dataset: str) -> bool:
         """GLBX.MDP3 returns fixed-point prices (divide by 1e9), XNAS.ITCH returns dollars"""
         return dataset == "GLBX.MDP3"
 
-    def _normalize_record(self, record: pd.Series, symbol: str, dataset: str) -> Dict:
-        """Helper to convert Databento row to our standard Domain Dict with proper normalization"""
+    def _normalize_frame(self, df: "pd.DataFrame", dataset: str) -> Dict[str, np.ndarray]:
+        """
+        A Databento OHLCV frame as bar store columns: the fixed-point divide and
+        timestamp conversion run as whole-array ops, never one row at a time.
+        """
         divisor = 1e9 if self._needs_normalization(dataset) else 1.0
-        return {
-            "symbol": symbol,
-            "dataset": dataset,
-            "timestamp": int(record.name.timestamp()),
-            "open": float(record.get("open")) / divisor,
-            "high": float(record.get("high")) / divisor,
-            "low": float(record.get("low")) / divisor,
-            "close": float(record.get("close")) / divisor,
-            "volume": int(record.get("volume"))
+        columns = {
+            # Epoch seconds, truncated like int(Timestamp.timestamp())
+            "timestamps": df.index.as_unit("ns").asi8 // 1_000_000_000,
         }
+        for field in ("open", "high", "low", "close"):
+            columns[field] = df[field].to_numpy(dtype=np.float64) / divisor
+        columns["volume"] = df["volume"].to_numpy(dtype=np.int64)
+        return columns
+
+    @staticmethod
+    def _columns_payload(columns: Dict[str, np.ndarray], symbol: str, dataset: str, columnar: bool) -> Union[List[Dict], Dict]:
+        """Shapes normalized columns as either {timestamps: [...], open: [...]} or the classic list of bars"""
+        ts = columns["timestamps"].tolist()
+        opens = columns["open"].tolist()
+        highs = columns["high"].tolist()
+        lows = columns["low"].tolist()
+        closes = columns["close"].tolist()
+        volumes = columns["volume"].tolist()
+
+        if columnar:
+            return {
+                "symbol": symbol,
+                "dataset": dataset,
+                "timestamps": ts,
+                "open": opens,
+                "high": highs,
+                "low": lows,
+                "close": closes,
+                "volume": volumes
+            }
+
+        return [
+            {
+                "symbol": symbol,
+                "dataset": dataset,
+                "timestamp": t,
+                "open": o,
+                "high": h,
+                "low": l,
+                "close": c,
+                "volume": v
+            }
+            for t, o, h, l, c, v in zip(ts, opens, highs, lows, closes, volumes)
+        ]
+
+    def _base_interval(self, seconds: int) -> str:
+        """Coarsest native Databento interval that evenly divides `seconds`"""
+        for base in ("1d", "1h", "1m", "1s"):
+            if seconds % parse_interval(base) == 0:
+                return base
+        raise ValueError(f"No base schema divides {seconds}s")
+
+    def _shape_history(self, columns: Dict[str, np.ndarray], symbol: str, dataset: str, columnar: bool, resample_seconds: Optional[int]) -> Union[List[Dict], Dict]:
+        if resample_seconds:
+            columns = resample_columns(columns, resample_seconds, settings.SESSION_ORIGIN_SECONDS)
+        return self._columns_payload(columns, symbol, dataset, columnar)
+
+    def _fetch_columns(self, dataset: str, symbol: str, schema: str, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """Downloads [start, end) from Databento and normalizes it to columns"""
+        data = self.historical.timeseries.get_range(
+            dataset=dataset,
+            symbols=[symbol],
+            start=start,
+            end=end,
+            schema=schema
+        )
+        
+        # Convert DBNStore to DataFrame
+        df = data.to_df()
+        if len(df) == 0:
+            return empty_columns()
+        return self._normalize_frame(df, dataset)
+
+    def _load_range(self, dataset: str, symbol: str, schema: str, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """
+        Serves [start, end) from the local bar store, fetching only the
+        head/tail that is not cached yet.
+        """
+        if self.bar_store is None:
+            return self._fetch_columns(dataset, symbol, schema, start, end)
+
+        with self._series_lock(dataset, symbol, schema):
+            return self._load_range_locked(dataset, symbol, schema, start, end)
+
+    def _series_lock(self, dataset: str, symbol: str, schema: str) -> threading.Lock:
+        key = (dataset, symbol, schema)
+        with self._series_locks_guard:
+            lock = self._series_locks.get(key)
+            if lock is None:
+                lock = self._series_locks[key] = threading.Lock()
+            return lock
+
+    def _load_range_locked(self, dataset: str, symbol: str, schema: str, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        start_s, end_s = int(start.timestamp()), int(end.timestamp())
+        coverage = self.bar_store.coverage(dataset, symbol, schema)
+
+        if coverage is None or coverage[1] < start_s or coverage[0] > end_s:
+            missing = [(start_s, end_s)]
+        else:
+            missing = []
+            if start_s < coverage[0]:
+                missing.append((start_s, coverage[0]))
+            if coverage[1] < end_s:
+                missing.append((coverage[1], end_s))
+
+        for gap_start, gap_end in missing:
+            logger.info(f"   ⬇️ Bar store miss: {datetime.fromtimestamp(gap_start, timezone.utc)} to {datetime.fromtimestamp(gap_end, timezone.utc)}")
+            columns = self._fetch_columns(
+                dataset, symbol, schema,
+                datetime.fromtimestamp(gap_start, timezone.utc),
+                datetime.fromtimestamp(gap_end, timezone.utc)
+            )
+            self.bar_store.write(dataset, symbol, schema, columns, gap_start, gap_end)
+
+        return self.bar_store.read(dataset, symbol, schema, start_s, end_s)
+
+    async def _load_range_shared(self, dataset: str, symbol: str, schema: str, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+        """
+        Runs `_load_range` on the bounded executor. Concurrent identical
+        requests await the same in-flight fetch instead of starting their own.
+        """
+        key = (dataset, symbol, schema, start, end)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._load_range, dataset, symbol, schema, start, end)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+        else:
+            logger.info(f"   🔗 Joining in-flight fetch for {symbol} ({schema})")
+
+        # Shield: one waiter going away must not cancel the fetch for everyone else
+        return await asyncio.shield(future)
 
-    async def get_history(self, symbol: str, interval: str = "1m", lookback_days: int = 2) -> List[Dict]:
+    def close(self):
+        """Stops the fetch executor. Called from the app lifespan."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def close_live(self):
+        """Closes every live session. Called from the app lifespan."""
+        sessions, self._live_sessions = list(self._live_sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+    async def get_history(self, symbol: str, interval: str = "1m", lookback_days: int = 2, columnar: bool = False) -> Union[List[Dict], Dict]:
         """
         Fetch historical OHLCV data from Databento.
         
         Args:
             symbol: Trading symbol (e.g., 'TSLA', 'ES.c.0')
-            interval: Timeframe - '1s', '1m', '1h', '1d'
+            interval: Timeframe - '1s', '1m', '1h', '1d' or any resampled one ('5m', '15m', '4h')
             lookback_days: Number of days to fetch
+            columnar: Return {timestamps: [...], open: [...], ...} instead of a list of bars
         """
+        if settings.USE_SIMULATION:
+            replayed = self._replay_history(symbol, interval, columnar)
+            if replayed is not None:
+                return replayed
+
         if settings.DATABENTO_KEY == "unset":
-            return self._generate_mock_history(symbol, interval, count=100)
+            return self._mock_history(symbol, interval, count=100, columnar=columnar)
 
-        # Validate interval
+        # Validate interval. Non-native timeframes (5m, 15m, 4h...) are built from the coarsest schema that divides them
         schema = self.INTERVAL_MAP.get(interval)
+        resample_seconds = None
         if not schema:
-            logger.warning(f"⚠️ Invalid interval '{interval}'. Defaulting to 1m.")
-            schema = "ohlcv-1m"
+            try:
+                resample_seconds = parse_interval(interval)
+                schema = self.INTERVAL_MAP[self._base_interval(resample_seconds)]
+            except ValueError:
+                logger.warning(f"⚠️ Invalid interval '{interval}'. Defaulting to 1m.")
+                schema = "ohlcv-1m"
 
         try:
             dataset = self._get_dataset(symbol)
-            now = datetime.now(timezone.utc)
-            
-            # Go back 15 minutes from now to ensure data is available
-            # Databento data has ~10-15 min delay for retail accounts
-            end = now - timedelta(minutes=15)
-            end = end.replace(second=0, microsecond=0)
-            
-            start = end - timedelta(days=lookback_days)
-            
-            # Handle weekends
-            if end.weekday() >= 5: 
-                start = start - timedelta(days=2)
-                end = end - timedelta(days=2)
+            start, end = self._default_range(lookback_days)
 
             logger.info(f"📥 Fetching {interval} history for {symbol} from {dataset}...")
             logger.info(f"   Schema: {schema} | Range: {start} to {end}")
+
+            columns = await self._load_range_shared(dataset, symbol, schema, start, end)
             
-            data = self.historical.timeseries.get_range(
-                dataset=dataset,
-                symbols=[symbol],
-                start=start,
-                end=end,
-                schema=schema
-            )
-            
-            # Convert DBNStore to DataFrame
-            df = data.to_df()
-            
-            if len(df) == 0:
+            if len(columns["timestamps"]) == 0:
                 logger.warning(f"⚠️ Real history empty for {symbol}. Falling back to Mock.")
-                return self._generate_mock_history(symbol, interval, count=100)
+                return self._mock_history(symbol, interval, count=100, columnar=columnar)
 
-            history = []
-            for index, row in df.iterrows():
-                row.name = index 
-                history.append(self._normalize_record(row, symbol, dataset))
-                
-            logger.info(f"✅ Loaded {len(history)} REAL bars from Databento.")
-            return history
+            logger.info(f"✅ Loaded {len(columns['timestamps'])} REAL bars.")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._shape_history, columns, symbol, dataset, columnar, resample_seconds
+            )
 
         except Exception as e:
             logger.error(f"❌ Real History Failed ({str(e)}). Falling back to MOCK.")
-            return self._generate_mock_history(symbol, interval, count=100)
+            return self._mock_history(symbol, interval, count=100, columnar=columnar)
+
+    @staticmethod
+    def latest_history_end() -> datetime:
+        """
+        Newest point history can be asked for: 15 minutes back, on the minute
+        (Databento data has a ~10-15 min delay for retail accounts)
+        """
+        end = datetime.now(timezone.utc) - timedelta(minutes=15)
+        return end.replace(second=0, microsecond=0)
+
+    def _default_range(self, lookback_days: float) -> Tuple[datetime, datetime]:
+        end = self.latest_history_end()
+        start = end - timedelta(days=lookback_days)
+        # Handle weekends
+        if end.weekday() >= 5:
+            start = start - timedelta(days=2)
+            end = end - timedelta(days=2)
+        return start, end
+
+    # --- range-addressable history (/history) ---
+    def history_range(self, symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+                      lookback_seconds: Optional[float] = None) -> HistoryRange:
+        """
+        Resolves a /history request to a concrete [start, end) in epoch seconds without loading anything.
+        Without `end` it is the latest available bar; without `start`, `lookback_seconds` (default
+        the usual two days) before the end. Resampled ranges start on a bucket boundary.
+        Raises ValueError for bad intervals or ranges.
+        """
+        seconds = parse_interval(interval)
+        schema = self.INTERVAL_MAP.get(interval)
+        resample_seconds = None
+        if not schema:
+            resample_seconds = seconds
+            schema = self.INTERVAL_MAP[self._base_interval(seconds)]
+
+        simulated = settings.USE_SIMULATION or settings.DATABENTO_KEY == "unset"
+        dataset, columns = (None, None)
+        if simulated:
+            dataset, columns = self._simulated_columns(symbol, seconds)
+        latest = int(time.time()) if simulated else int(self.latest_history_end().timestamp())
+        fixed = end is not None and end <= latest
+
+        if end is None and start is None and lookback_seconds is None:
+            if simulated:
+                # Everything the simulation has (a recording's warmup bars may be from any date)
+                ts = columns["timestamps"]
+                start, end = (int(ts[0]), int(ts[-1]) + seconds) if len(ts) else (latest - seconds, latest)
+            else:
+                default_start, default_end = self._default_range(2)
+                start, end = int(default_start.timestamp()), int(default_end.timestamp())
+        else:
+            end = latest if end is None else min(int(end), latest)
+            if start is None:
+                start = end - int(lookback_seconds if lookback_seconds is not None else 2 * 86400)
+        start = int(bucket_start(int(start), seconds, settings.SESSION_ORIGIN_SECONDS))
+        if start >= end:
+            raise ValueError("start must be before end")
+        if end - start > settings.HISTORY_MAX_RANGE_DAYS * 86400:
+            raise ValueError(f"Range is longer than {settings.HISTORY_MAX_RANGE_DAYS:g} days; page through it with limit/cursor")
+
+        return HistoryRange(
+            symbol, interval, seconds, dataset or self._get_dataset(symbol), schema, resample_seconds,
+            start, end, fixed, simulated, columns
+        )
+
+    def _simulated_columns(self, symbol: str, seconds: int) -> Tuple[str, Dict[str, np.ndarray]]:
+        """(dataset, columns) of simulation history: the replay recording's warmup bars, else the seeded mock"""
+        columns = self.replay.history(symbol) if settings.USE_SIMULATION else None
+        if columns is None:
+            return "SIMULATION", self.replay.synthetic_history(symbol, seconds, 100)
+        recording = self.replay.recording(symbol)
+        if seconds > recording.base_seconds:
+            columns = resample_columns(columns, seconds, settings.SESSION_ORIGIN_SECONDS)
+        return recording.dataset, columns
+
+    def _chunk_edges(self, rng: HistoryRange) -> List[int]:
+        """Chunk boundaries for `rng`, on a grid of HISTORY_CHUNK_BARS bars so no bucket straddles two chunks"""
+        span = rng.seconds * max(settings.HISTORY_CHUNK_BARS, 1)
+        edge = int(bucket_start(rng.start, span, settings.SESSION_ORIGIN_SECONDS)) + span
+        edges = [rng.start]
+        while edge < rng.end:
+            edges.append(edge)
+            edge += span
+        edges.append(rng.end)
+        return edges
+
+    async def _history_chunk(self, rng: HistoryRange, start: int, end: int) -> Dict[str, np.ndarray]:
+        if rng.simulated:
+            ts = np.asarray(rng.columns["timestamps"])
+            lo, hi = np.searchsorted(ts, start, "left"), np.searchsorted(ts, end, "left")
+            return {name: np.asarray(rng.columns[name])[lo:hi] for name in rng.columns}
+
+        columns = await self._load_range_shared(
+            rng.dataset, rng.symbol, rng.schema,
+            datetime.fromtimestamp(start, timezone.utc), datetime.fromtimestamp(end, timezone.utc)
+        )
+        if rng.resample_seconds:
+            loop = asyncio.get_running_loop()
+            columns = await loop.run_in_executor(
+                self._executor, resample_columns, columns, rng.resample_seconds, settings.SESSION_ORIGIN_SECONDS
+            )
+        return columns
+
+    async def iter_history(self, rng: HistoryRange) -> AsyncIterator[Dict[str, np.ndarray]]:
+        """
+        Columns for `rng`, oldest first, one chunk at a time. The next chunk
+        is fetched while the current one is being sent, and at most those two
+        are in memory, however long the range is.
+        """
+        edges = self._chunk_edges(rng)
+        bounds = list(zip(edges[:-1], edges[1:]))
+        upcoming = asyncio.ensure_future(self._history_chunk(rng, *bounds[0]))
+        try:
+            for i in range(len(bounds)):
+                columns = await upcoming
+                if i + 1 < len(bounds):
+                    upcoming = asyncio.ensure_future(self._history_chunk(rng, *bounds[i + 1]))
+                if len(columns["timestamps"]):
+                    yield columns
+        finally:
+            if not upcoming.done():
+                upcoming.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await upcoming
+
+    async def history_page(self, rng: HistoryRange, limit: int) -> Dict[str, np.ndarray]:
+        """The newest `limit` bars of `rng`, loading chunks newest first and only as many as needed"""
+        edges = self._chunk_edges(rng)
+        parts = []
+        total = 0
+        for start, end in reversed(list(zip(edges[:-1], edges[1:]))):
+            columns = await self._history_chunk(rng, start, end)
+            parts.append(columns)
+            total += len(columns["timestamps"])
+            if total >= limit:
+                break
+        columns = concat_columns(parts[::-1])
+        return {name: values[-limit:] for name, values in columns.items()}
+
+    @property
+    def tick_mode(self) -> bool:
+        """Live bars are built in-process from trades / mbp-1 instead of Databento's ohlcv-1m"""
+        return self.stream_schema in TICK_SCHEMAS
+
+    def live_stats(self) -> List[Dict]:
+        """Connection / reconnect counters and channel depth per live session"""
+        return [session.stats() for session in self._live_sessions.values()]
+
+    def live_session(self, dataset: str) -> LiveSession:
+        """The shared live session for `dataset` (Databento allows one dataset per connection)"""
+        session = self._live_sessions.get(dataset)
+        if session is None:
+            session = LiveSession(
+                dataset,
+                self._live_events,
+                schema=self.stream_schema,
+                heartbeat=self._tick_heartbeat if self.tick_mode else None
+            )
+            self._live_sessions[dataset] = session
+        return session
+
+    def _live_events(self, record, symbol: str) -> List[Dict]:
+        """Live record -> stream bars for the symbol the session resolved it to"""
+        if isinstance(record, databento_dbn.OHLCVMsg):
+            # Live records are always fixed-point, unlike the float frames from to_df()
+            return [{
+                "symbol": symbol,
+                "price": record.close / FIXED_PRICE_SCALE,
+                "open": record.open / FIXED_PRICE_SCALE,
+                "high": record.high / FIXED_PRICE_SCALE,
+                "low": record.low / FIXED_PRICE_SCALE,
+                "timestamp": record.ts_event / 1e9,
+                "dataset": self._get_dataset(symbol)
+            }]
+
+        if isinstance(record, databento_dbn.MBP1Msg):
+            builder = self._tick_builder(symbol)
+            level = record.levels[0]
+            builder.quote(level.bid_px, level.ask_px, level.bid_sz, level.ask_sz)
+            if record.action != databento_dbn.Action.TRADE:
+                return []
+            events = builder.trade(record.ts_event, record.price, record.size)
+        elif isinstance(record, databento_dbn.TradeMsg):
+            events = self._tick_builder(symbol).trade(record.ts_event, record.price, record.size)
+        else:
+            return []
+        return self._tick_events(symbol, events) if events else events
+
+    def _tick_builder(self, symbol: str) -> TickBarBuilder:
+        builder = self._tick_builders.get(symbol)
+        if builder is None:
+            builder = self._tick_builders[symbol] = TickBarBuilder(
+                settings.TICK_BAR_SECONDS,
+                partial_hz=settings.TICK_PARTIAL_RATE_HZ,
+                price_scale=FIXED_PRICE_SCALE
+            )
+        return builder
+
+    def _tick_heartbeat(self, symbol: str, now_ns: int) -> List[Dict]:
+        builder = self._tick_builders.get(symbol)
+        if builder is None:
+            return []
+        events = builder.expire(now_ns)
+        return self._tick_events(symbol, events) if events else events
+
+    def _tick_events(self, symbol: str, events: List[Dict]) -> List[Dict]:
+        dataset = self._get_dataset(symbol)
+        return [{"symbol": symbol, "dataset": dataset, "price": e["close"], **e} for e in events]
 
     async def start_stream(self, symbol: str):
         """Yields Live Data (or Simulation)"""
         logger.info(f"🔄 start_stream called for {symbol}")
         logger.info(f"   USE_SIMULATION = {settings.USE_SIMULATION}")
-        logger.info(f"   self.live = {self.live}")
         
         if settings.USE_SIMULATION:
             logger.info(f"⚡ STARTING SIMULATION STREAM for {symbol}")
-            async for bar in self._simulate_price_action(symbol):
+            async for bar in self._replay_stream(symbol):
+                if metrics.enabled:
+                    bar[RECEIVED_KEY] = time.perf_counter_ns()
                 yield bar
         else:
-            if not self.live:
+            if not self.live_enabled:
                  logger.error("❌ Live Client is None!")
                  yield {"error": "Live Client not initialized"}
                  return
 
             dataset = self._get_dataset(symbol)
-            divisor = 1e9 if self._needs_normalization(dataset) else 1.0
-            logger.info(f"🚀 Starting REAL Live Stream for {symbol} on {dataset}...")
-            logger.info(f"   Divisor: {divisor}")
-            try:
-                logger.info(f"📡 Subscribing to {dataset} / {symbol}...")
-                self.live.subscribe(
-                    dataset=dataset,
-                    schema="ohlcv-1m",
-                    symbols=[symbol],
-                    stype_in="raw_symbol" 
-                )
-                logger.info(f"✅ Subscribed! Waiting for data...")
-                record_count = 0
-                async for record in self.live:
-                    record_count += 1
-                    if record_count <= 3:
-                        logger.info(f"📊 Received record #{record_count}: {type(record).__name__}")
-                    if isinstance(record, databento.OHLCVMsg):
-                        price = record.close / divisor
-                        if record_count <= 3:
-                            logger.info(f"   💰 Price: {price}")
-                        yield {
-                            "symbol": symbol,
-                            "price": price,
-                            "open": record.open / divisor,
-                            "high": record.high / divisor,
-                            "low": record.low / divisor,
-                            "timestamp": record.ts_event / 1e9,
-                            "dataset": dataset
-                        }
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"❌ Live Stream Failed: {error_msg}")
-                import traceback
-                logger.error(traceback.format_exc())
-                
+            logger.info(f"🚀 Joining live session for {symbol} on {dataset}...")
+            async for bar in self.live_session(dataset).stream(symbol):
+                if "error" not in bar:
+                    yield bar
+                    continue
+
+                error_msg = bar["error"]
                 # Check if this is a license issue - fall back to simulation
                 if "license" in error_msg.lower():
                     logger.warning("⚠️ Live data license not available. Falling back to SIMULATION.")
                     logger.warning("💡 To get live data, upgrade to Databento's live streaming plan.")
-                    async for bar in self._simulate_price_action(symbol):
-                        yield bar
+                    async for sim_bar in self._replay_stream(symbol):
+                        yield sim_bar
                 else:
-                    yield {"error": error_msg}
-
-    # --- MOCK GENERATORS ---
-    def _generate_mock_history(self, symbol: str, interval: str = "1m", count: int = 100) -> List[Dict]:
-        """Generates consistent fake candles going back in time"""
-        history = []
-        price = 150.00
-        now = datetime.now(timezone.utc)
-        
-        # Map interval to timedelta
-        interval_deltas = {
-            "1s": timedelta(seconds=1),
-            "1m": timedelta(minutes=1),
-            "1h": timedelta(hours=1),
-            "1d": timedelta(days=1)
-        }
-        delta = interval_deltas.get(interval, timedelta(minutes=1))
-        
-        # Generate backwards then reverse
-        for i in range(count):
-            price += (random.random() - 0.5) * 2.0
-            ts = now - (delta * i)
-            
-            history.append({
-                "symbol": symbol,
-                "dataset": "SIMULATION",
-                "timestamp": int(ts.timestamp()),
-                "open": round(price - 0.1, 2),
-                "high": round(price + 0.2, 2),
-                "low": round(price - 0.2, 2),
-                "close": round(price, 2),
-                "volume": random.randint(100, 5000)
-            })
-        
-        return history[::-1]  # Reverse to be chronological
-
-    async def _simulate_price_action(self, symbol: str):
-        """Infinite loop of random walk prices"""
-        price = 150.00 
-        while True:
-            await asyncio.sleep(1)
-            change = (random.random() - 0.5) * 1.0 
-            price += change
-            
-            # Send full candle structure for consistency
-            yield {
-                "symbol": symbol,
-                "price": round(price, 2),
-                "open": round(price, 2),
-                "high": round(price + 0.05, 2),
-                "low": round(price - 0.05, 2),
-                "timestamp": datetime.now(timezone.utc).timestamp(),
-                "dataset": "SIMULATION"
-            }
+                    yield bar
+                return
+
+    # --- SIMULATION / REPLAY ---
+    def _mock_history(self, symbol: str, interval: str, count: int, columnar: bool) -> Union[List[Dict], Dict]:
+        """Seeded synthetic candles ending now (per-symbol price, reproducible with REPLAY_SEED)"""
+        try:
+            seconds = parse_interval(interval)
+        except ValueError:
+            seconds = 60
+        columns = self.replay.synthetic_history(symbol, seconds, count)
+        return self._columns_payload(columns, symbol, "SIMULATION", columnar)
+
+    def _replay_history(self, symbol: str, interval: str, columnar: bool) -> Optional[Union[List[Dict], Dict]]:
+        """History for a symbol with a replay recording: the bars just before playback starts"""
+        columns = self.replay.history(symbol)
+        if columns is None:
+            return None
+        try:
+            seconds = parse_interval(interval)
+        except ValueError:
+            seconds = 60
+        recording = self.replay.recording(symbol)
+        resample_seconds = seconds if seconds > recording.base_seconds else None
+        return self._shape_history(columns, symbol, recording.dataset, columnar, resample_seconds)
+
+    async def _replay_stream(self, symbol: str):
+        """Simulation source: recorded bars/ticks if we have them, else a seeded random walk"""
+        recording = self.replay.recording(symbol)
+        if recording is None:
+            async for bar in self.replay.synthetic(symbol):
+                yield bar
+        elif recording.kind == "bars":
+            async for bar in self.replay.bars(recording):
+                yield bar
+        else:
+            # Ticks go through the same bar builder as the live trades / mbp-1 feed
+            last_ts = 0
+            async for record in self.replay.records(recording):
+                last_ts = record.ts_event
+                for bar in self._live_events(record, symbol):
+                    yield bar
+            for bar in self._tick_heartbeat(symbol, last_ts + 10 ** 12):
+                yield bar
 
 market_data_client = DatabentoAdapter()
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Wire encodings for streamed /history responses.
+
+A range is loaded chunk by chunk (`DatabentoAdapter.iter_history`); each
+chunk is serialized and compressed on its own and flushed straight away,
+so the first bars go out before the rest of the range is even fetched.
+
+Formats:
+  rows    JSON array of bar objects (same shape as before, just streamed)
+  ndjson  one bar object per line
+  arrow   Arrow IPC stream, one record batch per chunk
+
+Paging: `limit` returns the newest N bars of the range; the response's
+X-Next-Cursor is an opaque token for the page before it (pass it back as
+`cursor`). Caching: responses carry a weak ETag derived from the resolved
+range and format, so a repeated chart load is answered with 304 before
+anything is loaded.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import zlib
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterable, Optional
+import numpy as np
+from src.app.infrastructure.market_data.bar_store import COLUMNS, arrow_schema, pyarrow_modules
+
+MEDIA_TYPES = {
+    "rows": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+Columns = Dict[str, np.ndarray]
+
+
+# --- cursors ---
+def encode_cursor(interval: str, end: int) -> str:
+    raw = json.dumps({"i": interval, "e": int(end)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, interval: str) -> int:
+    """End (exclusive) of the page a cursor points to. Raises ValueError for foreign or broken cursors."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        end = int(data["e"])
+        cursor_interval = data["i"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if cursor_interval != interval:
+        raise ValueError(f"Cursor is for interval {cursor_interval}, not {interval}")
+    return end
+
+
+# --- caching ---
+def history_etag(*parts) -> str:
+    """Weak ETag over the resolved request; the same bars in any content-encoding share it"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes don't matter
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+# --- compression ---
+@lru_cache(maxsize=None)
+def _brotli():
+    """brotli is optional: `br` is only offered when it is installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' if accepted and available, else 'gzip' if accepted, else None (identity)"""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if "br" in accepted and _brotli() is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+async def compress(body: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Compresses a streamed body, flushing after every piece so nothing waits for the next chunk"""
+    if encoding is None:
+        async for piece in body:
+            yield piece
+        return
+    if encoding == "br":
+        compressor = _brotli().Compressor(quality=4)
+        async for piece in body:
+            out = compressor.process(piece) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for piece in body:
+        out = compressor.compress(piece) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# --- formats ---
+def _row_template(symbol: str, dataset: str) -> str:
+    prefix = json.dumps({"symbol": symbol, "dataset": dataset}, separators=(",", ":"))[:-1]
+    return prefix + ',"timestamp":%d,"open":%r,"high":%r,"low":%r,"close":%r,"volume":%d}'
+
+
+class _Null:
+    """Formats as JSON null through the template's %r slots"""
+    def __repr__(self) -> str:
+        return "null"
+
+
+_NULL = _Null()
+
+
+def _rows(columns: Columns, template: str) -> Iterable[str]:
+    values = []
+    for name in COLUMNS:
+        column = columns[name]
+        items = column.tolist()
+        # %r would write NaN / inf, which is not JSON: those prices go out as null
+        if column.dtype.kind == "f" and not np.isfinite(column).all():
+            items = [v if math.isfinite(v) else _NULL for v in items]
+        values.append(items)
+    return (template % row for row in zip(*values))
+
+
+async def ndjson_body(chunks: AsyncIterator[Columns], symbol: str, dataset: str) -> AsyncIterator[bytes]:
+    template = _row_template(symbol, dataset)
+    async for columns in chunks:
+        yield ("\n".join(_rows(columns, template)) + "\n").encode()
+
+
+async def rows_body(chunks: AsyncIterator[Columns], symbol: str, dataset: str) -> AsyncIterator[bytes]:
+    template = _row_template(symbol, dataset)
+    separator = "["
+    async for columns in chunks:
+        yield (separator + ",".join(_rows(columns, template))).encode()
+        separator = ","
+    yield b"[]" if separator == "[" else b"]"
+
+
+class _ArrowSink:
+    """File-like target for the Arrow IPC writer; what it wrote is taken after each batch"""
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+async def arrow_body(chunks: AsyncIterator[Columns]) -> AsyncIterator[bytes]:
+    pa, _ = pyarrow_modules()
+    schema = arrow_schema()
+    sink = _ArrowSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    async for columns in chunks:
+        writer.write_batch(pa.record_batch(
+            [pa.array(np.asarray(columns[name]), type=field.type) for name, field in zip(COLUMNS, schema)],
+            schema=schema
+        ))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def encode_body(fmt: str, chunks: AsyncIterator[Columns], symbol: str, dataset: str) -> AsyncIterator[bytes]:
+    if fmt == "ndjson":
+        return ndjson_body(chunks, symbol, dataset)
+    if fmt == "arrow":
+        return arrow_body(chunks)
+    return rows_body(chunks, symbol, dataset)
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import re
+import time
+from contextlib import suppress
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import databento_dbn
+from src.app.core.config import settings
+from src.app.core.metrics import RECEIVED_KEY, metrics
+
+logger = logging.getLogger("live_session")
+
+# ES.c.0 / CL.n.1 / NQ.v.0 -> continuous, ES.FUT / ES.OPT -> parent, everything else raw
+_CONTINUOUS_RE = re.compile(r"^[A-Z0-9]+\.[cnv]\.\d+$", re.IGNORECASE)
+_PARENT_SUFFIXES = (".FUT", ".OPT", ".SPOT")
+
+# Pushed into a channel to end its consumer
+_CLOSED = object()
+
+# OHLCV ts_event is the bar open; the bar is only complete this much later
+_BAR_NS = {"ohlcv-1s": 10 ** 9, "ohlcv-1m": 60 * 10 ** 9, "ohlcv-1h": 3600 * 10 ** 9, "ohlcv-1d": 86400 * 10 ** 9}
+
+
+def infer_stype(symbol: str) -> str:
+    """Databento input symbology for one of our symbols"""
+    if _CONTINUOUS_RE.match(symbol):
+        return "continuous"
+    if symbol.upper().endswith(_PARENT_SUFFIXES):
+        return "parent"
+    return "raw_symbol"
+
+
+class LiveSession:
+    """
+    ONE Databento live connection for a whole dataset, shared by every symbol on it.
+
+    Symbols are added at runtime and subscribed in batches (one subscription
+    request per stype_in, up to `batch_size` symbols each) on the already
+    running session, so adding a symbol never reconnects. Incoming records are
+    resolved from `instrument_id` to OUR symbol via the session's
+    SymbolMappingMsg stream and routed into per-symbol channels.
+
+    Databento has no unsubscribe: removing a symbol closes its channels and
+    drops its records; re-adding it later reuses the upstream subscription.
+
+    A dropped connection is reopened with backoff and every symbol still
+    routed is resubscribed; channels stay open meanwhile (bars from the gap
+    are not replayed).
+    """
+    def __init__(
+        self,
+        dataset: str,
+        to_event: Callable[[object, str], Iterable[Dict]],
+        schema: str = "ohlcv-1m",
+        heartbeat: Optional[Callable[[str, int], Iterable[Dict]]] = None,
+        heartbeat_interval: float = 0.05,
+        key: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        channel_size: Optional[int] = None,
+        client_factory: Optional[Callable[..., object]] = None
+    ):
+        self.dataset = dataset
+        self.schema = schema
+        self.key = key or settings.DATABENTO_KEY
+        self.batch_size = batch_size or settings.LIVE_SUBSCRIBE_BATCH_SIZE
+        self.channel_size = channel_size or settings.LIVE_CHANNEL_SIZE
+        # record, symbol -> events to publish (usually 0 or 1 bars)
+        self._to_event = to_event
+        # symbol, wall clock ns -> events; for time-driven bar closes (tick mode)
+        self._heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self._client_factory = client_factory
+        self._bar_ns = _BAR_NS.get(schema, 0)
+
+        self._client = None
+        self._reader: Optional[asyncio.Task] = None
+        self._clock: Optional[asyncio.Task] = None
+        self._flush: Optional[asyncio.Task] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Symbols we route records for -> their consumer queues
+        self._channels: Dict[str, Set[asyncio.Queue]] = {}
+        # Symbols with an upstream subscription on the current connection
+        self._subscribed: Set[str] = set()
+        self._to_subscribe: Set[str] = set()
+        # instrument_id -> our symbol (stype_in_symbol of the mapping message)
+        self._instruments: Dict[int, str] = {}
+
+        # Upstream connection counters (for /metrics)
+        self.connects = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.records = 0
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._channels.keys())
+
+    @property
+    def is_running(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    # --- symbol set ---
+    def add(self, symbols: Iterable[str]):
+        """Starts routing `symbols`; new ones are subscribed on the next batch flush"""
+        for symbol in symbols:
+            self._channels.setdefault(symbol, set())
+            if symbol not in self._subscribed:
+                self._to_subscribe.add(symbol)
+        if self._reconnecting is not None and not self._reconnecting.done():
+            # The reconnect resubscribes every routed symbol, these included
+            return
+        if self._to_subscribe and (self._flush is None or self._flush.done()):
+            # Coalesce every add() from this event loop tick into one batch
+            self._flush = asyncio.create_task(self._flush_subscriptions(), name=f"live-subscribe:{self.dataset}")
+
+    def remove(self, symbol: str):
+        """Stops routing `symbol` and ends its open channels"""
+        self._to_subscribe.discard(symbol)
+        for queue in self._channels.pop(symbol, ()):
+            self._put(queue, _CLOSED)
+
+    # --- per-symbol channels ---
+    def open(self, symbol: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.channel_size)
+        self.add([symbol])
+        self._channels[symbol].add(queue)
+        return queue
+
+    def close_channel(self, symbol: str, queue: asyncio.Queue):
+        queues = self._channels.get(symbol)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            self.remove(symbol)
+
+    async def stream(self, symbol: str):
+        """Async generator of bars for one symbol; its lifetime holds the symbol in the session"""
+        queue = self.open(symbol)
+        try:
+            while True:
+                event = await queue.get()
+                if event is _CLOSED:
+                    return
+                yield event
+        finally:
+            self.close_channel(symbol, queue)
+
+    def _put(self, queue: asyncio.Queue, event):
+        if queue.full():
+            # A stalled consumer loses its oldest bar instead of growing without bound
+            with suppress(asyncio.QueueEmpty):
+                queue.get_nowait()
+        queue.put_nowait(event)
+
+    def _publish(self, symbol: str, event):
+        for queue in self._channels.get(symbol, ()):
+            self._put(queue, event)
+
+    # --- upstream ---
+    async def _flush_subscriptions(self):
+        await asyncio.sleep(0)
+        async with self._lock:
+            # Symbols added while a batch is in flight go out in the next round
+            while self._to_subscribe:
+                pending = [s for s in self._to_subscribe if s in self._channels and s not in self._subscribed]
+                self._to_subscribe.clear()
+                if pending:
+                    await self._subscribe(pending)
+
+    async def _subscribe(self, pending: List[str], drop: bool = True) -> bool:
+        """
+        Subscribes `pending`, connecting first if needed. On failure their channels get the
+        error and are closed, or with drop=False (reconnects) kept for the next attempt.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if self._client is None:
+                logger.info(f"🔌 Opening live session for {self.dataset} ({self.schema})")
+                factory = self._client_factory
+                if factory is None:
+                    # The full SDK (and pandas) only loads once a live session is needed
+                    import databento
+                    factory = databento.Live
+                self._client = await loop.run_in_executor(None, lambda: factory(key=self.key))
+                self.connects += 1
+
+            by_stype: Dict[str, List[str]] = {}
+            for symbol in sorted(pending):
+                by_stype.setdefault(infer_stype(symbol), []).append(symbol)
+            for stype_in, symbols in by_stype.items():
+                for i in range(0, len(symbols), self.batch_size):
+                    batch = symbols[i:i + self.batch_size]
+                    logger.info(f"📡 Subscribing {len(batch)} {stype_in} symbols on {self.dataset}")
+                    await loop.run_in_executor(None, lambda b=batch, s=stype_in: self._client.subscribe(
+                        dataset=self.dataset,
+                        schema=self.schema,
+                        symbols=b,
+                        stype_in=s
+                    ))
+                    self._subscribed.update(batch)
+        except Exception as e:
+            logger.error(f"❌ Live subscribe failed on {self.dataset}: {e}")
+            if not drop:
+                self._reset()
+                return False
+            for symbol in pending:
+                if symbol not in self._subscribed:
+                    self._publish(symbol, {"error": str(e)})
+                    self.remove(symbol)
+            return False
+
+        if not self.is_running:
+            self._reader = asyncio.create_task(self._read(), name=f"live-session:{self.dataset}")
+            if self._heartbeat is not None and (self._clock is None or self._clock.done()):
+                self._clock = asyncio.create_task(self._tick_clock(), name=f"live-clock:{self.dataset}")
+        return True
+
+    async def _tick_clock(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now_ns = time.time_ns()
+            for symbol in list(self._channels):
+                events = self._heartbeat(symbol, now_ns)
+                if events and metrics.enabled:
+                    received = time.perf_counter_ns()
+                    for event in events:
+                        event[RECEIVED_KEY] = received
+                for event in events:
+                    self._publish(symbol, event)
+
+    async def _read(self):
+        client = self._client
+        error = "Live session ended"
+        try:
+            async for record in client:
+                if isinstance(record, databento_dbn.SymbolMappingMsg):
+                    self._map_instrument(record)
+                    continue
+                if isinstance(record, databento_dbn.ErrorMsg):
+                    logger.error(f"❌ Gateway error on {self.dataset}: {record.err}")
+                    continue
+                symbol = self._instruments.get(record.instrument_id)
+                if symbol is None:
+                    symbol = client.symbology_map.get(record.instrument_id)
+                if symbol is None or symbol not in self._channels:
+                    continue
+                self.records += 1
+                if not metrics.enabled:
+                    for event in self._to_event(record, symbol):
+                        self._publish(symbol, event)
+                    continue
+
+                received = time.perf_counter_ns()
+                stages = metrics.stages(symbol)
+                stages.upstream.record(received + metrics.wall_offset_ns - record.ts_event - self._bar_ns)
+                events = self._to_event(record, symbol)
+                stages.normalize.record(time.perf_counter_ns() - received)
+                for event in events:
+                    event[RECEIVED_KEY] = received
+                    self._publish(symbol, event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e)
+            logger.error(f"❌ Live session for {self.dataset} failed: {error}")
+
+        # Connection is gone: reconnect in the background and resubscribe whatever is still routed
+        self.disconnects += 1
+        self._reset()
+        if self._channels:
+            self._reconnecting = asyncio.create_task(self._reconnect(error), name=f"live-reconnect:{self.dataset}")
+
+    async def _reconnect(self, error: str):
+        delay = settings.LIVE_RECONNECT_SECONDS
+        while True:
+            logger.warning(f"⚠️ Live session for {self.dataset} dropped ({error}); reconnecting in {delay:g}s")
+            await asyncio.sleep(delay)
+            async with self._lock:
+                symbols = list(self._channels)
+                if not symbols:
+                    return
+                self._to_subscribe.clear()
+                if await self._subscribe(symbols, drop=False):
+                    break
+            error = "resubscribe failed"
+            delay = min(delay * 2, 30.0)
+        self._reconnecting = None
+        self.reconnects += 1
+        logger.info(f"🔁 Live session for {self.dataset} back with {len(self._subscribed)} symbols")
+        # Symbols added while the resubscribe was in flight
+        self.add(())
+
+    def stats(self) -> Dict:
+        return {
+            "dataset": self.dataset,
+            "schema": self.schema,
+            "running": self.is_running,
+            "symbols": len(self._channels),
+            "subscribed": len(self._subscribed),
+            "queued": sum(q.qsize() for queues in self._channels.values() for q in queues),
+            "records": self.records,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "reconnecting": self._reconnecting is not None and not self._reconnecting.done(),
+            "disconnects": self.disconnects,
+        }
+
+    def _map_instrument(self, record):
+        # stype_in_symbol is what we subscribed with (e.g. ES.c.0), stype_out_symbol the contract (ESZ6)
+        symbol = getattr(record, "stype_in_symbol", None) or record.stype_out_symbol
+        self._instruments[record.instrument_id] = symbol
+        logger.info(f"🔗 {self.dataset}: instrument {record.instrument_id} -> {symbol} ({record.stype_out_symbol})")
+
+    def _reset(self):
+        client, self._client = self._client, None
+        if self._clock is not None:
+            self._clock.cancel()
+            self._clock = None
+        self._subscribed.clear()
+        self._instruments.clear()
+        if client is not None:
+            with suppress(Exception):
+                client.terminate()
+
+    async def close(self):
+        for task in (self._flush, self._reconnecting, self._reader):
+            if task is not None and not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+        self._reset()
+        for symbol in list(self._channels):
+            self.remove(symbol)
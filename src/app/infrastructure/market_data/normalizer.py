@@ -0,0 +1,230 @@
+import re
+from typing import Dict, List, Optional
+import numpy as np
+
+_INTERVAL_RE = re.compile(r"^(\d+)([smhd])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(interval: str) -> int:
+    """'1s' -> 1, '5m' -> 300, '4h' -> 14400, '1d' -> 86400"""
+    match = _INTERVAL_RE.match(interval)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid interval '{interval}'. Expected e.g. 30s, 5m, 4h, 1d")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def bucket_start(timestamps, seconds: int, origin: int = 0):
+    """
+    Start of the bar containing each timestamp. Works on scalars and NumPy arrays.
+    `origin` shifts the grid, e.g. origin=22*3600 aligns 1d bars to a 22:00 UTC session open.
+    """
+    return timestamps - (timestamps - origin) % seconds
+
+
+class BarResampler:
+    """
+    Incremental OHLCV resampler for one target interval.
+
+    Feed it base bars (1s / 1m, keyed by bar OPEN time) with `update`; it keeps
+    the rolling bar for the current bucket and returns events:
+      - the finished previous bar ("final": True) when a new bucket starts
+      - the current bar ("final": False) as a partial update
+    If `base_seconds` is given, a bucket is finalized as soon as the base bar
+    that completes it arrives, instead of waiting for the next bucket's first bar.
+    History goes through `resample_columns`, which uses the same bucket grid.
+    """
+    __slots__ = ("interval", "seconds", "origin", "base_seconds",
+                 "_start", "_closed", "_open", "_high", "_low", "_close", "_volume")
+
+    def __init__(self, interval: str, origin: int = 0, base_seconds: Optional[float] = None):
+        self.interval = interval
+        self.seconds = parse_interval(interval)
+        self.origin = origin
+        self.base_seconds = base_seconds
+        self._start: Optional[int] = None
+        self._closed: Optional[int] = None  # start of the last finalized bucket
+        self._open = self._high = self._low = self._close = 0.0
+        self._volume = 0
+
+    def _event(self, final: bool) -> Dict:
+        return {
+            "interval": self.interval,
+            "timestamp": self._start,
+            "open": self._open,
+            "high": self._high,
+            "low": self._low,
+            "close": self._close,
+            "volume": self._volume,
+            "final": final
+        }
+
+    def update(self, bar: Dict) -> List[Dict]:
+        """Ingests one base bar. Live bars carry 'price' instead of 'close' and may lack volume."""
+        ts = int(bar["timestamp"])
+        close = bar["close"] if "close" in bar else bar["price"]
+        volume = bar.get("volume", 0) or 0
+        start = bucket_start(ts, self.seconds, self.origin)
+        events = []
+
+        if self._closed is not None and start <= self._closed:
+            # Late bar for an already-closed bucket: ignore
+            return events
+        if self._start is not None and start != self._start:
+            if start < self._start:
+                return events
+            events.append(self._close_bucket())
+
+        if self._start is None:
+            self._start = start
+            self._open = bar["open"]
+            self._high = bar["high"]
+            self._low = bar["low"]
+            self._volume = 0
+        else:
+            if bar["high"] > self._high:
+                self._high = bar["high"]
+            if bar["low"] < self._low:
+                self._low = bar["low"]
+        self._close = close
+        self._volume += volume
+
+        # Float timestamp: sub-second base bars (tick mode) complete on e.g. 59.75 + 0.25
+        complete = self.base_seconds is not None and float(bar["timestamp"]) + self.base_seconds >= start + self.seconds
+        events.append(self._close_bucket() if complete else self._event(final=False))
+        return events
+
+    def _close_bucket(self) -> Dict:
+        event = self._event(final=True)
+        self._closed = self._start
+        self._start = None
+        return event
+
+
+class TickBarBuilder:
+    """
+    Builds bars of `seconds` (sub-second allowed, e.g. 0.25) from individual trades.
+
+    Hot path works on integer nanoseconds and fixed-point prices straight off
+    the DBN records; dicts are only built for emitted events, which use the same
+    shape as `BarResampler` events. A bucket is finalized by the first trade of a
+    later bucket, or by `expire` once the wall clock is past its end. Partial
+    updates are rate limited to `partial_hz`; `expire` also flushes the last
+    throttled one so the final price of a quiet period is never held back.
+    """
+    __slots__ = ("interval", "bucket_ns", "partial_ns", "grace_ns", "price_scale",
+                 "_start", "_open", "_high", "_low", "_close", "_volume", "_trades",
+                 "_last_partial", "_dirty", "bid", "ask", "bid_size", "ask_size")
+
+    def __init__(self, seconds: float, partial_hz: float = 4.0, grace_seconds: float = 0.25, price_scale: float = 1e9):
+        self.interval = f"{int(seconds * 1000)}ms" if seconds < 1 else f"{int(seconds)}s"
+        self.bucket_ns = int(round(seconds * 1e9))
+        self.partial_ns = int(1e9 / partial_hz) if partial_hz > 0 else 0
+        self.grace_ns = int(grace_seconds * 1e9)
+        self.price_scale = price_scale
+        self._start: Optional[int] = None
+        self._open = self._high = self._low = self._close = 0
+        self._volume = 0
+        self._trades = 0
+        self._last_partial = 0
+        self._dirty = False
+        # Top of book (mbp-1 feeds), attached to every event
+        self.bid = self.ask = None
+        self.bid_size = self.ask_size = None
+
+    def _event(self, final: bool) -> Dict:
+        scale = self.price_scale
+        event = {
+            "interval": self.interval,
+            "timestamp": self._start / 1e9,
+            "open": self._open / scale,
+            "high": self._high / scale,
+            "low": self._low / scale,
+            "close": self._close / scale,
+            "volume": self._volume,
+            "trades": self._trades,
+            "final": final
+        }
+        if self.bid is not None:
+            event["bid"] = self.bid / scale
+            event["ask"] = self.ask / scale
+            event["bidSize"] = self.bid_size
+            event["askSize"] = self.ask_size
+        return event
+
+    def quote(self, bid: int, ask: int, bid_size: int, ask_size: int):
+        self.bid, self.ask, self.bid_size, self.ask_size = bid, ask, bid_size, ask_size
+
+    def trade(self, ts_ns: int, price: int, size: int) -> List[Dict]:
+        start = ts_ns - ts_ns % self.bucket_ns
+        events = []
+        current = self._start
+        if current is not None and start != current:
+            if start < current:
+                # Late print for a bucket we already moved past
+                return events
+            events.append(self._close_bucket())
+            current = None
+
+        if current is None:
+            self._start = start
+            self._open = self._high = self._low = price
+            self._volume = 0
+            self._trades = 0
+        elif price > self._high:
+            self._high = price
+        elif price < self._low:
+            self._low = price
+        self._close = price
+        self._volume += size
+        self._trades += 1
+
+        if ts_ns - self._last_partial >= self.partial_ns:
+            self._last_partial = ts_ns
+            self._dirty = False
+            events.append(self._event(final=False))
+        else:
+            self._dirty = True
+        return events
+
+    def _close_bucket(self) -> Dict:
+        event = self._event(final=True)
+        self._start = None
+        self._dirty = False
+        return event
+
+    def expire(self, now_ns: int) -> List[Dict]:
+        """Called on a timer: closes a bucket nobody traded past, flushes a throttled partial"""
+        if self._start is None:
+            return []
+        if now_ns >= self._start + self.bucket_ns + self.grace_ns:
+            return [self._close_bucket()]
+        if self._dirty and now_ns - self._last_partial >= self.partial_ns:
+            self._last_partial = now_ns
+            self._dirty = False
+            return [self._event(final=False)]
+        return []
+
+
+def resample_columns(columns: Dict[str, np.ndarray], seconds: int, origin: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Vectorized history resampling over normalized columns
+    (timestamps/open/high/low/close/volume, sorted by time).
+    The last bucket may be partial, exactly like the live resampler's current bar.
+    """
+    ts = np.asarray(columns["timestamps"], dtype=np.int64)
+    if len(ts) == 0:
+        return {name: np.asarray(columns[name])[:0] for name in ("timestamps", "open", "high", "low", "close", "volume")}
+
+    buckets = bucket_start(ts, seconds, origin)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+
+    return {
+        "timestamps": buckets[starts],
+        "open": np.asarray(columns["open"], dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(np.asarray(columns["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(columns["low"], dtype=np.float64), starts),
+        "close": np.asarray(columns["close"], dtype=np.float64)[ends],
+        "volume": np.add.reduceat(np.asarray(columns["volume"], dtype=np.int64), starts),
+    }
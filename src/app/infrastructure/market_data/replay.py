@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+import databento_dbn
+import numpy as np
+from src.app.infrastructure.market_data.bar_store import COLUMNS, BarStore, pyarrow_modules
+
+logger = logging.getLogger("replay")
+
+FIXED_PRICE_SCALE = 1e9
+
+# Finest first: replaying 1s bars exercises more of the pipeline than 1m
+_STORE_SCHEMAS = ("ohlcv-1s", "ohlcv-1m", "ohlcv-1h", "ohlcv-1d")
+_DBN_SUFFIXES = (".dbn", ".dbn.zst")
+_DBN_SCHEMAS = ("ohlcv-1s", "ohlcv-1m", "ohlcv-1h", "ohlcv-1d", "trades", "mbp-1")
+
+# Yield to the event loop this often when replaying as fast as possible
+_YIELD_EVERY = 256
+
+
+def _dbn_symbol(filename: str) -> Optional[str]:
+    """'ES.c.0.dbn.zst' / 'ES.c.0.trades.dbn' -> 'ES.c.0'; None for non-DBN files"""
+    for suffix in _DBN_SUFFIXES[::-1]:
+        if filename.endswith(suffix):
+            stem = filename[:-len(suffix)]
+            base, _, schema = stem.rpartition(".")
+            return base if schema in _DBN_SCHEMAS else stem
+    return None
+
+
+@dataclass
+class Recording:
+    """
+    One symbol's recorded session.
+    kind "bars": normalized OHLCV `columns` (Parquet, bar store or DBN ohlcv-*)
+    kind "records": a DBN trades / mbp-1 file replayed record by record
+    """
+    symbol: str
+    dataset: str
+    kind: str
+    source: str
+    columns: Optional[Dict[str, np.ndarray]] = None
+    path: Optional[Path] = None
+    base_seconds: Optional[float] = None
+
+
+class _Pacer:
+    """Sleeps so that recorded time advances `speed` x faster than the wall clock (0 = no sleeping)"""
+    __slots__ = ("speed", "_origin", "_wall", "_count")
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self._origin: Optional[float] = None
+        self._wall = 0.0
+        self._count = 0
+
+    async def wait(self, ts: float):
+        if self.speed <= 0:
+            self._count += 1
+            if self._count % _YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            return
+        if self._origin is None:
+            self._origin = ts
+            self._wall = time.monotonic()
+            return
+        delay = self._wall + (ts - self._origin) / self.speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ReplayEngine:
+    """
+    Market data source for simulation mode.
+
+    For each symbol it looks for a recording, in order:
+      1. <root>/<symbol>.parquet           (bar store column layout)
+      2. <root>/<symbol>[.<schema>].dbn[.zst]  (ohlcv-* bars, or trades / mbp-1 records)
+      3. the local bar store               (whatever history was fetched before)
+    Bar recordings are split: the first `warmup_bars` serve `get_history`
+    (strategy warmup), the rest are streamed. Playback runs at `speed` x
+    real time (1 = real time, 10 = 10x, 0 = as fast as possible) and uses the
+    recorded timestamps, so a run is reproducible bar for bar.
+
+    Symbols without a recording get a synthetic random walk seeded by
+    (seed, symbol). Synthetic history ends at a per-symbol price and the
+    stream starts there, so both depend on (seed, symbol) only, never on
+    which history was asked for first.
+    """
+    def __init__(
+        self,
+        root: Path,
+        speed: float = 1.0,
+        seed: int = 0,
+        warmup_bars: int = 500,
+        bar_store: Optional[BarStore] = None,
+        dataset_for: Optional[Callable[[str], str]] = None
+    ):
+        self.root = Path(root)
+        self.speed = speed
+        self.seed = seed
+        self.warmup_bars = warmup_bars
+        self.bar_store = bar_store
+        self.dataset_for = dataset_for or (lambda symbol: "REPLAY")
+        self._recordings: Dict[str, Optional[Recording]] = {}
+
+    # --- recordings ---
+    def recording(self, symbol: str) -> Optional[Recording]:
+        if symbol not in self._recordings:
+            try:
+                self._recordings[symbol] = self._load(symbol)
+            except Exception as e:
+                logger.error(f"❌ Failed to load recording for {symbol}: {e}")
+                self._recordings[symbol] = None
+            recording = self._recordings[symbol]
+            if recording is not None:
+                logger.info(f"📼 {symbol}: replaying {recording.kind} from {recording.source}")
+        return self._recordings[symbol]
+
+    def _load(self, symbol: str) -> Optional[Recording]:
+        parquet = self.root / f"{symbol}.parquet"
+        if parquet.exists():
+            _, pq = pyarrow_modules()
+            table = pq.read_table(parquet, columns=list(COLUMNS))
+            columns = {name: table.column(name).to_numpy() for name in COLUMNS}
+            return self._bars(symbol, self.dataset_for(symbol), columns, str(parquet))
+
+        if self.root.is_dir():
+            for path in sorted(self.root.iterdir()):
+                if _dbn_symbol(path.name) == symbol:
+                    return self._load_dbn(symbol, path)
+
+        if self.bar_store is not None:
+            dataset = self.dataset_for(symbol)
+            for schema in _STORE_SCHEMAS:
+                coverage = self.bar_store.coverage(dataset, symbol, schema)
+                if coverage is None:
+                    continue
+                columns = self.bar_store.read(dataset, symbol, schema, *coverage)
+                if len(columns["timestamps"]):
+                    return self._bars(symbol, dataset, columns, f"bar store {dataset}/{schema}")
+        return None
+
+    def _load_dbn(self, symbol: str, path: Path) -> Optional[Recording]:
+        import databento
+        store = databento.DBNStore.from_file(path)
+        schema = str(store.schema)
+        dataset = store.dataset or self.dataset_for(symbol)
+        if schema.startswith("ohlcv"):
+            raw = store.to_ndarray()
+            columns = {
+                "timestamps": raw["ts_event"].astype(np.int64) // 1_000_000_000,
+                "open": raw["open"] / FIXED_PRICE_SCALE,
+                "high": raw["high"] / FIXED_PRICE_SCALE,
+                "low": raw["low"] / FIXED_PRICE_SCALE,
+                "close": raw["close"] / FIXED_PRICE_SCALE,
+                "volume": raw["volume"].astype(np.int64),
+            }
+            return self._bars(symbol, dataset, columns, str(path))
+        if schema in ("trades", "mbp-1"):
+            return Recording(symbol, dataset, "records", str(path), path=path)
+        logger.warning(f"⚠️ Unsupported replay schema {schema} in {path.name}")
+        return None
+
+    @staticmethod
+    def _bars(symbol: str, dataset: str, columns: Dict[str, np.ndarray], source: str) -> Optional[Recording]:
+        order = np.argsort(columns["timestamps"], kind="stable")
+        columns = {name: np.asarray(columns[name])[order] for name in COLUMNS}
+        if len(order) == 0:
+            return None
+        steps = np.diff(columns["timestamps"])
+        base = float(np.median(steps)) if len(steps) else 60.0
+        return Recording(symbol, dataset, "bars", source, columns=columns, base_seconds=base)
+
+    def base_seconds(self, symbol: str) -> Optional[float]:
+        """Bar size the replayed stream will produce (None for tick recordings / synthetic)"""
+        recording = self.recording(symbol)
+        return recording.base_seconds if recording is not None else None
+
+    def history(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        """The warmup part of a bar recording (bars before the replay starts)"""
+        recording = self.recording(symbol)
+        if recording is None or recording.kind != "bars":
+            return None
+        return {name: recording.columns[name][:self.warmup_bars] for name in COLUMNS}
+
+    # --- playback ---
+    async def bars(self, recording: Recording):
+        """Replays the recorded bars after the warmup window in stream format"""
+        columns = recording.columns
+        pacer = _Pacer(self.speed)
+        ts, o, h, l, c, v = (columns[name].tolist() for name in COLUMNS)
+        for i in range(min(self.warmup_bars, len(ts)), len(ts)):
+            await pacer.wait(ts[i])
+            yield {
+                "symbol": recording.symbol,
+                "price": c[i],
+                "open": o[i],
+                "high": h[i],
+                "low": l[i],
+                "volume": v[i],
+                "timestamp": ts[i],
+                "dataset": recording.dataset
+            }
+        logger.info(f"🏁 Replay of {recording.symbol} finished ({len(ts)} bars)")
+
+    async def records(self, recording: Recording):
+        """Replays DBN records (trades / mbp-1) paced by ts_event"""
+        pacer = _Pacer(self.speed)
+        count = 0
+        for record in self._iter_records(recording.path):
+            ts_event = getattr(record, "ts_event", None)
+            if ts_event is None or isinstance(record, (databento_dbn.SymbolMappingMsg, databento_dbn.SystemMsg)):
+                continue
+            await pacer.wait(ts_event / 1e9)
+            count += 1
+            yield record
+        logger.info(f"🏁 Replay of {recording.symbol} finished ({count} records)")
+
+    @staticmethod
+    def _iter_records(path: Path) -> Iterator:
+        import databento
+        return iter(databento.DBNStore.from_file(path))
+
+    # --- synthetic fallback ---
+    def _base_price(self, symbol: str) -> float:
+        return round(20 + random.Random(f"{self.seed}:{symbol}").random() * 480, 2)
+
+    def synthetic_history(self, symbol: str, seconds: int, count: int) -> Dict[str, np.ndarray]:
+        """`count` bars of `seconds` ending now at the symbol's base price (where `synthetic` starts);
+        same seed + symbol + interval -> same prices"""
+        rng = np.random.default_rng(random.Random(f"{self.seed}:{symbol}:{seconds}").getrandbits(64))
+        walk = np.cumsum((rng.random(count) - 0.5) * 2.0)
+        if count:
+            walk -= walk[-1]
+        close = np.maximum(np.round(self._base_price(symbol) + walk, 2), 0.01)
+        now = int(time.time())
+        timestamps = (now - now % seconds) - seconds * np.arange(count - 1, -1, -1, dtype=np.int64)
+        return {
+            "timestamps": timestamps,
+            "open": np.round(close - 0.1, 2),
+            "high": np.round(close + 0.2, 2),
+            "low": np.round(close - 0.2, 2),
+            "close": close,
+            "volume": rng.integers(100, 5000, count, dtype=np.int64),
+        }
+
+    async def synthetic(self, symbol: str):
+        """Seeded random walk of 1s bars, paced like a recording"""
+        rng = random.Random(f"{self.seed}:{symbol}:stream")
+        price = self._base_price(symbol)
+        pacer = _Pacer(self.speed)
+        ts = float(int(time.time()))
+        await pacer.wait(ts)  # start the clock: the first bar is one step away
+        while True:
+            ts += 1.0
+            await pacer.wait(ts)
+            price = max(price + (rng.random() - 0.5) * 1.0, 0.01)
+
+            # Send full candle structure for consistency
+            yield {
+                "symbol": symbol,
+                "price": round(price, 2),
+                "open": round(price, 2),
+                "high": round(price + 0.05, 2),
+                "low": round(price - 0.05, 2),
+                "timestamp": ts,
+                "dataset": "SIMULATION"
+            }
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.app.core.config import settings
+from src.app.domain.services.scanner import UTBotScanner
+from src.app.infrastructure.market_data.bar_bus import BarBusClient, BusCallError, streams
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.stream_hub import (
+    DEFAULT_ATR_MULTIPLIER, DEFAULT_ATR_PERIOD, StreamHub, stream_hub
+)
+from src.app.infrastructure.websockets.manager import ws_manager
+
+logger = logging.getLogger("scanner_feed")
+
+# WebSocket broadcast group for flips
+SCANNER_CHANNEL = "scanner"
+
+# History the grid is warmed from; every scanner timeframe is built from it
+HISTORY_INTERVAL = "1m"
+HISTORY_SECONDS = 60
+
+# (timestamp, open, high, low, close)
+BarTuple = Tuple[float, float, float, float, float]
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class ScannerFeed:
+    """
+    Drives the watchlist `UTBotScanner` from the StreamHub.
+
+    Holds one hub subscription per symbol, warms every symbol's cells from its
+    1m history, and listens for completed upstream bars. Bars are collected for
+    `batch_seconds` and then applied in as few vectorized updates as possible
+    (one per round of distinct symbols); only cells that flipped are broadcast
+    on the "scanner" channel, as {"type": "flips", "flips": [...]}.
+    Bars that arrive while a symbol is warming are held and applied after.
+
+    Behind a bar bus it runs in the ingest process on the bus's hub, with the
+    bus as `manager`: flips are relayed to every worker like bars, and workers
+    fetch the snapshot and stats through `handlers` (see `scanner_state`).
+    """
+    def __init__(self, symbols: List[str], timeframes: List[str], hub: StreamHub = stream_hub,
+                 market_data=market_data_client, manager=ws_manager, batch_seconds: float = 0.005):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.timeframes = timeframes
+        self.hub = hub
+        self.market_data = market_data
+        self.manager = manager
+        self.batch_seconds = batch_seconds
+        self.scanner = UTBotScanner(
+            timeframes, DEFAULT_ATR_PERIOD, DEFAULT_ATR_MULTIPLIER, hub.smoothing,
+            origin=settings.SESSION_ORIGIN_SECONDS, capacity=max(len(self.symbols), 1)
+        )
+        self._base_seconds = np.zeros(0)
+        self._pending: List[Tuple[int, BarTuple]] = []
+        # symbol -> bars received before its cells were warm
+        self._held: Dict[str, List[BarTuple]] = {}
+        self._subscribed: List[str] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._warmup: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.bars = 0
+        self.flips = 0
+        self.last_update_ms = 0.0
+        self.max_update_ms = 0.0
+
+    @classmethod
+    def from_settings(cls, hub: StreamHub = stream_hub, manager=ws_manager) -> "ScannerFeed":
+        return cls(
+            _csv(settings.SCANNER_SYMBOLS),
+            _csv(settings.SCANNER_TIMEFRAMES),
+            hub=hub,
+            manager=manager,
+            batch_seconds=settings.SCANNER_BATCH_MS / 1000
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.symbols)
+
+    @property
+    def handlers(self) -> Dict:
+        """Served on the bar bus as "scanner.snapshot" / "scanner.stats" """
+        async def snapshot() -> Dict:
+            return self.snapshot()
+
+        async def stats() -> Dict:
+            return self.stats()
+        return {"scanner.snapshot": snapshot, "scanner.stats": stats}
+
+    # --- lifecycle ---
+    async def start(self):
+        """Subscribes every symbol and warms the grid in the background"""
+        if not self.symbols or self._task is not None:
+            return
+        for symbol in self.symbols:
+            self.scanner.add(symbol)
+            self._held[symbol] = []
+        self._base_seconds = np.array([self.market_data.stream_base_seconds(s) for s in self.symbols], dtype=np.float64)
+        self._wakeup = asyncio.Event()
+        self.hub.listeners.append(self._on_bar)
+        self._task = asyncio.create_task(self._run(), name="scanner")
+        self._warmup = asyncio.create_task(self._warm_all(), name="scanner-warmup")
+        logger.info(f"🛰️ Scanner on {len(self.symbols)} symbols x {', '.join(self.timeframes)}")
+
+    async def stop(self):
+        for task in (self._warmup, self._task):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+        self._warmup = self._task = None
+        if self._on_bar in self.hub.listeners:
+            self.hub.listeners.remove(self._on_bar)
+        subscribed, self._subscribed = self._subscribed, []
+        for symbol in subscribed:
+            await self.hub.unsubscribe(symbol)
+
+    # --- warmup ---
+    async def _warm_all(self):
+        started = time.perf_counter()
+        # Bounded: a 1000-symbol watchlist would otherwise open 1000 upstream subscriptions and history loads at once
+        limit = asyncio.Semaphore(max(1, settings.SCANNER_WARMUP_CONCURRENCY))
+
+        async def warm(symbol: str):
+            async with limit:
+                await self._warm(symbol)
+
+        results = await asyncio.gather(*(warm(symbol) for symbol in self.symbols), return_exceptions=True)
+        failed = 0
+        for symbol, result in zip(self.symbols, results):
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error(f"❌ Scanner warmup failed for {symbol}: {result}")
+        logger.info(f"✅ Scanner warmed {len(self.symbols) - failed} symbols in {time.perf_counter() - started:.2f}s")
+
+    async def _warm(self, symbol: str):
+        # Subscribe first so no live bar is missed; the ones history already covers are ignored
+        await self.hub.subscribe(symbol)
+        self._subscribed.append(symbol)
+        try:
+            history = await self.market_data.get_history(symbol, interval=HISTORY_INTERVAL, columnar=True)
+            if len(history["timestamps"]):
+                self.scanner.prime_history(symbol, history, HISTORY_SECONDS)
+        finally:
+            row = self.scanner.index(symbol)
+            held = self._held.pop(symbol, [])
+            self._pending.extend((row, bar) for bar in held)
+            if held:
+                self._wakeup.set()
+
+    # --- live ---
+    def _on_bar(self, symbol: str, bar: Dict):
+        row = self.scanner.index(symbol)
+        if row is None:
+            return
+        item = (bar["timestamp"], bar["open"], bar["high"], bar["low"], bar.get("close", bar.get("price")))
+        held = self._held.get(symbol)
+        if held is not None:
+            held.append(item)
+            return
+        self._pending.append((row, item))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let the rest of this minute's bars land in the same batch
+            await asyncio.sleep(self.batch_seconds)
+            self._wakeup.clear()
+            pending, self._pending = self._pending, []
+            flips = self.process(pending)
+            if flips:
+                await self.manager.broadcast(SCANNER_CHANNEL, {"type": "flips", "flips": flips})
+
+    def process(self, pending: List[Tuple[int, BarTuple]]) -> List[Dict]:
+        """Applies queued bars in rounds of distinct symbols, oldest first per symbol"""
+        if not pending:
+            return []
+        started = time.perf_counter()
+        flips: List[Dict] = []
+        count = len(pending)
+        while pending:
+            seen = set()
+            batch, rest = [], []
+            for entry in pending:
+                if entry[0] in seen:
+                    rest.append(entry)
+                else:
+                    seen.add(entry[0])
+                    batch.append(entry)
+            pending = rest
+            rows = np.fromiter((row for row, _ in batch), dtype=np.int64, count=len(batch))
+            ts, opens, high, low, close = np.array([bar for _, bar in batch], dtype=np.float64).T
+            flips += self.scanner.update(rows, ts, opens, high, low, close, self._base_seconds[rows])
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.bars += count
+        self.flips += len(flips)
+        self.last_update_ms = elapsed
+        self.max_update_ms = max(self.max_update_ms, elapsed)
+        return flips
+
+    # --- queries ---
+    def snapshot(self) -> Dict:
+        """Every warm cell's position/stop, sent to a client before its first flips"""
+        return {"type": "snapshot", "timeframes": self.timeframes, "cells": self.scanner.snapshot()}
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self.symbols),
+            "timeframes": self.timeframes,
+            "warming": len(self._held),
+            "batches": self.batches,
+            "bars": self.bars,
+            "flips": self.flips,
+            "last_update_ms": round(self.last_update_ms, 3),
+            "max_update_ms": round(self.max_update_ms, 3),
+        }
+
+
+async def scanner_state(name: str) -> Optional[Dict]:
+    """
+    `snapshot` or `stats` of the scanner this process serves: its own, or with STREAM_BUS
+    set, the ingest process's. None when the scanner is off or the ingest process is unreachable.
+    """
+    if isinstance(streams, BarBusClient):
+        try:
+            return await streams.call(f"scanner.{name}")
+        except BusCallError:
+            return None
+    return getattr(scanner_feed, name)() if scanner_feed.enabled else None
+
+
+# Global Instance, started/stopped by the app lifespan (by the ingest process behind a bar bus)
+scanner_feed = ScannerFeed.from_settings()
@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import suppress
+from typing import Callable, Dict, List, Optional, Tuple
+from src.app.core.config import settings
+from src.app.core.metrics import RECEIVED_KEY, metrics
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.normalizer import BarResampler
+from src.app.infrastructure.websockets.manager import ws_manager
+from src.app.domain.services.risk import risk_engine
+from src.app.domain.services.strategy_registry import strategy_registry
+from src.app.domain.services.utbot import SMOOTHING_MODES
+
+logger = logging.getLogger("stream_hub")
+
+DEFAULT_ATR_PERIOD = 10
+DEFAULT_ATR_MULTIPLIER = 1.0
+
+# Failed strategy warmups are retried after this many seconds, doubling up to the max
+WARMUP_RETRY_SECONDS = 1.0
+WARMUP_RETRY_MAX_SECONDS = 60.0
+
+# (interval, atr_period, atr_multiplier) - one channel per view of a symbol
+ViewKey = Tuple[Optional[str], int, float]
+
+# Called with (symbol, bar) for every completed upstream bar; must not block or mutate the bar
+BarListener = Callable[[str, Dict], None]
+
+
+def channel_key(
+    symbol: str,
+    interval: Optional[str] = None,
+    atr_period: int = DEFAULT_ATR_PERIOD,
+    atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+) -> str:
+    """
+    WebSocket broadcast group: 'TSLA' for raw upstream bars, 'TSLA@5m' for resampled ones.
+    Non-default UTBot parameters get a suffix: 'TSLA@5m#14x2.5'.
+    """
+    key = symbol if interval is None else f"{symbol}@{interval}"
+    if atr_period != DEFAULT_ATR_PERIOD or atr_multiplier != DEFAULT_ATR_MULTIPLIER:
+        key = f"{key}#{atr_period}x{atr_multiplier:g}"
+    return key
+
+
+class _Channel:
+    """One (symbol, interval, UTBot params) view of an upstream stream"""
+    __slots__ = ("key", "strategy_key", "symbol", "interval", "subscribers",
+                 "resampler", "ready", "pending", "warmup")
+
+    def __init__(self, symbol: str, view: ViewKey, base_seconds: float, smoothing: str):
+        interval, atr_period, atr_multiplier = view
+        self.key = channel_key(symbol, interval, atr_period, atr_multiplier)
+        self.strategy_key = (symbol, interval, atr_period, atr_multiplier, smoothing)
+        self.symbol = symbol
+        self.interval = interval
+        self.subscribers = 0
+        self.resampler = BarResampler(interval, settings.SESSION_ORIGIN_SECONDS, base_seconds) if interval else None
+        self.ready = False
+        # Events that arrive while the strategy is still warming up (the newest LIVE_CHANNEL_SIZE)
+        self.pending: deque = deque(maxlen=settings.LIVE_CHANNEL_SIZE)
+        self.warmup: Optional[asyncio.Task] = None
+
+
+class StreamHub:
+    """
+    Runs exactly ONE upstream `start_stream` loop per symbol and fans every bar
+    out to all WebSocket clients watching that symbol.
+
+    Each symbol can be viewed through several channels: the raw upstream bars
+    plus any resampled timeframe (5m, 15m, 4h...) built in-process from the
+    same stream, so every timeframe costs a single upstream subscription.
+    Channel strategies live in the shared `strategy_registry`, all with the
+    hub's ATR `smoothing` (UTBOT_SMOOTHING).
+
+    Streams are reference counted: the first subscriber starts the loop,
+    the last one to leave tears it down. Pre-warmed views hold a subscription
+    of their own, so hot symbols keep streaming with nobody watching. `listeners` see every completed
+    upstream bar of every stream (e.g. the watchlist scanner).
+    """
+    def __init__(self, market_data=market_data_client, manager=ws_manager, registry=strategy_registry,
+                 smoothing: str = settings.UTBOT_SMOOTHING):
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown ATR smoothing '{smoothing}'. Expected one of {SMOOTHING_MODES}")
+        self.market_data = market_data
+        self.manager = manager
+        self.registry = registry
+        self.smoothing = smoothing
+
+        # {"TSLA": <Task stream:TSLA>}
+        self._streams: Dict[str, asyncio.Task] = {}
+        # {"TSLA": {(None, 10, 1.0): <raw channel>, ("5m", 10, 1.0): <5m channel>}}
+        self._channels: Dict[str, Dict[ViewKey, _Channel]] = {}
+        self._lock = asyncio.Lock()
+        # (symbol, interval) views subscribed by `prewarm`, kept until shutdown
+        self._pinned: List[Tuple[str, Optional[str]]] = []
+        self.listeners: List[BarListener] = []
+
+    def subscriber_count(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        channel = self._channels.get(symbol, {}).get((interval, atr_period, atr_multiplier))
+        return channel.subscribers if channel else 0
+
+    @property
+    def active_symbols(self) -> list:
+        return list(self._streams.keys())
+
+    def stats(self) -> Dict:
+        channels = [channel for views in self._channels.values() for channel in views.values()]
+        return {
+            "streams": len(self._streams),
+            "channels": len(channels),
+            "subscribers": sum(channel.subscribers for channel in channels),
+            "warming": sum(1 for channel in channels if not channel.ready),
+        }
+
+    async def subscribe(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        """Registers one subscriber, starting the upstream loop if it is the first."""
+        view = (interval, atr_period, float(atr_multiplier))
+        async with self._lock:
+            channels = self._channels.setdefault(symbol, {})
+            channel = channels.get(view)
+            if channel is None:
+                channel = _Channel(symbol, view, self.market_data.stream_base_seconds(symbol), self.smoothing)
+                self.registry.acquire(channel.strategy_key, self._history_loader(symbol, interval))
+                channel.warmup = asyncio.create_task(self._warm(channel), name=f"warmup:{channel.key}")
+                channels[view] = channel
+            channel.subscribers += 1
+
+            if symbol not in self._streams:
+                logger.info(f"📡 First subscriber for {symbol}. Starting upstream stream.")
+                task = asyncio.create_task(self._run(symbol), name=f"stream:{symbol}")
+                task.add_done_callback(lambda t, s=symbol: self._on_stream_done(s, t))
+                self._streams[symbol] = task
+            return channel.subscribers
+
+    async def unsubscribe(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> int:
+        """Releases one subscriber, cancelling the upstream loop when none are left."""
+        view = (interval, atr_period, float(atr_multiplier))
+        tasks = []
+        async with self._lock:
+            channels = self._channels.get(symbol, {})
+            channel = channels.get(view)
+            if channel is None:
+                return 0
+            channel.subscribers -= 1
+            if channel.subscribers > 0:
+                return channel.subscribers
+
+            del channels[view]
+            if channel.warmup is not None:
+                tasks.append(channel.warmup)
+            if not channels:
+                self._channels.pop(symbol, None)
+                task = self._streams.pop(symbol, None)
+                if task is not None:
+                    logger.info(f"🔌 Last subscriber left {symbol}. Stopping upstream stream.")
+                    tasks.append(task)
+
+        for task in tasks:
+            await self._cancel(task)
+        await self.registry.release(channel.strategy_key)
+        return 0
+
+    async def snapshot(
+        self,
+        symbol: str,
+        interval: Optional[str] = None,
+        atr_period: int = DEFAULT_ATR_PERIOD,
+        atr_multiplier: float = DEFAULT_ATR_MULTIPLIER
+    ) -> Optional[Dict]:
+        """Current bar + strategy state for a newly connected client, once warmed up"""
+        strategy_key = (symbol, interval, atr_period, float(atr_multiplier), self.smoothing)
+        try:
+            await self.registry.wait_ready(strategy_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return None
+        return self.registry.snapshot(strategy_key)
+
+    async def prewarm(self, symbols: List[str], intervals: Optional[List[Optional[str]]] = None):
+        """
+        Subscribes the default-parameter view of every (symbol, interval) and
+        waits for the strategies to warm in parallel. The subscriptions are held
+        until shutdown, so the upstream streams keep feeding the strategies and
+        the first client on a hot symbol gets an up-to-date snapshot straight away.
+        """
+        views = [(symbol, interval) for symbol in symbols for interval in (intervals or [None])]
+        for symbol, interval in views:
+            await self.subscribe(symbol, interval)
+            self._pinned.append((symbol, interval))
+        results = await asyncio.gather(*(
+            self.registry.wait_ready((symbol, interval, DEFAULT_ATR_PERIOD, DEFAULT_ATR_MULTIPLIER, self.smoothing))
+            for symbol, interval in views
+        ), return_exceptions=True)
+        for (symbol, interval), result in zip(views, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Pre-warm failed for {symbol}@{interval or 'raw'}: {result}")
+
+    async def shutdown(self):
+        """Cancels every running stream. Called from the app lifespan."""
+        async with self._lock:
+            tasks = list(self._streams.values())
+            channels = [c for views in self._channels.values() for c in views.values()]
+            tasks.extend(c.warmup for c in channels if c.warmup is not None)
+            self._streams.clear()
+            self._channels.clear()
+
+        for task in tasks:
+            await self._cancel(task)
+        for channel in channels:
+            await self.registry.release(channel.strategy_key)
+        self._pinned = []
+
+    def _on_stream_done(self, symbol: str, task: asyncio.Task):
+        # Forget streams that ended on their own so the next subscriber restarts them
+        if self._streams.get(symbol) is task:
+            del self._streams[symbol]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Stream for {symbol} crashed: {task.exception()}")
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task):
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+
+    def _history_loader(self, symbol: str, interval: Optional[str]):
+        return lambda: self.market_data.get_history(symbol, interval=interval or "1m", columnar=True)
+
+    async def _warm(self, channel: _Channel):
+        """
+        Waits for the shared strategy, then catches up on bars that arrived meanwhile.
+        A failed warmup is reported to the channel's clients and retried with backoff;
+        the bars held meanwhile are dropped, the reloaded history covers them.
+        """
+        delay = WARMUP_RETRY_SECONDS
+        while True:
+            try:
+                await self.registry.wait_ready(channel.strategy_key)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Warm-up failed for {channel.key}, retrying in {delay:g}s: {e}")
+                await self.manager.broadcast(channel.key, {"symbol": channel.symbol, "error": f"Strategy warm-up failed: {e}"})
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+                channel.pending.clear()
+                self.registry.retry(channel.strategy_key, self._history_loader(channel.symbol, channel.interval))
+        pending = list(channel.pending)
+        channel.pending.clear()
+        channel.ready = True
+        for event in pending:
+            await self.manager.broadcast(channel.key, self.registry.on_bar(channel.strategy_key, event))
+
+    async def _run(self, symbol: str):
+        # Live Loop: one upstream subscription, N channels, M clients per channel
+        clock = time.perf_counter_ns
+        stages = metrics.stages(symbol) if metrics.enabled else None
+        async for bar in self.market_data.start_stream(symbol):
+            if "error" in bar:
+                for channel in list(self._channels.get(symbol, {}).values()):
+                    await self.manager.broadcast(channel.key, bar)
+                return
+
+            received = bar.pop(RECEIVED_KEY, None)
+            started = None
+            if stages is None or received is None:
+                received = None
+            else:
+                # Hub entry doubles as the first strategy start (includes resampling)
+                started = clock()
+                stages.queue.record(started - received)
+
+            # Marks for pre-trade risk (fat-finger band, notional, unrealized PnL)
+            risk_engine.mark(symbol, bar.get("price", 0.0))
+            if self.listeners and bar.get("final", True):
+                for listener in self.listeners:
+                    listener(symbol, bar)
+            for channel in list(self._channels.get(symbol, {}).values()):
+                if channel.resampler is None:
+                    events = [dict(bar)]
+                elif not bar.get("final", True):
+                    # Partial tick-built bars would be double counted; resample completed ones
+                    continue
+                else:
+                    events = [
+                        {"symbol": symbol, "dataset": bar.get("dataset"), "price": e["close"], **e}
+                        for e in channel.resampler.update(bar)
+                    ]
+
+                for event in events:
+                    if not channel.ready:
+                        channel.pending.append(event)
+                        continue
+                    if received is None:
+                        await self.manager.broadcast(channel.key, self.registry.on_bar(channel.strategy_key, event))
+                        continue
+                    if started is None:
+                        started = clock()
+                    event = self.registry.on_bar(channel.strategy_key, event)
+                    ready = clock()
+                    stages.strategy.record(ready - started)
+                    started = None
+                    await self.manager.broadcast(channel.key, event, received, ready)
+
+
+# Global Instance, owned by the app lifespan
+stream_hub = StreamHub()
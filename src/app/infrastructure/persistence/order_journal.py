@@ -0,0 +1,418 @@
+"""
+Order Journal - append-only write-ahead log for the order pipeline.
+
+Every order writes a record per step, in order:
+    intent -> accepted / rejected (risk) -> sent -> acked / failed
+then, from the broker's order events, a fill record per fill (cumulative),
+a replaced record per accepted quantity change, and one final record
+(filled / canceled / rejected / expired).
+Records go into memory-mapped segment files (journal-<seq>.seg, pre-allocated
+to JOURNAL_SEGMENT_BYTES). An append is a single copy into the page cache.
+That survives a process crash as soon as it returns. Surviving a machine crash
+needs an msync; the commit task batches those every JOURNAL_COMMIT_INTERVAL_MS
+(group commit), so a burst of orders costs one flush.
+
+Record layout (little endian):
+    size u32 | crc32 u32 | type u8 | timestamp ns i64 | client order id 16 bytes | body
+The CRC covers everything after itself. A zero size marks the end of a
+segment, and a bad CRC marks a torn tail, so replay stops there.
+
+One process owns a journal directory at a time (an exclusive flock on
+journal.lock). On startup, after replay, the owner compacts everything so
+far into one snapshot (journal-<seq>.snap): the records of the orders still
+kept in memory plus a position record per symbol. Replay starts at the
+newest snapshot, so it only ever covers one run's worth of segments.
+"""
+
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections import deque
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+from src.app.core.config import settings
+
+logger = logging.getLogger("order_journal")
+
+REC_INTENT = 1
+REC_ACCEPTED = 2
+REC_REJECTED = 3
+REC_SENT = 4
+REC_ACKED = 5
+REC_FAILED = 6
+REC_FILL = 7
+REC_REPLACED = 8
+REC_FINAL = 9
+REC_POSITION = 10
+
+PREFIX = struct.Struct("<II")
+HEADER = struct.Struct("<Bq16s")
+RECORD_HEADER = struct.Struct("<IIBq16s")
+# signed quantity, reference price, signal ts, then symbol / account / idempotency key lengths
+INTENT = struct.Struct("<qdqHHH")
+# fill price, then broker order id length
+ACK = struct.Struct("<dH")
+# cumulative filled quantity, average fill price
+FILL = struct.Struct("<qd")
+# new order quantity
+REPLACED = struct.Struct("<q")
+# final broker state code, then reason length
+FINAL = struct.Struct("<BH")
+FINAL_STATES = ("filled", "canceled", "rejected", "expired")
+# filled shares, average price, realized PnL, mark, then symbol length (snapshots only)
+POSITION = struct.Struct("<qdddH")
+NO_ORDER = "00" * 16
+TEXT = struct.Struct("<H")
+MAX_TEXT = 512
+
+# (type, timestamp ns, client order id as 16 raw bytes, decoded body)
+Record = Tuple[int, int, bytes, object]
+
+
+def _text(value: Optional[str]) -> bytes:
+    return (value or "").encode()[:MAX_TEXT]
+
+
+def _seq(path: Path) -> int:
+    return int(path.stem.split("-")[1])
+
+
+class JournalLocked(RuntimeError):
+    """Another process owns the journal directory"""
+
+
+class OrderJournal:
+    """
+    Writer and reader for the order journal in `directory` (None = disabled,
+    every call is a no-op). `lock()`, replay with `replay()`, optionally
+    `compact()`, then `start()`. Each run appends to a new segment (created
+    exclusively), so a torn tail from a crash is never written over.
+    """
+    def __init__(self, directory: Optional[str] = None,
+                 segment_bytes: int = 64 * 1024 ** 2, commit_interval: float = 0.002):
+        self.directory = Path(directory) if directory else None
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self._fd: Optional[int] = None
+        self._path: Optional[Path] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._offset = 0
+        # Start of the not-yet-flushed range in the current segment
+        self._synced = 0
+        self._retired: List[Tuple[Path, int, mmap.mmap, int]] = []
+        self._segment = 0
+        self.appended = 0
+        self.durable = 0
+        self.commits = 0
+        self._waiters: deque = deque()
+        self._dirty: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._lock_fd: Optional[int] = None
+        # Set while compacting: records are collected here instead of the segment
+        self._sink: Optional[List[bytes]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._mm is not None
+
+    # --- lifecycle ---
+    def segments(self) -> List[Path]:
+        """What replay reads, oldest first: the newest snapshot and the segments written after it"""
+        if self.directory is None or not self.directory.exists():
+            return []
+        files = sorted(self._files(), key=_seq)
+        snapshots = [i for i, path in enumerate(files) if path.suffix == ".snap"]
+        return files[snapshots[-1]:] if snapshots else files
+
+    def _files(self) -> List[Path]:
+        return [path for path in self.directory.glob("journal-*") if path.suffix in (".seg", ".snap")]
+
+    def _last_seq(self) -> int:
+        return max((_seq(path) for path in self._files()), default=0)
+
+    def lock(self):
+        """Takes the directory for this process; raises JournalLocked if another process has it"""
+        if self.directory is None or self._lock_fd is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.directory / "journal.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise JournalLocked(f"Order journal {self.directory} is in use by another process")
+        self._lock_fd = fd
+
+    def _unlock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def compact(self, write: Callable[[], None]):
+        """
+        Replaces everything replayed so far with one snapshot. `write` re-appends
+        what is still needed through the usual record methods (and `position`).
+        The snapshot is complete on disk before any older file is removed, and
+        replay starts at the newest snapshot, so a crash midway loses nothing.
+        """
+        if self.directory is None:
+            return
+        old = self._files()
+        if not old:
+            return
+        self._sink = []
+        try:
+            write()
+        finally:
+            records, self._sink = self._sink, None
+        seq = self._last_seq() + 1
+        path = self.directory / f"journal-{seq:06d}.snap"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        for stale in old:
+            stale.unlink(missing_ok=True)
+        logger.info(f"🗜️ Compacted {len(old)} journal files into {path.name} ({len(records)} records)")
+
+    async def start(self):
+        """Opens a fresh segment and starts the group-commit task"""
+        if self.directory is None or self._mm is not None:
+            return
+        self.lock()
+        self._segment = self._last_seq()
+        self._open_segment()
+        self._dirty = asyncio.Event()
+        self._task = asyncio.create_task(self._run_commits(), name="journal-commits")
+        logger.info(f"📒 Order journal at {self.directory} (segment {self._segment})")
+
+    async def close(self):
+        """Final flush; segments are trimmed to what was written"""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._mm is not None:
+            self._retire()
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._flush_retired)
+            self.durable = self.appended
+            self._release_waiters()
+        self._unlock()
+
+    def _open_segment(self):
+        self._segment += 1
+        path = self.directory / f"journal-{self._segment:06d}.seg"
+        # O_EXCL: never map a file another run (or process) wrote
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        if hasattr(os, "posix_fallocate"):
+            # Real blocks up front: a full disk fails here, not as SIGBUS on a page fault mid-order
+            os.posix_fallocate(fd, 0, self.segment_bytes)
+        else:
+            os.ftruncate(fd, self.segment_bytes)
+        self._path = path
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.segment_bytes)
+        self._offset = 0
+        self._synced = 0
+
+    def _retire(self):
+        """Hands the current segment to the commit task to flush, trim and close"""
+        self._retired.append((self._path, self._fd, self._mm, self._offset))
+        self._fd = None
+        self._mm = None
+
+    def _flush_retired(self):
+        # Runs on the journal thread while the loop may retire more; pop is atomic
+        while self._retired:
+            path, fd, mm, used = self._retired.pop(0)
+            mm.flush()
+            mm.close()
+            os.ftruncate(fd, used)
+            os.fsync(fd)
+            os.close(fd)
+            if used == 0:
+                path.unlink()
+
+    # --- writes (hot path) ---
+    def _append(self, kind: int, ts: int, order_id: str, body: bytes = b""):
+        if self._sink is not None:
+            record = HEADER.pack(kind, ts, bytes.fromhex(order_id)) + body
+            self._sink.append(PREFIX.pack(PREFIX.size + len(record), zlib.crc32(record)) + record)
+            return
+        if self._mm is None:
+            return
+        record = HEADER.pack(kind, ts, bytes.fromhex(order_id)) + body
+        size = PREFIX.size + len(record)
+        if self._offset + size > self.segment_bytes:
+            self._retire()
+            self._open_segment()
+        offset = self._offset
+        self._mm[offset:offset + size] = PREFIX.pack(size, zlib.crc32(record)) + record
+        self._offset = offset + size
+        self.appended += 1
+        self._dirty.set()
+
+    def intent(self, order):
+        intent = order.intent
+        symbol, account, key = _text(intent.symbol), _text(order.account_id), _text(order.idempotency_key)
+        quantity = intent.quantity if intent.action == "BUY" else -intent.quantity
+        self._append(
+            REC_INTENT, order.queued_ts, order.client_order_id,
+            INTENT.pack(quantity, intent.price, order.signal_ts, len(symbol), len(account), len(key)) + symbol + account + key
+        )
+
+    def accepted(self, order):
+        self._append(REC_ACCEPTED, order.risk_ts, order.client_order_id)
+
+    def rejected(self, order):
+        error = _text(order.error)
+        self._append(REC_REJECTED, order.risk_ts, order.client_order_id, TEXT.pack(len(error)) + error)
+
+    def sent(self, order):
+        self._append(REC_SENT, order.send_ts, order.client_order_id)
+
+    def acked(self, order, fill_price: float):
+        broker_id = _text(order.broker_order_id)
+        self._append(REC_ACKED, order.ack_ts, order.client_order_id, ACK.pack(fill_price, len(broker_id)) + broker_id)
+
+    def failed(self, order, ts: int):
+        error = _text(order.error)
+        self._append(REC_FAILED, ts, order.client_order_id, TEXT.pack(len(error)) + error)
+
+    def fill(self, order, ts: int):
+        self._append(REC_FILL, ts, order.client_order_id, FILL.pack(order.filled_quantity, order.fill_price or 0.0))
+
+    def replaced(self, order, ts: int):
+        self._append(REC_REPLACED, ts, order.client_order_id, REPLACED.pack(order.intent.quantity))
+
+    def final(self, order, ts: int):
+        reason = _text(order.error)
+        self._append(
+            REC_FINAL, ts, order.client_order_id,
+            FINAL.pack(FINAL_STATES.index(order.broker_status), len(reason)) + reason
+        )
+
+    def position(self, symbol: str, filled: int, avg_price: float, realized: float, mark: float, ts: int):
+        """Absolute position for a symbol (snapshots): replaces whatever replay built up before it"""
+        name = _text(symbol)
+        self._append(REC_POSITION, ts, NO_ORDER, POSITION.pack(filled, avg_price, realized, mark, len(name)) + name)
+
+    # --- group commit ---
+    async def sync(self):
+        """Waits until everything appended so far is on disk"""
+        if self._mm is None or self.durable >= self.appended:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((self.appended, future))
+        await future
+
+    async def _run_commits(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._dirty.wait()
+            # Let the rest of a burst land in the same flush
+            await asyncio.sleep(self.commit_interval)
+            self._dirty.clear()
+            appended, mm, start, end = self.appended, self._mm, self._synced, self._offset
+            self._synced = end
+            await loop.run_in_executor(self._executor, self._flush, mm, start, end)
+            self.durable = appended
+            self.commits += 1
+            self._release_waiters()
+
+    def _flush(self, mm: Optional[mmap.mmap], start: int, end: int):
+        # `mm` may have been retired since; it is only closed by _flush_retired, below
+        if mm is not None and end > start:
+            aligned = start - start % mmap.PAGESIZE
+            mm.flush(aligned, end - aligned)
+        self._flush_retired()
+
+    def _release_waiters(self):
+        while self._waiters and self._waiters[0][0] <= self.durable:
+            _, future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+
+    # --- recovery ---
+    def replay(self) -> Iterator[Record]:
+        """Every intact record, oldest first"""
+        for path in self.segments():
+            yield from self._read_segment(path)
+
+    def _read_segment(self, path: Path) -> Iterator[Record]:
+        data = path.read_bytes()
+        end = len(data)
+        offset = 0
+        header_size = RECORD_HEADER.size
+        unpack, decode, crc32 = RECORD_HEADER.unpack_from, self._decode, zlib.crc32
+        while offset + header_size <= end:
+            size, crc, kind, ts, raw_id = unpack(data, offset)
+            if size == 0:
+                return
+            if size < header_size or offset + size > end or crc32(data[offset + 8:offset + size]) != crc:
+                logger.warning(f"⚠️ Journal {path.name} has a torn record at byte {offset}; ignoring the rest")
+                return
+            yield kind, ts, raw_id, decode(kind, data, offset + header_size) if size > header_size else None
+            offset += size
+
+    @staticmethod
+    def _decode(kind: int, data: bytes, at: int):
+        if kind == REC_INTENT:
+            quantity, price, signal_ts, n_symbol, n_account, n_key = INTENT.unpack_from(data, at)
+            at += INTENT.size
+            symbol = data[at:at + n_symbol].decode()
+            at += n_symbol
+            account = data[at:at + n_account].decode()
+            at += n_account
+            return quantity, price, signal_ts, symbol, account, data[at:at + n_key].decode(errors="replace")
+        if kind == REC_ACKED:
+            price, n = ACK.unpack_from(data, at)
+            return price, data[at + ACK.size:at + ACK.size + n].decode() or None
+        if kind == REC_FILL:
+            return FILL.unpack_from(data, at)
+        if kind == REC_POSITION:
+            filled, avg_price, realized, mark, n = POSITION.unpack_from(data, at)
+            return data[at + POSITION.size:at + POSITION.size + n].decode(), filled, avg_price, realized, mark
+        if kind == REC_REPLACED:
+            return REPLACED.unpack_from(data, at)[0]
+        if kind == REC_FINAL:
+            code, n = FINAL.unpack_from(data, at)
+            return FINAL_STATES[code], data[at + FINAL.size:at + FINAL.size + n].decode(errors="replace") or None
+        if kind in (REC_REJECTED, REC_FAILED):
+            (n,) = TEXT.unpack_from(data, at)
+            # Messages are cut at MAX_TEXT bytes, possibly mid-character
+            return data[at + TEXT.size:at + TEXT.size + n].decode(errors="replace") or None
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "segment": self._segment,
+            "segment_used_bytes": self._offset,
+            "appended": self.appended,
+            "durable": self.durable,
+            "commits": self.commits,
+        }
+
+
+# Global Instance, opened by the order pipeline
+order_journal = OrderJournal(
+    settings.JOURNAL_DIR or None,
+    settings.JOURNAL_SEGMENT_BYTES,
+    settings.JOURNAL_COMMIT_INTERVAL_MS / 1000
+)
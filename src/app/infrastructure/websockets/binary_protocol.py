@@ -0,0 +1,290 @@
+"""
+Compact binary wire format for market data (opt-in; JSON stays the default).
+
+All integers are little-endian. Prices travel as int64/int32 ticks of
+1 / price_scale, timestamps as milliseconds. price_scale is picked per
+instrument: the smallest power of ten (100 up to 1e9, Databento's own
+precision) that carries its prices exactly. A WebSocket message holds one
+or more back-to-back frames, each starting with a one-byte type:
+
+  HELLO    0x01  u16 length + UTF-8 JSON {symbol, dataset, interval, price_scale}
+                 Sent before the first bar and again only if it changes; a finer
+                 price raises price_scale, and the bar after such a HELLO is a KEY.
+  KEY      0x02  u8 flags, i64 ts_ms, i64 open, high, low, close, stop, u32 volume
+  DELTA    0x03  u8 flags, i32 d_ts_ms, i32 d_open, d_high, d_low, d_close, d_stop, u32 volume
+                 Each d_* is relative to the previous bar frame on this socket.
+  ERROR    0x7F  u16 length + UTF-8 message
+  HISTORY  0x10  see `encode_history`
+
+Flags: bit0 final, bit1 snapshot, bits2-3 ut_action (0 HOLD, 1 BUY, 2 SELL),
+bits4-5 ut_position (0 FLAT, 1 LONG, 2 SHORT).
+"""
+
+import json
+import struct
+from typing import Dict, List, Optional
+import numpy as np
+
+SUBPROTOCOL = "utbot.binary.v1"
+# Scale assumed by decoders when no HELLO carried one
+DEFAULT_PRICE_SCALE = 10_000
+# Per-instrument scales start at cents and go up to 1e-9 (the fixed-point precision of the feed)
+MIN_PRICE_SCALE = 100
+MAX_PRICE_SCALE = 10 ** 9
+
+HELLO = 0x01
+KEY = 0x02
+DELTA = 0x03
+HISTORY = 0x10
+ERROR = 0x7F
+
+_TEXT = struct.Struct("<BH")
+_KEY = struct.Struct("<BBqqqqqqI")
+_DELTA = struct.Struct("<BBiiiiiiI")
+_HISTORY = struct.Struct("<BBIIqqqqq")
+
+_I32_MIN, _I32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+_ACTIONS = {"HOLD": 0, "BUY": 1, "SELL": 2}
+_POSITIONS = {"FLAT": 0, "LONG": 1, "SHORT": 2}
+_ACTION_NAMES = {v: k for k, v in _ACTIONS.items()}
+_POSITION_NAMES = {v: k for k, v in _POSITIONS.items()}
+
+_HISTORY_WIDE = 0x01  # deltas stored as int64 instead of int32
+
+
+def _text_frame(frame_type: int, text: str) -> bytes:
+    payload = text.encode("utf-8")[:0xFFFF]
+    return _TEXT.pack(frame_type, len(payload)) + payload
+
+
+def history_price_scale(columns: Dict) -> int:
+    """Smallest power of ten (MIN_PRICE_SCALE up to MAX_PRICE_SCALE) that carries every OHLC price exactly"""
+    values = np.concatenate([np.asarray(columns[name], dtype=np.float64) for name in ("open", "high", "low", "close")])
+    values = values[np.isfinite(values)]
+    scale = MIN_PRICE_SCALE
+    while scale < MAX_PRICE_SCALE:
+        scaled = values * scale
+        # A whole number of ticks, give or take float rounding (a few ulps of `scaled`)
+        if np.all(np.abs(scaled - np.rint(scaled)) <= 1e-6 + 1e-15 * np.abs(scaled)):
+            break
+        scale *= 10
+    return scale
+
+
+class BinaryEncoder:
+    """
+    Per-socket encoder. Deltas are relative to the last frame THIS socket was
+    sent, so it must see exactly the messages that go out (after conflation).
+    Without a fixed `price_scale`, the scale follows the instrument's prices
+    and only ever grows (UTBot stops are rounded to it).
+    """
+    __slots__ = ("symbol", "interval", "price_scale", "auto_scale", "keyframe_every", "_hello", "_prev", "_since_key")
+
+    def __init__(self, symbol: str, interval: Optional[str] = None,
+                 price_scale: Optional[int] = None, keyframe_every: int = 256):
+        self.symbol = symbol
+        self.interval = interval
+        self.auto_scale = price_scale is None
+        self.price_scale = MIN_PRICE_SCALE if price_scale is None else price_scale
+        self.keyframe_every = keyframe_every
+        self._hello: Optional[Dict] = None
+        self._prev: Optional[tuple] = None
+        self._since_key = 0
+
+    def _ticks(self, price) -> int:
+        return int(round(float(price) * self.price_scale)) if price is not None else 0
+
+    def _price_ticks(self, prices) -> List[int]:
+        """Ticks for `prices`, first raising an automatic price_scale that can't carry them exactly"""
+        scale = self.price_scale
+        while True:
+            ticks = []
+            for price in prices:
+                if price is None:
+                    ticks.append(0)
+                    continue
+                scaled = float(price) * scale
+                rounded = round(scaled)
+                if (scaled != rounded and self.auto_scale and scale < MAX_PRICE_SCALE
+                        and abs(scaled - rounded) > 1e-6 + 1e-15 * abs(scaled)):
+                    scale *= 10
+                    break
+                ticks.append(rounded)
+            else:
+                if scale != self.price_scale:
+                    self.price_scale = scale
+                    # Earlier ticks were in the old scale: the next frame must be a KEY
+                    self._prev = None
+                return ticks
+
+    def encode(self, data: Dict) -> bytes:
+        if "error" in data:
+            return _text_frame(ERROR, str(data["error"]))
+
+        close = data["close"] if "close" in data else data.get("price")
+        prices = self._price_ticks((data.get("open", close), data.get("high", close), data.get("low", close), close))
+
+        frames = []
+        hello = {
+            "symbol": data.get("symbol", self.symbol),
+            "dataset": data.get("dataset"),
+            "interval": data.get("interval", self.interval),
+            "price_scale": self.price_scale,
+        }
+        if hello != self._hello:
+            self._hello = hello
+            frames.append(_text_frame(HELLO, json.dumps(hello)))
+
+        values = (
+            int(round(float(data.get("timestamp") or 0) * 1000)),
+            *prices,
+            self._ticks(data.get("ut_stop")),
+        )
+        flags = (
+            (1 if data.get("final", True) else 0)
+            | (2 if data.get("snapshot") else 0)
+            | (_ACTIONS.get(data.get("ut_action"), 0) << 2)
+            | (_POSITIONS.get(data.get("ut_position"), 0) << 4)
+        )
+        volume = min(int(data.get("volume") or 0), 0xFFFFFFFF)
+
+        prev = self._prev
+        deltas = None
+        if prev is not None and self._since_key < self.keyframe_every:
+            deltas = [v - p for v, p in zip(values, prev)]
+            if not all(_I32_MIN <= d <= _I32_MAX for d in deltas):
+                deltas = None
+
+        if deltas is None:
+            frames.append(_KEY.pack(KEY, flags, *values, volume))
+            self._since_key = 0
+        else:
+            frames.append(_DELTA.pack(DELTA, flags, *deltas, volume))
+            self._since_key += 1
+        self._prev = values
+        return b"".join(frames)
+
+
+def decode_frames(message: bytes, state: Optional[Dict] = None) -> List[Dict]:
+    """
+    Reference decoder (tests, Python clients). `state` carries HELLO and the
+    previous bar between messages of one socket; pass the same dict each time.
+    """
+    state = state if state is not None else {}
+    out = []
+    offset = 0
+    while offset < len(message):
+        frame_type = message[offset]
+        if frame_type in (HELLO, ERROR):
+            _, length = _TEXT.unpack_from(message, offset)
+            offset += _TEXT.size
+            text = message[offset:offset + length].decode("utf-8")
+            offset += length
+            if frame_type == HELLO:
+                state["hello"] = json.loads(text)
+            else:
+                out.append({"error": text})
+            continue
+
+        if frame_type == KEY:
+            _, flags, *values, volume = _KEY.unpack_from(message, offset)
+            offset += _KEY.size
+        elif frame_type == DELTA:
+            _, flags, *deltas, volume = _DELTA.unpack_from(message, offset)
+            offset += _DELTA.size
+            values = [p + d for p, d in zip(state["prev"], deltas)]
+        else:
+            raise ValueError(f"Unknown frame type 0x{frame_type:02x}")
+
+        state["prev"] = values
+        hello = state.get("hello", {})
+        scale = hello.get("price_scale", DEFAULT_PRICE_SCALE)
+        ts, o, h, l, c, stop = values
+        bar = {
+            "symbol": hello.get("symbol"),
+            "dataset": hello.get("dataset"),
+            "timestamp": ts / 1000,
+            "open": o / scale,
+            "high": h / scale,
+            "low": l / scale,
+            "price": c / scale,
+            "volume": volume,
+            "final": bool(flags & 1),
+            "ut_action": _ACTION_NAMES.get((flags >> 2) & 3, "HOLD"),
+            "ut_stop": stop / scale,
+            "ut_position": _POSITION_NAMES.get((flags >> 4) & 3, "FLAT"),
+        }
+        if hello.get("interval"):
+            bar["interval"] = hello["interval"]
+        if flags & 2:
+            bar["snapshot"] = True
+        out.append(bar)
+    return out
+
+
+def encode_history(columns: Dict, symbol: str, dataset: Optional[str], interval: str,
+                   price_scale: Optional[int] = None) -> bytes:
+    """
+    Columnar history as one HELLO frame + one HISTORY frame (price_scale
+    defaults to the finest one the prices need, see `history_price_scale`):
+      u8 type, u8 flags, u32 count, u32 price_scale,
+      i64 first ts_ms, open, high, low, close,
+      (count - 1) deltas per column (ts, open, high, low, close; int32, or int64 if flags & WIDE),
+      count x u32 volume
+    Built with whole-array NumPy ops.
+    """
+    if price_scale is None:
+        price_scale = history_price_scale(columns)
+    hello = _text_frame(HELLO, json.dumps({
+        "symbol": symbol, "dataset": dataset, "interval": interval, "price_scale": price_scale
+    }))
+    ts = np.asarray(columns["timestamps"], dtype=np.int64) * 1000
+    prices = [
+        np.rint(np.asarray(columns[name], dtype=np.float64) * price_scale).astype(np.int64)
+        for name in ("open", "high", "low", "close")
+    ]
+    count = len(ts)
+    if count == 0:
+        return hello + _HISTORY.pack(HISTORY, 0, 0, price_scale, 0, 0, 0, 0, 0)
+
+    cols = [ts] + prices
+    deltas = [np.diff(c) for c in cols]
+    wide = any(len(d) and (d.min() < _I32_MIN or d.max() > _I32_MAX) for d in deltas)
+    dtype = "<i8" if wide else "<i4"
+
+    volume = np.clip(np.asarray(columns["volume"], dtype=np.int64), 0, 0xFFFFFFFF).astype("<u4")
+    parts = [hello, _HISTORY.pack(HISTORY, _HISTORY_WIDE if wide else 0, count, price_scale, *(int(c[0]) for c in cols))]
+    parts.extend(d.astype(dtype).tobytes() for d in deltas)
+    parts.append(volume.tobytes())
+    return b"".join(parts)
+
+
+def decode_history(message: bytes) -> Dict:
+    """Reference decoder for `encode_history` output"""
+    state: Dict = {}
+    _, length = _TEXT.unpack_from(message, 0)
+    state["hello"] = json.loads(message[_TEXT.size:_TEXT.size + length])
+    offset = _TEXT.size + length
+
+    _, flags, count, scale, *firsts = _HISTORY.unpack_from(message, offset)
+    offset += _HISTORY.size
+    dtype = np.dtype("<i8" if flags & _HISTORY_WIDE else "<i4")
+    cols = []
+    for first in firsts:
+        if count == 0:
+            cols.append(np.zeros(0, dtype=np.int64))
+            continue
+        d = np.frombuffer(message, dtype=dtype, count=count - 1, offset=offset).astype(np.int64)
+        offset += (count - 1) * dtype.itemsize
+        cols.append(np.concatenate(([first], first + np.cumsum(d))))
+    volume = np.frombuffer(message, dtype="<u4", count=count, offset=offset).astype(np.int64)
+    return {
+        **state["hello"],
+        "timestamps": cols[0] // 1000,
+        "open": cols[1] / scale,
+        "high": cols[2] / scale,
+        "low": cols[3] / scale,
+        "close": cols[4] / scale,
+        "volume": volume,
+    }
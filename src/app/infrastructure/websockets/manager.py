@@ -1,22 +1,132 @@
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import List, Dict, Optional
+from collections import deque
+from contextlib import suppress
+import asyncio
 import json
+import logging
+import time
+from src.app.core.config import settings
+from src.app.core.metrics import SymbolStages, metrics, symbol_of
+from src.app.infrastructure.websockets.binary_protocol import BinaryEncoder
+
+logger = logging.getLogger("ws_manager")
+
+
+class _Client:
+    """
+    One connected socket with its own bounded outbound queue and writer task.
+
+    Producers never wait on the network: `offer` only touches the queue.
+    Queued messages carry a conflation key (the bar timestamp), so a newer
+    update for the same bar replaces the queued one in place, and when the
+    queue is full the oldest message is dropped - the latest bar always wins.
+
+    Binary clients queue the data itself and encode at send time, because
+    their delta frames are relative to what this socket actually received.
+    """
+    __slots__ = ("websocket", "channel", "encoder", "queue", "wakeup", "writer", "stages",
+                 "sent", "conflated", "dropped", "last_lag", "max_lag", "connected_at")
+
+    def __init__(self, websocket: WebSocket, channel: str, encoder: Optional[BinaryEncoder] = None):
+        self.websocket = websocket
+        self.channel = channel
+        self.encoder = encoder
+        # [conflation key, JSON text or data dict (binary), enqueued at, received perf_counter_ns]
+        self.queue: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.stages: Optional[SymbolStages] = metrics.stages(symbol_of(channel)) if metrics.enabled else None
+        self.sent = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.connected_at = time.monotonic()
+
+    def offer(self, key, message, now: float, received: Optional[int] = None):
+        if key is not None and self.queue and self.queue[-1][0] == key:
+            # Same bar updated again before we sent the previous version
+            self.queue[-1][1] = message
+            self.conflated += 1
+        else:
+            if len(self.queue) >= settings.WS_CLIENT_QUEUE_SIZE:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append([key, message, now, received])
+        self.wakeup.set()
+
+    def lag(self, now: float) -> float:
+        """Age of the oldest undelivered message, in seconds"""
+        return now - self.queue[0][2] if self.queue else 0.0
+
+    async def run(self):
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            _, message, enqueued_at, received = self.queue.popleft()
+            timed = received is not None and self.stages is not None
+            if self.encoder is not None:
+                if timed:
+                    started = time.perf_counter_ns()
+                    message = self.encoder.encode(message)
+                    self.stages.serialize.record(time.perf_counter_ns() - started)
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_bytes(self.encoder.encode(message))
+            else:
+                await self.websocket.send_text(message)
+            self.sent += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            if self.last_lag > self.max_lag:
+                self.max_lag = self.last_lag
+            if timed:
+                self.stages.send.record(int(self.last_lag * 1e9))
+                self.stages.end_to_end.record(time.perf_counter_ns() - received)
+
+    def stats(self, now: float) -> Dict:
+        return {
+            "channel": self.channel,
+            "encoding": "binary" if self.encoder is not None else "json",
+            "client": f"{self.websocket.client.host}:{self.websocket.client.port}" if self.websocket.client else None,
+            "connected_seconds": round(now - self.connected_at, 1),
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "conflated": self.conflated,
+            "dropped": self.dropped,
+            "lag_ms": round(self.lag(now) * 1000, 2),
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
+
 
 class ConnectionManager:
     """
     Manages active WebSocket connections from the Frontend (TradingView).
     Broadcasts live price updates to all connected charts.
+
+    Every socket is drained by its own writer task, so sends run concurrently
+    and one slow browser never delays the others. A client whose oldest
+    undelivered message is older than WS_MAX_CLIENT_LAG_SECONDS is disconnected.
     """
     def __init__(self):
         # Stores active connections: {"TSLA": [socket1, socket2], "AAPL": [socket3]}
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        self._clients: Dict[WebSocket, _Client] = {}
 
-    async def connect(self, websocket: WebSocket, symbol: str):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, symbol: str,
+                      encoder: Optional[BinaryEncoder] = None, subprotocol: Optional[str] = None):
+        await websocket.accept(subprotocol=subprotocol)
         if symbol not in self.active_connections:
             self.active_connections[symbol] = []
         self.active_connections[symbol].append(websocket)
-        print(f"DEBUG: Client connected to stream: {symbol}")
+
+        client = _Client(websocket, symbol, encoder)
+        client.writer = asyncio.create_task(self._write(client), name=f"ws-writer:{symbol}")
+        self._clients[websocket] = client
+        logger.info(f"🔌 Client connected to stream: {symbol} ({len(self._clients)} total)")
 
     def disconnect(self, websocket: WebSocket, symbol: str):
         if symbol in self.active_connections:
@@ -24,20 +134,85 @@ class ConnectionManager:
                 self.active_connections[symbol].remove(websocket)
             if not self.active_connections[symbol]:
                 del self.active_connections[symbol]
+        client = self._clients.pop(websocket, None)
+        if client is not None and client.writer is not None:
+            client.writer.cancel()
+
+    async def _write(self, client: _Client):
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket is gone; the endpoint's receive loop cleans up the subscription
+            self.disconnect(client.websocket, client.channel)
 
-    async def broadcast(self, symbol: str, data: dict):
+    def _drop_slow(self, client: _Client, lag: float):
+        logger.warning(f"🐢 Disconnecting slow client on {client.channel}: {lag:.1f}s behind, {len(client.queue)} queued")
+        self.disconnect(client.websocket, client.channel)
+
+        async def close():
+            with suppress(Exception):
+                await client.websocket.close(code=1013, reason="Client too slow")
+        asyncio.create_task(close())
+
+    def send(self, websocket: WebSocket, data: dict):
+        """Queues a message for one client (e.g. a snapshot) behind anything already pending"""
+        client = self._clients.get(websocket)
+        if client is not None:
+            client.offer(None, data if client.encoder is not None else json.dumps(data), time.monotonic())
+
+    async def broadcast(self, symbol: str, data: dict, received: Optional[int] = None, ready: Optional[int] = None,
+                        text: Optional[str] = None):
         """
         Pushes a JSON payload to all clients watching a specific ticker.
+        Serializes once and only enqueues; never waits on a socket.
+        For latency metrics, `received` is when the bar came in and `ready`
+        when the payload was built (perf_counter_ns). `text` is `data`
+        already serialized (bars from the bar bus).
         """
         if symbol in self.active_connections:
-            message = json.dumps(data)
+            message = text
+            key = data.get("timestamp")
+            now = time.monotonic()
+            max_lag = settings.WS_MAX_CLIENT_LAG_SECONDS
             # Iterate through copy to handle disconnects safely
             for connection in self.active_connections[symbol][:]:
-                try:
-                    await connection.send_text(message)
-                except Exception:
-                    self.disconnect(connection, symbol)
+                client = self._clients.get(connection)
+                if client is None:
+                    continue
+                lag = client.lag(now)
+                if max_lag > 0 and lag > max_lag:
+                    self._drop_slow(client, lag)
+                    continue
+                if client.encoder is not None:
+                    client.offer(key, data, now, received)
+                    continue
+                if message is None:
+                    if ready is not None and client.stages is not None:
+                        message = json.dumps(data)
+                        client.stages.serialize.record(time.perf_counter_ns() - ready)
+                    else:
+                        message = json.dumps(data)
+                client.offer(key, message, now, received)
+
+    def stats(self) -> List[Dict]:
+        """Per-client queue depth, conflation/drop counts and delivery lag"""
+        now = time.monotonic()
+        return [client.stats(now) for client in self._clients.values()]
+
+    def totals(self) -> Dict:
+        """Client count and queue depth across every socket"""
+        clients = self._clients.values()
+        return {
+            "clients": len(self._clients),
+            "channels": len(self.active_connections),
+            "queued": sum(len(client.queue) for client in clients),
+            "max_queued": max((len(client.queue) for client in clients), default=0),
+            "dropped": sum(client.dropped for client in clients),
+            "conflated": sum(client.conflated for client in clients),
+        }
 
 # --- THIS WAS MISSING ---
 # Global Instance to be imported by other files
-ws_manager = ConnectionManager()
\ No newline at end of file
+ws_manager = ConnectionManager()
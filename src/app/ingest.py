@@ -0,0 +1,88 @@
+"""
+Ingest process for multi-worker deployments.
+
+Owns the upstream market data sessions, the StreamHub and all UTBot strategy
+state, and publishes bars to web workers over the bar bus (STREAM_BUS). It also
+runs the one order pipeline, risk engine, broker connection and watchlist
+scanner; workers' order API and scanner calls come in over the same socket,
+and scanner flips go out to every worker:
+
+    STREAM_BUS=/tmp/pulse-bars.sock python -m src.app.ingest
+    STREAM_BUS=/tmp/pulse-bars.sock uvicorn src.app.main:app --workers 8
+
+Web workers can start before or after this process and reconnect if it restarts.
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+from contextlib import suppress
+from src.app.core.config import settings
+from src.app.core.lifespan import prewarm_hot_symbols
+from src.app.core.metrics import metrics
+from src.app.infrastructure.brokers.factory import broker_client
+from src.app.infrastructure.market_data.bar_bus import BarBusServer
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.scanner_feed import SCANNER_CHANNEL, ScannerFeed
+from src.app.domain.services.order_pipeline import order_pipeline
+from src.app.domain.services.order_service import OrderService
+from src.app.domain.services.strategy_registry import strategy_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ingest")
+
+
+async def main():
+    if not settings.STREAM_BUS:
+        logger.error("❌ STREAM_BUS is not set; nothing for web workers to connect to")
+        sys.exit(1)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("🚀 Ingest process starting up")
+    await order_pipeline.start()
+    results = await asyncio.gather(market_data_client.start(), broker_client.start(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"❌ Startup step failed: {result}")
+    bus = BarBusServer(settings.STREAM_BUS, handlers=OrderService().handlers, fanout=(SCANNER_CHANNEL,))
+    # Paper / fake brokers fill resting limit orders off live bars
+    bus.hub.listeners.append(broker_client.on_bar)
+    scanner = ScannerFeed.from_settings(hub=bus.hub, manager=bus)
+    if scanner.enabled:
+        bus.handlers.update(scanner.handlers)
+    await bus.start()
+    await scanner.start()
+    tasks = [asyncio.create_task(prewarm_hot_symbols(bus.hub), name="prewarm")]
+    if metrics.enabled:
+        # Nobody reads these here, but the stamps ride along to the workers; keep the buffers folded
+        tasks.append(asyncio.create_task(metrics.run(), name="metrics-fold"))
+    if strategy_registry.checkpoint_dir is not None:
+        logger.info(f"💾 Checkpointing strategy state to {strategy_registry.checkpoint_dir}")
+        tasks.append(asyncio.create_task(
+            strategy_registry.run_checkpoints(settings.STRATEGY_CHECKPOINT_INTERVAL),
+            name="strategy-checkpoints"
+        ))
+
+    await stop.wait()
+    logger.info("🛑 Ingest process shutting down. Stopping market data streams...")
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+    await scanner.stop()
+    await bus.close()
+    strategy_registry.checkpoint_all()
+    await bus.hub.shutdown()
+    await market_data_client.close_live()
+    market_data_client.close()
+    await order_pipeline.stop()
+    await broker_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
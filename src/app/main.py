@@ -1,10 +1,18 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from typing import Optional
 from src.app.core.config import settings
-from src.app.api.v1 import market_data
+from src.app.core.metrics import metrics, to_prometheus
+from src.app.core.lifespan import lifespan
+from src.app.api.v1 import market_data, orders, strategies
+from src.app.domain.services.order_service import OrderServiceError, order_service
+from src.app.infrastructure.market_data.databento import market_data_client
+from src.app.infrastructure.market_data.bar_bus import streams
+from src.app.infrastructure.market_data.scanner_feed import scanner_state
+from src.app.infrastructure.websockets.manager import ws_manager
 
 BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "templates"
@@ -17,6 +25,7 @@ def create_application() -> FastAPI:
         title=settings.PROJECT_NAME,
         version="0.1.0",
         docs_url="/docs",
+        lifespan=lifespan,
     )
     
     # Mount static files directory
@@ -27,10 +36,69 @@ def create_application() -> FastAPI:
         prefix=f"{settings.API_V1_STR}/market-data", 
         tags=["Market Data"]
     )
+
+    application.include_router(
+        strategies.router,
+        prefix=f"{settings.API_V1_STR}/strategies",
+        tags=["Strategies"]
+    )
+
+    application.include_router(
+        orders.router,
+        prefix=f"{settings.API_V1_STR}/orders",
+        tags=["Orders"]
+    )
     
     @application.get("/health")
-    async def health_check():
-        return {"status": "online", "version": "0.1.0"}
+    async def health_check(request: Request):
+        return {"status": "online", "version": "0.1.0", "ready": getattr(request.app.state, "ready", False)}
+
+    @application.get("/ready")
+    async def readiness_check(request: Request):
+        """503 until background startup (SDK clients, broker token, WARMUP_SYMBOLS) is done"""
+        if not getattr(request.app.state, "ready", False):
+            return JSONResponse({"ready": False}, status_code=503)
+        return {"ready": True}
+
+    @application.get("/metrics")
+    async def metrics_endpoint(symbol: Optional[str] = None, format: str = "json"):
+        """
+        Per-symbol, per-stage latency percentiles for the live bar path
+        (upstream -> normalize -> queue -> strategy -> serialize -> send),
+        plus queue depths, client counts and upstream reconnects.
+        `format=prometheus` returns the text exposition format.
+        """
+        sessions = market_data_client.live_stats()
+        clients = ws_manager.totals()
+        stream_stats = streams.stats()
+        latency = metrics.snapshot(symbol)
+        try:
+            order_stats = await order_service.stats()
+        except OrderServiceError:
+            # Ingest process unreachable; the rest of the metrics are still this worker's
+            order_stats = None
+        if format == "prometheus":
+            gauges = {
+                "ws_clients": clients["clients"],
+                "ws_queued": clients["queued"],
+                "ws_dropped_total": clients["dropped"],
+                "streams": stream_stats["streams"],
+                "stream_subscribers": stream_stats["subscribers"],
+                "live_queued": sum(s["queued"] for s in sessions),
+                "live_reconnects_total": sum(s["reconnects"] for s in sessions),
+                "order_queue_depth": order_stats["queued"] if order_stats else 0,
+            }
+            return PlainTextResponse(to_prometheus(latency, gauges))
+        return {
+            "enabled": metrics.enabled,
+            "since": metrics.started,
+            "latency": latency,
+            "websockets": clients,
+            "streams": stream_stats,
+            "live_sessions": sessions,
+            "orders": order_stats,
+            "scanner": await scanner_state("stats"),
+        }
 
     @application.get("/test", response_class=HTMLResponse)
     async def test_page(request: Request):
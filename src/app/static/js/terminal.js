@@ -36,6 +36,7 @@ const TIMEFRAMES = ['1', '5', '15', '4h', '8h', 'D', 'W'];
 
 // WebSocket state
 let liveWS = null;
+let scannerWS = null;
 
 // ========== INIT ==========
 document.addEventListener('DOMContentLoaded', () => {
@@ -43,7 +44,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     loadAllCharts();
     connectLiveData(state.symbol);  // Connect to Databento via WebSocket
-    startSignalSimulation();
+    connectScanner();               // Server-side UTBot flips for the watchlist (falls back to simulation)
     setupResizeHandles();
     setupChartSelection();
     updateBalanceUI();
@@ -459,6 +460,43 @@ function startSignalSimulation() {
     }, 3000);
 }
 
+// ========== SCANNER FEED ==========
+// Server intervals -> watchlist arrow timeframes
+const SCANNER_TF = { '1m': '1', '5m': '5', '15m': '15', '4h': '4h', '8h': '8h', '1d': 'D' };
+
+function connectScanner() {
+    let received = false;
+    try {
+        scannerWS = new WebSocket(`ws://${window.location.host}/api/v1/market-data/ws/scanner`);
+    } catch (e) {
+        startSignalSimulation();
+        return;
+    }
+
+    scannerWS.onmessage = (event) => {
+        received = true;
+        const data = JSON.parse(event.data);
+        if (data.type === 'snapshot') {
+            data.cells.forEach(cell => {
+                const tf = SCANNER_TF[cell.interval] || cell.interval;
+                setArrow(cell.symbol, tf, cell.position === 'LONG' ? 'up' : 'down');
+            });
+        } else if (data.type === 'flips') {
+            data.flips.forEach(flip => {
+                addSignal(flip.symbol, SCANNER_TF[flip.interval] || flip.interval, flip.action === 'BUY' ? 'up' : 'down');
+            });
+        }
+    };
+
+    scannerWS.onclose = () => {
+        // Closed before the first snapshot: scanner not enabled on this server (1013) or unreachable
+        if (!received) {
+            console.warn('Scanner unavailable, simulating signals...');
+            startSignalSimulation();
+        }
+    };
+}
+
 // ========== EXECUTION ==========
 function setOrderType(type) {
     state.orderType = type;
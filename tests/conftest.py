@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# `pytest tests/` from anywhere: the tests import `src.app...` like the app does
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
@@ -0,0 +1,31 @@
+import numpy as np
+from src.app.infrastructure.market_data.bar_store import SECONDS_PER_DAY, BarStore
+
+
+def _day(day: int, bars: int = 500):
+    ts = day * SECONDS_PER_DAY + np.arange(bars, dtype=np.int64) * 60
+    price = np.linspace(100.0, 110.0, bars)
+    return {"timestamps": ts, "open": price, "high": price + 1, "low": price - 1,
+            "close": price, "volume": np.ones(bars, dtype=np.int64)}
+
+
+def test_writes_only_sweep_when_over_budget(tmp_path, monkeypatch):
+    store = BarStore(tmp_path, max_bytes=10 ** 9, max_age_days=3650, sweep_seconds=3600)
+    passes = []
+    scan = store._evict
+    monkeypatch.setattr(store, "_evict", lambda: passes.append(1) or scan())
+
+    for day in range(20000, 20004):
+        store.write("D", "ES", "ohlcv-1m", _day(day), day * SECONDS_PER_DAY, (day + 1) * SECONDS_PER_DAY)
+    # One pass to measure the store, none after while it is under budget
+    assert len(passes) == 1
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*/*/*/*.parquet"))
+    assert store._size == on_disk
+
+    # A write that takes the store over the limit evicts the least recently used day
+    store.max_bytes = on_disk + on_disk // 8
+    day = 20004
+    store.write("D", "ES", "ohlcv-1m", _day(day), day * SECONDS_PER_DAY, (day + 1) * SECONDS_PER_DAY)
+    assert len(passes) == 2
+    assert store._size <= store.max_bytes
+    assert store.coverage("D", "ES", "ohlcv-1m") == (20001 * SECONDS_PER_DAY, 20005 * SECONDS_PER_DAY)
@@ -0,0 +1,32 @@
+import asyncio
+import json
+import numpy as np
+from src.app.infrastructure.market_data.history_stream import ndjson_body, rows_body
+
+
+def _chunks():
+    async def gen():
+        yield {
+            "timestamps": np.array([1, 2, 3], dtype=np.int64),
+            "open": np.array([1.5, np.nan, 3.0]),
+            "high": np.array([2.0, np.inf, 3.5]),
+            "low": np.array([1.0, 1.0, -np.inf]),
+            "close": np.array([1.75, 2.0, 3.25]),
+            "volume": np.array([10, 20, 30], dtype=np.int64),
+        }
+    return gen()
+
+
+async def _collect(body) -> str:
+    return b"".join([piece async for piece in body]).decode()
+
+
+def test_non_finite_prices_are_valid_json():
+    rows = json.loads(asyncio.run(_collect(rows_body(_chunks(), "ES", "GLBX"))))
+    lines = asyncio.run(_collect(ndjson_body(_chunks(), "ES", "GLBX"))).splitlines()
+    assert [json.loads(line) for line in lines] == rows
+    assert rows[0] == {"symbol": "ES", "dataset": "GLBX", "timestamp": 1, "open": 1.5,
+                       "high": 2.0, "low": 1.0, "close": 1.75, "volume": 10}
+    assert (rows[1]["open"], rows[1]["high"], rows[2]["low"]) == (None, None, None)
+    # Strict parsers (no NaN / Infinity extension) accept the body too
+    json.loads(json.dumps(rows, allow_nan=False))
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from src.app.domain.models import OrderIntent
+from src.app.domain.services.order_pipeline import OrderPipeline
+from src.app.domain.services.risk import RiskEngine, RiskLimits
+from src.app.infrastructure.brokers.fake import FakeBroker
+from src.app.infrastructure.persistence.order_journal import JournalLocked, OrderJournal
+
+
+def _pipeline(directory, broker=None):
+    risk = RiskEngine(RiskLimits())
+    return OrderPipeline(broker=broker or FakeBroker(), risk=risk, journal=OrderJournal(directory)), risk
+
+
+def test_write_replay_recover(tmp_path):
+    async def trade():
+        broker = FakeBroker()
+        pipeline, risk = _pipeline(tmp_path, broker)
+        await pipeline.start()
+        try:
+            risk.mark("X", 10.0)
+            filled, _ = pipeline.submit(OrderIntent("X", "BUY", 100, 10.0, idempotency_key="k1"))
+            await pipeline.wait(filled.client_order_id, 1)
+            await asyncio.sleep(0.01)
+
+            broker.fill_delay = 10
+            resized, _ = pipeline.submit(OrderIntent("X", "BUY", 50, 10.0))
+            await pipeline.wait(resized.client_order_id, 1)
+            broker.fill(resized.broker_order_id, 11.0, 20)
+            await pipeline.replace(resized.client_order_id, 80)
+
+            canceled, _ = pipeline.submit(OrderIntent("X", "SELL", 40, 12.0))
+            await pipeline.wait(canceled.client_order_id, 1)
+            broker.fill(canceled.broker_order_id, 12.0, 10)
+            await pipeline.cancel(canceled.client_order_id)
+            return filled, resized, canceled, risk.snapshot()["positions"]
+        finally:
+            await pipeline.stop()
+
+    async def recover():
+        pipeline, risk = _pipeline(tmp_path)
+        await pipeline.start()
+        try:
+            return pipeline, risk.snapshot()["positions"]
+        finally:
+            await pipeline.stop()
+
+    filled, resized, canceled, before = asyncio.run(trade())
+    # Twice: the second start replays the snapshot the first one compacted into
+    for _ in range(2):
+        pipeline, after = asyncio.run(recover())
+        assert after == before
+        assert pipeline.get(filled.client_order_id).filled_quantity == 100
+        recovered = pipeline.get(resized.client_order_id)
+        assert (recovered.intent.quantity, recovered.filled_quantity) == (80, 20)
+        assert pipeline.get(canceled.client_order_id).broker_status == "canceled"
+        # Idempotency keys survive: the same intent maps to the same order
+        again, created = pipeline.submit(OrderIntent("X", "BUY", 100, 10.0, idempotency_key="k1"))
+        assert not created and again.client_order_id == filled.client_order_id
+
+
+def test_second_process_is_locked_out(tmp_path):
+    async def run():
+        pipeline, _ = _pipeline(tmp_path)
+        await pipeline.start()
+        try:
+            with pytest.raises(JournalLocked):
+                OrderJournal(tmp_path).lock()
+        finally:
+            await pipeline.stop()
+        # Released on close
+        journal = OrderJournal(tmp_path)
+        journal.lock()
+        await journal.close()
+
+    asyncio.run(run())
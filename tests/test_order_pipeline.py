@@ -0,0 +1,93 @@
+import asyncio
+import httpx
+from src.app.domain.models import ORDER_ACKED, ORDER_FAILED, ORDER_UNKNOWN, OrderIntent
+from src.app.domain.services.order_pipeline import OrderPipeline
+from src.app.domain.services.risk import RiskEngine, RiskLimits
+from src.app.infrastructure.brokers.base import BrokerAck, error_ack
+from src.app.infrastructure.brokers.fake import FakeBroker
+
+
+class _LostAnswerBroker(FakeBroker):
+    """Places the order, then loses the answer (a read timeout after the POST went out)"""
+
+    async def submit(self, order):
+        ack = await super().submit(order)
+        return BrokerAck(None, error="ReadTimeout") if ack.accepted else ack
+
+
+def test_error_ack_tells_unsent_from_unknown():
+    request = httpx.Request("POST", "https://broker/orders")
+    assert error_ack(httpx.ConnectError("refused", request=request)).accepted is False
+    assert error_ack(RuntimeError("Not sent: no token")).accepted is False
+    assert error_ack(httpx.ReadTimeout("timed out", request=request)).unknown
+    assert error_ack(httpx.RemoteProtocolError("dropped", request=request)).unknown
+
+
+def test_unknown_outcome_keeps_reservation_and_reconciles_from_the_stream():
+    async def run():
+        broker = _LostAnswerBroker(fill_delay=0.05)
+        risk = RiskEngine(RiskLimits())
+        pipeline = OrderPipeline(broker=broker, risk=risk, journal=None)
+        await pipeline.start()
+        try:
+            risk.mark("AAA", 10.0)
+            order, _ = pipeline.submit(OrderIntent("AAA", "BUY", 100, 10.0))
+            await pipeline.wait(order.client_order_id, 1)
+            # The accepted event beat the lost answer: reconciled straight away
+            assert order.status == ORDER_ACKED
+            assert order.broker_order_id is not None
+            await asyncio.sleep(0.1)
+            assert risk.position("AAA") == 100
+
+            # Nothing reported yet: unknown, shares still reserved
+            broker.listeners.remove(pipeline._on_broker_event)
+            silent, _ = pipeline.submit(OrderIntent("AAA", "BUY", 50, 10.0))
+            await pipeline.wait(silent.client_order_id, 1)
+            assert silent.status == ORDER_UNKNOWN
+            assert risk.snapshot()["positions"]["AAA"]["pending"] == 50
+            broker.listeners.append(pipeline._on_broker_event)
+            await asyncio.sleep(0.1)
+            assert silent.status == ORDER_ACKED
+            assert risk.position("AAA") == 150
+            assert risk.snapshot()["positions"]["AAA"]["pending"] == 0
+
+            # A definite refusal still fails and releases
+            broker.reject_reason = "No buying power"
+            refused, _ = pipeline.submit(OrderIntent("AAA", "BUY", 10, 10.0))
+            await pipeline.wait(refused.client_order_id, 1)
+            assert refused.status == ORDER_FAILED
+            assert risk.snapshot()["positions"]["AAA"]["pending"] == 0
+        finally:
+            await pipeline.stop()
+
+    asyncio.run(run())
+
+
+def test_history_trim_keeps_working_orders(monkeypatch):
+    from src.app.core.config import settings
+    monkeypatch.setattr(settings, "ORDER_HISTORY_SIZE", 3)
+
+    async def run():
+        broker = FakeBroker(fill_delay=10)
+        risk = RiskEngine(RiskLimits())
+        pipeline = OrderPipeline(broker=broker, risk=risk, journal=None)
+        await pipeline.start()
+        try:
+            risk.mark("AAA", 10.0)
+            working, _ = pipeline.submit(OrderIntent("AAA", "BUY", 100, 10.0))
+            await pipeline.wait(working.client_order_id, 1)
+            broker.fill_delay = 0
+            for _ in range(5):
+                order, _ = pipeline.submit(OrderIntent("AAA", "BUY", 1, 10.0))
+                await pipeline.wait(order.client_order_id, 1)
+                await asyncio.sleep(0.01)
+            # The oldest order outlived the history size because it is still working
+            assert pipeline.get(working.client_order_id) is working
+            assert len(pipeline.orders(limit=10)) == 3
+            broker.fill(working.broker_order_id, 10.0)
+            assert risk.position("AAA") == 105
+            assert risk.snapshot()["positions"]["AAA"]["pending"] == 0
+        finally:
+            await pipeline.stop()
+
+    asyncio.run(run())
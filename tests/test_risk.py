@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from src.app.domain.models import Order, OrderIntent
+from src.app.domain.services.order_pipeline import OrderPipeline
+from src.app.domain.services.risk import RiskEngine, RiskLimits
+from src.app.infrastructure.brokers.fake import FakeBroker
+
+
+def _order(symbol: str, action: str, quantity: int, price: float = 0.0) -> Order:
+    return Order(OrderIntent(symbol, action, quantity, price), "TEST", f"{symbol}-{action}-{quantity}")
+
+
+def test_pre_trade_fill_release_aggregates():
+    engine = RiskEngine(RiskLimits(max_gross_notional=1e6))
+    engine.mark("AAA", 10.0)
+    engine.mark("BBB", 20.0)
+
+    buy = _order("AAA", "BUY", 100, 10.0)
+    assert engine.pre_trade(buy) is None
+    # In flight: counts towards notional, not the position
+    assert engine.position("AAA") == 0
+    assert engine.gross == pytest.approx(1000.0)
+
+    engine.on_fill(buy, 60, 10.0)
+    engine.release(buy, 40)
+    short = _order("BBB", "SELL", 50, 20.0)
+    assert engine.pre_trade(short) is None
+    engine.on_fill(short, 50, 20.0)
+    assert engine.position("AAA") == 60
+    assert engine.position("BBB") == -50
+    assert engine.gross == pytest.approx(60 * 10.0 + 50 * 20.0)
+    assert engine.net == pytest.approx(60 * 10.0 - 50 * 20.0)
+
+    engine.mark("AAA", 12.0)
+    assert engine.unrealized == pytest.approx(60 * 2.0)
+    sell = _order("AAA", "SELL", 60, 12.0)
+    assert engine.pre_trade(sell) is None
+    engine.on_fill(sell, 60, 12.0)
+    assert engine.position("AAA") == 0
+    assert engine.realized == pytest.approx(120.0)
+    assert engine.unrealized == pytest.approx(0.0)
+    assert engine.gross == pytest.approx(50 * 20.0)
+
+
+def test_notional_limit_rejects_and_fails_closed_without_price():
+    engine = RiskEngine(RiskLimits(max_gross_notional=5000))
+    engine.mark("AAA", 10.0)
+    assert engine.pre_trade(_order("AAA", "BUY", 400, 10.0)) is None
+    assert "gross notional" in engine.pre_trade(_order("AAA", "BUY", 200, 10.0))
+    assert "no price" in engine.pre_trade(_order("ZZZ", "BUY", 1))
+    assert engine.rejections == 2
+    # Reducing is always allowed
+    assert engine.pre_trade(_order("AAA", "SELL", 100, 10.0)) is None
+
+
+def test_pipeline_round_trip_books_fills_and_releases_the_rest():
+    async def run():
+        broker = FakeBroker()
+        engine = RiskEngine(RiskLimits(max_position=1000))
+        pipeline = OrderPipeline(broker=broker, risk=engine, journal=None)
+        await pipeline.start()
+        try:
+            engine.mark("AAA", 10.0)
+            order, created = pipeline.submit(OrderIntent("AAA", "BUY", 100, 10.0))
+            assert created
+            await pipeline.wait(order.client_order_id, 1)
+            await asyncio.sleep(0.01)
+            assert engine.position("AAA") == 100
+
+            # Resting order: partly filled, then canceled
+            broker.fill_delay = 10
+            working, _ = pipeline.submit(OrderIntent("AAA", "SELL", 80, 11.0))
+            await pipeline.wait(working.client_order_id, 1)
+            broker.fill(working.broker_order_id, 11.0, 30)
+            assert engine.position("AAA") == 70
+            assert engine.snapshot()["positions"]["AAA"]["pending"] == -50
+            await pipeline.cancel(working.client_order_id)
+            return engine.snapshot()
+        finally:
+            await pipeline.stop()
+
+    snapshot = asyncio.run(run())
+    position = snapshot["positions"]["AAA"]
+    assert position["position"] == 70
+    assert position["pending"] == 0
+    assert snapshot["realized"] == pytest.approx(30 * 1.0)
+    assert snapshot["gross_notional"] == pytest.approx(70 * 10.0)